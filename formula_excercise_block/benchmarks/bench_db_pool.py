@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Measure the database time of a student_view, with and without the connection pool.
+
+Every student_view asks db_service whether the block is in the database and
+then fetches its question template. Without the pool, each of those calls
+connects and disconnects; with it, they borrow an open connection; with
+the template cache too, they make no queries once the template is cached.
+
+By default the database is an SQLite stand-in, whose connections take
+--connect-ms to make, like a MySQL connection's TCP and authentication
+handshake. With --mysql, it's the MySQL database in settings.py.
+
+Usage: python benchmarks/bench_db_pool.py [--views N] [--connect-ms MS] [--mysql]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'formula_exercise_block'))
+
+import db_pool  # noqa: E402
+import db_service  # noqa: E402
+
+XBLOCK_ID = 'block-v1:Bench+FE101+2024_T1+type@formula_exercise_block+block@bench'
+
+SQLITE_TABLES = [
+    "CREATE TABLE edxapp.question_template (id INTEGER PRIMARY KEY, xblock_id VARCHAR(255) NOT NULL UNIQUE, template VARCHAR(2048) NOT NULL)",
+    "CREATE TABLE edxapp.variable (id INTEGER PRIMARY KEY, xblock_id VARCHAR(255) NOT NULL, name VARCHAR(32) NOT NULL, type VARCHAR(32) NOT NULL, min_value INT NOT NULL, max_value INT NOT NULL, decimal_places INT)",
+    "CREATE TABLE edxapp.expression (id INTEGER PRIMARY KEY, xblock_id VARCHAR(255) NOT NULL, name VARCHAR(32) NOT NULL, type VARCHAR(32) NOT NULL, formula VARCHAR(2048) NOT NULL, decimal_places INT)",
+]
+
+
+class Unpooled(object):
+    """The ConnectionPool interface, connecting for every operation as db_service used to."""
+
+    def __init__(self, connect, paramstyle):
+        self.pool = db_pool.ConnectionPool(connect, paramstyle=paramstyle)
+
+    def sql(self, query):
+        return self.pool.sql(query)
+
+    @contextmanager
+    def cursor(self):
+        connection = self.pool.connect()
+        cursor = connection.cursor()
+        try:
+            yield cursor
+        finally:
+            cursor.close()
+        connection.commit()
+        connection.close()
+
+    def close(self):
+        pass
+
+
+def sqlite_connect(path, connect_ms):
+    def connect():
+        time.sleep(connect_ms / 1000.0)
+        connection = sqlite3.connect(':memory:', check_same_thread=False)
+        connection.execute("ATTACH DATABASE ? AS edxapp", (path,))
+        return connection
+    return connect
+
+
+def view_seconds(views):
+    """The mean seconds of student_view's database calls, over `views` views."""
+    start = time.perf_counter()
+    for _ in range(views):
+        if db_service.is_block_in_db(XBLOCK_ID):
+            db_service.fetch_question_template_data(XBLOCK_ID)
+    return (time.perf_counter() - start) / views
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--views', type=int, default=500, help="student views to measure")
+    parser.add_argument('--connect-ms', type=float, default=3, help="time to make an SQLite stand-in connection")
+    parser.add_argument('--mysql', action='store_true', help="use the MySQL database in settings.py")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        if args.mysql:
+            import mysql.connector
+            import settings
+            connect = lambda: mysql.connector.connect(**settings.database)  # noqa: E731
+            paramstyle = mysql.connector.paramstyle
+        else:
+            connect = sqlite_connect(os.path.join(directory, 'edxapp.db'), args.connect_ms)
+            paramstyle = sqlite3.paramstyle
+            setup = db_pool.ConnectionPool(connect, paramstyle=paramstyle)
+            with setup.cursor() as cursor:
+                for table in SQLITE_TABLES:
+                    cursor.execute(table)
+            setup.close()
+
+        db_service.set_pool(db_pool.ConnectionPool(connect, paramstyle=paramstyle))
+        db_service.delete_xblock(XBLOCK_ID)
+        variables = dict(
+            (name, {'name': name, 'type': 'int', 'min_value': 0, 'max_value': 10, 'decimal_places': 2})
+            for name in 'abcd'
+        )
+        expressions = {'sum': {'name': 'sum', 'type': 'float', 'formula': 'a+b+c+d', 'decimal_places': 2}}
+        db_service.create_question_template(XBLOCK_ID, "Given <a>, <b>, <c> and <d>", variables, expressions)
+
+        print("%d student views" % args.views)
+        print("%-16s%14s" % ('connections', 'ms per view'))
+        ttl = db_service.template_cache.ttl
+        modes = [
+            ('per call', Unpooled(connect, paramstyle), 0),
+            ('pooled', db_pool.ConnectionPool(connect, paramstyle=paramstyle), 0),
+            ('pooled, cached', db_pool.ConnectionPool(connect, paramstyle=paramstyle), ttl),
+        ]
+        for name, pool, cache_ttl in modes:
+            db_service.set_pool(pool)
+            db_service.template_cache.ttl = cache_ttl
+            view_seconds(10)  # warm up
+            print("%-16s%14.3f" % (name, view_seconds(args.views) * 1000))
+
+        db_service.delete_xblock(XBLOCK_ID)
+        db_service.set_pool(None)
+
+
+if __name__ == '__main__':
+    main()
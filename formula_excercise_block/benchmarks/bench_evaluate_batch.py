@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Measure evaluate_expressions_batch against evaluating each student on their own.
+
+Evaluates a question's expressions for --students sets of variable values,
+once with evaluate_expressions for each student (with and without the
+compiled expressions kept for a block), and once with
+evaluate_expressions_batch on a matrix of all the values. The question mixes
+arithmetic formulas, which the batch computes with NumPy, and formulas with
+functions and powers, which it evaluates with compiled cexprtk expressions.
+
+Usage: python benchmarks/bench_evaluate_batch.py [--students N]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'formula_exercise_block'))
+
+import numpy  # noqa: E402
+
+import formula_service  # noqa: E402
+
+VARIABLES = {
+    'a': {'name': 'a', 'type': 'int', 'min_value': 1, 'max_value': 100, 'decimal_places': 0},
+    'b': {'name': 'b', 'type': 'int', 'min_value': 1, 'max_value': 100, 'decimal_places': 0},
+    'x': {'name': 'x', 'type': 'float', 'min_value': 0, 'max_value': 10, 'decimal_places': 2},
+    'y': {'name': 'y', 'type': 'float', 'min_value': 1, 'max_value': 10, 'decimal_places': 2},
+}
+
+EXPRESSIONS = {
+    'total': {'name': 'total', 'type': 'float', 'formula': 'a*x+b*y', 'decimal_places': 2},
+    'ratio': {'name': 'ratio', 'type': 'float', 'formula': '(a-b)/y', 'decimal_places': 3},
+    'change': {'name': 'change', 'type': 'float', 'formula': '(x-y)*100/x', 'decimal_places': 3},
+    'distance': {'name': 'distance', 'type': 'float', 'formula': 'sqrt(x^2+y^2)', 'decimal_places': 3},
+    'wave': {'name': 'wave', 'type': 'float', 'formula': 'a*sin(x)+b*cos(y)', 'decimal_places': 3},
+}
+
+
+def make_matrix(count):
+    """Returns `count` rows of variable values, in the order of VARIABLES."""
+    rand = random.Random(0)
+    return numpy.array([
+        [
+            rand.randint(variable['min_value'], variable['max_value']) if variable['type'] == 'int'
+            else round(rand.uniform(variable['min_value'], variable['max_value']), 2)
+            for variable in VARIABLES.values()
+        ]
+        for _ in range(count)
+    ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--students', type=int, default=10000, help="sets of variable values to evaluate")
+    args = parser.parse_args()
+
+    matrix = make_matrix(args.students)
+    rows = [
+        dict((name, [variable, value]) for (name, variable), value in zip(VARIABLES.items(), row))
+        for row in matrix.tolist()
+    ]
+
+    print("%d students, %d expressions" % (args.students, len(EXPRESSIONS)))
+    print("%-34s%12s%14s" % ("evaluation", "seconds", "students/s"))
+
+    scalar = {}
+    for name, xblock_id in [("evaluate_expressions", None), ("evaluate_expressions, compiled", 'block-bench')]:
+        start = time.perf_counter()
+        scalar[name] = [formula_service.evaluate_expressions(row, EXPRESSIONS, xblock_id) for row in rows]
+        elapsed = time.perf_counter() - start
+        print("%-34s%12.3f%14.0f" % (name, elapsed, args.students / elapsed))
+
+    start = time.perf_counter()
+    batch = formula_service.evaluate_expressions_batch(VARIABLES, EXPRESSIONS, matrix)
+    elapsed = time.perf_counter() - start
+    print("%-34s%12.3f%14.0f" % ("evaluate_expressions_batch", elapsed, args.students / elapsed))
+
+    for row, expected in enumerate(scalar["evaluate_expressions"]):
+        for expr_name, expr_value in expected.items():
+            assert batch[expr_name][row] == expr_value, (row, expr_name, batch[expr_name][row], expr_value)
+
+
+if __name__ == '__main__':
+    main()
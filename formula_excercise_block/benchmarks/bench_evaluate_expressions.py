@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Measure evaluate_submission over many submissions to one block.
+
+Compares evaluating each submission with a new cexprtk symbol table and
+freshly parsed expressions, as evaluate_submission does without an
+xblock_id, with the compiled expressions it keeps per thread and block
+when given one. Each submission has its own random variable values.
+
+Usage: python benchmarks/bench_evaluate_expressions.py [--submissions N] [--variables N] [--expressions N]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'formula_exercise_block'))
+
+import formula_service  # noqa: E402
+
+FORMULAS = ['%s+%s', '%s*%s-%s', 'sqrt(%s^2+%s^2)', 'sin(%s)*cos(%s)+%s/3', 'log(%s+1)*%s']
+
+
+def make_question(variable_count, expression_count):
+    """Returns the variables and expressions of a question."""
+    rand = random.Random(0)
+    variables = {}
+    for number in range(variable_count):
+        name = 'v%d' % number
+        variables[name] = {'name': name, 'type': 'int' if number % 2 else 'float', 'min_value': 1,
+                           'max_value': 100, 'decimal_places': 2}
+    expressions = {}
+    for number in range(expression_count):
+        formula = FORMULAS[number % len(FORMULAS)]
+        names = tuple(rand.choice(list(variables)) for _ in range(formula.count('%s')))
+        expressions['e%d' % number] = {'name': 'e%d' % number, 'type': 'float', 'formula': formula % names,
+                                       'decimal_places': 3}
+    return variables, expressions
+
+
+def make_submissions(variables, expressions, count):
+    """Returns `count` submissions, as evaluate_submission takes their variable and expression values."""
+    rand = random.Random(1)
+    submissions = []
+    for _ in range(count):
+        variable_values = {}
+        for name, variable in variables.items():
+            value = rand.uniform(variable['min_value'], variable['max_value'])
+            variable_values[name] = [variable, int(value) if variable['type'] == 'int' else round(value, 2)]
+        expression_values = dict((name, [expression, 0]) for name, expression in expressions.items())
+        submissions.append((variable_values, expression_values))
+    return submissions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--submissions', type=int, default=10000, help="submissions to evaluate in each mode")
+    parser.add_argument('--variables', type=int, default=6, help="variables in the question")
+    parser.add_argument('--expressions', type=int, default=4, help="expressions in the question")
+    args = parser.parse_args()
+
+    variables, expressions = make_question(args.variables, args.expressions)
+    submissions = make_submissions(variables, expressions, args.submissions)
+
+    print("%d submissions, %d variables, %d expressions" % (args.submissions, args.variables, args.expressions))
+    print("%-26s%12s%14s" % ("evaluation", "seconds", "submissions/s"))
+    for name, xblock_id in [("parsed per submission", None), ("compiled once", 'block-bench')]:
+        start = time.perf_counter()
+        for variable_values, expression_values in submissions:
+            formula_service.evaluate_submission(variable_values, expression_values, xblock_id)
+        elapsed = time.perf_counter() - start
+        print("%-26s%12.3f%14.0f" % (name, elapsed, args.submissions / elapsed))
+
+    for variable_values, _expression_values in submissions[:100]:
+        assert (formula_service.evaluate_expressions(variable_values, expressions, 'block-bench')
+                == formula_service.evaluate_expressions(variable_values, expressions))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Measure fetch_question_template_data on templates with many variables.
+
+Compares the single UNION query db_service runs now with the three queries
+(template, variables, expressions) read row by row with fetchone() that it
+used to run, on templates with --sizes variables and as many expressions.
+
+The database is an SQLite stand-in, and each query takes --round-trip-ms
+longer, like a query to a MySQL server over the network.
+
+Usage: python benchmarks/bench_template_fetch.py [--fetches N] [--sizes N,N,...] [--round-trip-ms MS]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'formula_exercise_block'))
+
+import db_pool  # noqa: E402
+import db_service  # noqa: E402
+
+SQLITE_TABLES = [
+    "CREATE TABLE edxapp.question_template (id INTEGER PRIMARY KEY, xblock_id VARCHAR(255) NOT NULL UNIQUE, template VARCHAR(2048) NOT NULL)",
+    "CREATE TABLE edxapp.variable (id INTEGER PRIMARY KEY, xblock_id VARCHAR(255) NOT NULL, name VARCHAR(32) NOT NULL, type VARCHAR(32) NOT NULL, min_value INT NOT NULL, max_value INT NOT NULL, decimal_places INT)",
+    "CREATE TABLE edxapp.expression (id INTEGER PRIMARY KEY, xblock_id VARCHAR(255) NOT NULL, name VARCHAR(32) NOT NULL, type VARCHAR(32) NOT NULL, formula VARCHAR(2048) NOT NULL, decimal_places INT)",
+    "CREATE INDEX edxapp.variable_xblock_id ON variable (xblock_id)",
+    "CREATE INDEX edxapp.expression_xblock_id ON expression (xblock_id)",
+]
+
+
+class RoundTripCursor(object):
+    """An SQLite cursor whose queries each take `round_trip` seconds longer."""
+
+    def __init__(self, cursor, round_trip):
+        self.cursor = cursor
+        self.round_trip = round_trip
+
+    def execute(self, query, params=()):
+        time.sleep(self.round_trip)
+        return self.cursor.execute(query, params)
+
+    def executemany(self, query, rows):
+        time.sleep(self.round_trip)
+        return self.cursor.executemany(query, rows)
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+
+class RoundTripConnection(object):
+    """An SQLite connection whose cursors are RoundTripCursors."""
+
+    def __init__(self, connection, round_trip):
+        self.connection = connection
+        self.round_trip = round_trip
+
+    def cursor(self):
+        return RoundTripCursor(self.connection.cursor(), self.round_trip)
+
+    def __getattr__(self, name):
+        return getattr(self.connection, name)
+
+
+def fetch_three_queries(xblock_id):
+    """fetch_question_template_data as it was, with a query for each table."""
+    pool = db_service.get_pool()
+    question_template = ""
+    variables = {}
+    expressions = {}
+    with pool.connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute(pool.sql("SELECT template FROM edxapp.question_template WHERE xblock_id = %s"), (xblock_id,))
+        row = cursor.fetchone()
+        if row is not None:
+            question_template = row[0]
+        cursor.close()
+
+        cursor = connection.cursor()
+        cursor.execute(
+            pool.sql("SELECT name, type, min_value, max_value, decimal_places FROM edxapp.variable WHERE xblock_id = %s"),
+            (xblock_id,)
+        )
+        row = cursor.fetchone()
+        while row is not None:
+            variable = {}
+            variable['name'] = row[0]
+            variable['type'] = row[1]
+            variable['min_value'] = row[2]
+            variable['max_value'] = row[3]
+            variable['decimal_places'] = row[4]
+            variables[variable['name']] = variable
+            row = cursor.fetchone()
+        cursor.close()
+
+        cursor = connection.cursor()
+        cursor.execute(
+            pool.sql("SELECT name, type, formula, decimal_places FROM edxapp.expression WHERE xblock_id = %s"),
+            (xblock_id,)
+        )
+        row = cursor.fetchone()
+        while row is not None:
+            expression = {}
+            expression['name'] = row[0]
+            expression['type'] = row[1]
+            expression['formula'] = row[2]
+            expression['decimal_places'] = row[3]
+            expressions[expression['name']] = expression
+            row = cursor.fetchone()
+        cursor.close()
+    return question_template, variables, expressions
+
+
+def make_template(size):
+    """Add a template with `size` variables and expressions, and return its xblock id."""
+    xblock_id = 'block-v1:Bench+FE101+2024_T1+type@formula_exercise_block+block@size%d' % size
+    variables = dict(
+        ('v%d' % number, {'name': 'v%d' % number, 'type': 'int', 'min_value': 0, 'max_value': 100, 'decimal_places': 0})
+        for number in range(size)
+    )
+    expressions = dict(
+        ('e%d' % number, {'name': 'e%d' % number, 'type': 'float', 'formula': 'v%d*2+1' % number, 'decimal_places': 2})
+        for number in range(size)
+    )
+    db_service.create_question_template(xblock_id, "A template with %d variables" % size, variables, expressions)
+    return xblock_id
+
+
+def fetch_seconds(fetch, xblock_id, fetches):
+    """The mean seconds `fetch` takes for `xblock_id`, over `fetches` fetches."""
+    fetch(xblock_id)
+    start = time.perf_counter()
+    for _ in range(fetches):
+        fetch(xblock_id)
+    return (time.perf_counter() - start) / fetches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--fetches', type=int, default=200, help="fetches of each template")
+    parser.add_argument('--sizes', default='5,50,500', help="numbers of variables of the templates")
+    parser.add_argument('--round-trip-ms', type=float, default=0.5, help="time added to each query")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'edxapp.db')
+        round_trip = args.round_trip_ms / 1000.0
+
+        def connect():
+            connection = sqlite3.connect(':memory:', check_same_thread=False)
+            connection.execute("ATTACH DATABASE ? AS edxapp", (path,))
+            return RoundTripConnection(connection, round_trip)
+
+        db_service.set_pool(db_pool.ConnectionPool(connect, paramstyle=sqlite3.paramstyle))
+        db_service.template_cache.ttl = 0  # measure the queries, not the template cache
+        with db_service.get_pool().cursor() as cursor:
+            for table in SQLITE_TABLES:
+                cursor.execute(table)
+
+        print("%d fetches of each template, %g ms per query round trip" % (args.fetches, args.round_trip_ms))
+        print("%-10s%16s%14s" % ('variables', 'three queries ms', 'one query ms'))
+        for size in [int(size) for size in args.sizes.split(',')]:
+            xblock_id = make_template(size)
+            assert fetch_three_queries(xblock_id) == db_service.fetch_question_template_data(xblock_id)
+            print("%-10d%16.3f%14.3f" % (
+                size,
+                fetch_seconds(fetch_three_queries, xblock_id, args.fetches) * 1000,
+                fetch_seconds(db_service.fetch_question_template_data, xblock_id, args.fetches) * 1000,
+            ))
+        db_service.set_pool(None)
+
+
+if __name__ == '__main__':
+    main()
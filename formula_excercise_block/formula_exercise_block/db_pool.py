@@ -0,0 +1,164 @@
+"""
+A pool of DB-API connections for db_service.
+
+Connecting to MySQL costs a TCP round trip and an authentication handshake,
+so rather than connecting for every query, db_service keeps a few
+connections open in a ConnectionPool and borrows one for each operation.
+
+The pool works with any DB-API driver: give it a function that makes a
+connection and the driver's paramstyle. Queries are written with %s
+placeholders, as mysql.connector takes them, and rewritten for drivers
+that use another style, so the same queries run against SQLite in tests.
+"""
+
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+
+class PoolExhausted(Exception):
+    """No connection was free within the pool's timeout."""
+
+
+class ConnectionPool(object):
+    """
+    Keeps up to `size` connections made by `connect`.
+
+    A connection that has been idle for more than `check_after` seconds is
+    checked with `check_query` before it is handed out, and replaced if the
+    check fails (the server may have closed it). A connection whose
+    operation fails is rolled back, or dropped if even that fails.
+    Borrowers wait up to `timeout` seconds for a free connection.
+    """
+
+    def __init__(self, connect, size=5, paramstyle='pyformat', check_after=30, check_query='SELECT 1',
+                 timeout=10, cursor_options=None):
+        self.connect = connect
+        self.size = size
+        self.paramstyle = paramstyle
+        self.check_after = check_after
+        self.check_query = check_query
+        self.timeout = timeout
+        self.cursor_options = cursor_options or {}
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._opened = 0
+        self._queries = {}
+        self.stats = {'connects': 0, 'reuses': 0, 'checks': 0, 'discarded': 0}
+
+    def sql(self, query):
+        """Return `query`, written with %s placeholders, in the driver's paramstyle."""
+        sql = self._queries.get(query)
+        if sql is None:
+            if self.paramstyle == 'qmark':
+                sql = query.replace('%s', '?')
+            else:
+                sql = query
+            self._queries[query] = sql
+        return sql
+
+    def _new_connection(self):
+        connection = self.connect()
+        self.stats['connects'] += 1
+        return connection
+
+    def _is_healthy(self, connection):
+        self.stats['checks'] += 1
+        try:
+            cursor = connection.cursor()
+            try:
+                cursor.execute(self.check_query)
+                cursor.fetchall()
+            finally:
+                cursor.close()
+        except Exception:
+            return False
+        return True
+
+    def _close(self, connection):
+        with self._lock:
+            self._opened -= 1
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def _discard(self, connection):
+        self.stats['discarded'] += 1
+        self._close(connection)
+
+    def _checkout(self):
+        """Return an idle connection, or a new one if the pool isn't full, waiting for one otherwise."""
+        while True:
+            try:
+                connection, idle_since = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    can_open = self._opened < self.size
+                    if can_open:
+                        self._opened += 1
+                if can_open:
+                    try:
+                        return self._new_connection()
+                    except BaseException:
+                        with self._lock:
+                            self._opened -= 1
+                        raise
+                try:
+                    connection, idle_since = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    raise PoolExhausted("No database connection free after %s seconds" % self.timeout)
+
+            if time.monotonic() - idle_since > self.check_after and not self._is_healthy(connection):
+                self._discard(connection)
+                continue
+            self.stats['reuses'] += 1
+            return connection
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for the duration of the `with` block."""
+        connection = self._checkout()
+        reusable = False
+        try:
+            yield connection
+            reusable = True
+        except BaseException:
+            # Even GeneratorExit or KeyboardInterrupt: the connection is kept
+            # if its work can be rolled back, and discarded otherwise.
+            try:
+                connection.rollback()
+                reusable = True
+            except Exception:
+                pass
+            raise
+        finally:
+            if reusable:
+                self._idle.put((connection, time.monotonic()))
+            else:
+                self._discard(connection)
+
+    @contextmanager
+    def cursor(self):
+        """
+        Borrow a connection and open a cursor on it for the `with` block.
+
+        The work is committed if the block succeeds, and rolled back otherwise.
+        """
+        with self.connection() as connection:
+            cursor = connection.cursor(**self.cursor_options)
+            try:
+                yield cursor
+            finally:
+                cursor.close()
+            connection.commit()
+
+    def close(self):
+        """Close the idle connections."""
+        while True:
+            try:
+                connection, _idle_since = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._close(connection)
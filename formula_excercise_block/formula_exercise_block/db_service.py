@@ -6,236 +6,234 @@ except Exception:  # pragma: no cover
     mysql = None  # signal unavailable DB
     s = type('S', (), {'database': {}})()
 
+try:
+    from .db_pool import ConnectionPool
+    from .template_cache import TemplateCache
+except ImportError:  # imported on its own, as the tests do
+    from db_pool import ConnectionPool
+    from template_cache import TemplateCache
+
+
+_pool = None
+
+# Question templates read recently, see template_cache.
+template_cache = TemplateCache(**getattr(s, 'template_cache', {}))
+
+
+def set_pool(pool):
+    """
+    Use `pool` (a db_pool.ConnectionPool, or None for the default) for all queries.
+
+    Tests and benchmarks use this to run the queries against SQLite or another stand-in.
+    """
+    global _pool
+    if _pool is not None and _pool is not pool:
+        _pool.close()
+    _pool = pool
+    template_cache.clear()
+
+
+def get_pool():
+    """
+    Returns the connection pool for the settings' database, or None if MySQL isn't available.
+    """
+    global _pool
+    if _pool is None and mysql is not None:
+        _pool = ConnectionPool(
+            lambda: mysql.connector.connect(**s.database),
+            paramstyle=mysql.connector.paramstyle,
+            **getattr(s, 'database_pool', {})
+        )
+    return _pool
 
 
 def create_question_template(xblock_id, question_template, variables, expressions):
-    if mysql is None:
+    pool = get_pool()
+    if pool is None:
         return
-    connection = mysql.connector.connect(**s.database)
-    
-    # clean_up_variables_and_expressions(fe_xblock, connection)
-    
-    insert_question_template(xblock_id, connection, question_template)
-    
-    create_variables(xblock_id, connection, variables)
-    
-    create_expressions(xblock_id, connection, expressions)
-    
-    connection.commit()
-    connection.close()
+    with pool.cursor() as cursor:
+        # clean_up_variables_and_expressions(fe_xblock, cursor)
+
+        insert_question_template(xblock_id, cursor, question_template)
+
+        create_variables(xblock_id, cursor, variables)
+
+        create_expressions(xblock_id, cursor, expressions)
+
+    template_cache.put(xblock_id, question_template, variables, expressions)
 
 
 def update_question_template(xblock_id, question_template, updated_variables, updated_expressions):
-        
-    if mysql is None:
+    pool = get_pool()
+    if pool is None:
         return
-    connection = mysql.connector.connect(**s.database)
-    
-    clean_up_variables_and_expressions(xblock_id, connection)
-    
-    update_question_template_content(xblock_id, connection, question_template)
-    
-    create_variables(xblock_id, connection, updated_variables)
-    
-    create_expressions(xblock_id, connection, updated_expressions)
-    
-    connection.commit()
-    connection.close()
+    with pool.cursor() as cursor:
+        clean_up_variables_and_expressions(xblock_id, cursor)
+
+        update_question_template_content(xblock_id, cursor, question_template)
+
+        create_variables(xblock_id, cursor, updated_variables)
+
+        create_expressions(xblock_id, cursor, updated_expressions)
+    template_cache.invalidate(xblock_id)
+
+
+# The question template, its variables and its expressions, as rows of
+# (kind, id, name, type, min_value, max_value, text, decimal_places), where
+# text is the template's or the expression's formula. Each kind's rows come
+# in the order they were inserted.
+TEMPLATE_DATA_QUERY = (
+    "SELECT 'template' AS kind, id, NULL, NULL, NULL, NULL, template, NULL "
+    "FROM edxapp.question_template WHERE xblock_id = %s "
+    "UNION ALL "
+    "SELECT 'variable', id, name, type, min_value, max_value, NULL, decimal_places "
+    "FROM edxapp.variable WHERE xblock_id = %s "
+    "UNION ALL "
+    "SELECT 'expression', id, name, type, NULL, NULL, formula, decimal_places "
+    "FROM edxapp.expression WHERE xblock_id = %s "
+    "ORDER BY kind, id"
+)
 
 
 def fetch_question_template_data(xblock_id):
     """
-    Fetches question template data from the database:
+    Fetches question template data from template_cache, or from the database, in one query:
         question_template
         variables
         expressions
     """
-    if mysql is None:
+    pool = get_pool()
+    if pool is None:
         return "", {}, {}
-    connection = mysql.connector.connect(**s.database)
-    
+
+    cached = template_cache.get(xblock_id)
+    if cached is not None:
+        return cached
+
+    with pool.cursor() as cursor:
+        cursor.execute(pool.sql(TEMPLATE_DATA_QUERY), (xblock_id, xblock_id, xblock_id))
+        rows = cursor.fetchall()
+
     question_template = ""
     variables = {}
     expressions = {}
-    
-    # query question_template
-    question_template_query = "SELECT template FROM edxapp.question_template where xblock_id = '" + xblock_id + "'"
-    question_template_cursor = connection.cursor()
-    question_template_cursor.execute(question_template_query)
-    row = question_template_cursor.fetchone()
-    
-    if row is not None:
-        question_template = row[0]
-    question_template_cursor.close()
-    
-    
-    # query variables
-    variable_query = "SELECT name, type, min_value, max_value, type, decimal_places FROM edxapp.variable WHERE xblock_id = '" + xblock_id + "'"
-    variable_query_cursor = connection.cursor()
-    variable_query_cursor.execute(variable_query)
-    row = variable_query_cursor.fetchone()
-    
-    
-    # fetch variables from the result set
-    while row is not None:
-        variable = {}
-        variable['name'] = row[0]
-        variable['type'] = row[1]
-        variable['min_value'] = row[2]
-        variable['max_value'] = row[3]
-        variable['type'] = row[4]
-        variable['decimal_places'] = row[5]
-        
-        variables[variable['name']] = variable
-        row = variable_query_cursor.fetchone()
-        
-    variable_query_cursor.close()
-    
-    
-    # query expressions
-    expression_query = "SELECT name, type, formula, decimal_places FROM edxapp.expression WHERE xblock_id = '" + xblock_id + "'"
-    expression_query_cursor = connection.cursor()
-    expression_query_cursor.execute(expression_query)
-    row = expression_query_cursor.fetchone()
-    
-    
-    # fetch expressions from the result set
-    while row is not None:
-        expression = {}
-        expression['name'] = row[0]
-        expression['type'] = row[1]
-        expression['formula'] = row[2]
-        expression['decimal_places'] = row[3]
-        
-        expressions[expression['name']] = expression
-        row = expression_query_cursor.fetchone()
-        
-    expression_query_cursor.close()
-    
-    
-    connection.close()
+    for kind, _id, name, value_type, min_value, max_value, text, decimal_places in rows:
+        if kind == 'template':
+            question_template = text
+        elif kind == 'variable':
+            variables[name] = {
+                'name': name,
+                'type': value_type,
+                'min_value': min_value,
+                'max_value': max_value,
+                'decimal_places': decimal_places,
+            }
+        else:
+            expressions[name] = {
+                'name': name,
+                'type': value_type,
+                'formula': text,
+                'decimal_places': decimal_places,
+            }
+
+    if rows:
+        template_cache.put(xblock_id, question_template, variables, expressions)
     return question_template, variables, expressions
 
 
-def clean_up_variables_and_expressions(xblock_id, connection):
+def clean_up_variables_and_expressions(xblock_id, cursor):
     """
     Removes variables and expressions of the question template
     """
-    
-    cursor = connection.cursor()
-    
+    pool = get_pool()
+
     # remove variables
-    VARIABLES_REMOVE_QUERY = ("DELETE FROM edxapp.variable WHERE xblock_id = '" + xblock_id + "'")
-    cursor.execute(VARIABLES_REMOVE_QUERY)
-    
+    cursor.execute(pool.sql("DELETE FROM edxapp.variable WHERE xblock_id = %s"), (xblock_id,))
+
     # remove expressions
-    EXPRESSIONS_REMOVE_QUERY = ("DELETE FROM edxapp.expression WHERE xblock_id = '" + xblock_id + "'")
-    cursor.execute(EXPRESSIONS_REMOVE_QUERY)
-    
-    cursor.close()
+    cursor.execute(pool.sql("DELETE FROM edxapp.expression WHERE xblock_id = %s"), (xblock_id,))
 
 
-def insert_question_template(xblock_id, connection, question_template):
-    cursor = connection.cursor()
-    query = "INSERT INTO edxapp.question_template (xblock_id, template) VALUES ('" + xblock_id + "', '" + question_template + "')"
-    cursor.execute(query)
-    cursor.close()
+def insert_question_template(xblock_id, cursor, question_template):
+    query = "INSERT INTO edxapp.question_template (xblock_id, template) VALUES (%s, %s)"
+    cursor.execute(get_pool().sql(query), (xblock_id, question_template))
 
 
-def update_question_template_content(xblock_id, connection, question_template):
+def update_question_template_content(xblock_id, cursor, question_template):
     """
     Updates question template
     """
-    
-    cursor = connection.cursor()
-    query = "UPDATE edxapp.question_template SET template = '" + question_template + "' WHERE xblock_id = '" + xblock_id + "'"
-    
-    cursor.execute(query)
-    cursor.close()
+    query = "UPDATE edxapp.question_template SET template = %s WHERE xblock_id = %s"
+    cursor.execute(get_pool().sql(query), (question_template, xblock_id))
 
 
-def create_variables(xblock_id, connection, updated_variables):
+def create_variables(xblock_id, cursor, updated_variables):
     """
     Creates variables for a question template
     """
-    
-    cursor = connection.cursor()
     query = "INSERT INTO edxapp.variable (xblock_id, name, type, min_value, max_value, decimal_places) VALUES (%s, %s, %s, %s, %s, %s)"
-    for variable_name, variable in updated_variables.items():
-        updated_variable_data = (xblock_id, variable_name, variable['type'], variable['min_value'], variable['max_value'], variable['decimal_places'])
-        cursor.execute(query, updated_variable_data)
-    
-    cursor.close()
+    rows = [
+        (xblock_id, variable_name, variable['type'], variable['min_value'], variable['max_value'], variable['decimal_places'])
+        for variable_name, variable in updated_variables.items()
+    ]
+    if rows:
+        cursor.executemany(get_pool().sql(query), rows)
 
 
-def create_expressions(xblock_id, connection, updated_expressions):
+def create_expressions(xblock_id, cursor, updated_expressions):
     """
     Create expressions for a question template
     """
-    
-    cursor = connection.cursor()
     query = "INSERT INTO edxapp.expression (xblock_id, name, type, formula, decimal_places) VALUES (%s, %s, %s, %s, %s)"
-    for expression_name, expression in updated_expressions.items():
-        updated_expression_data = (xblock_id, expression_name, expression['type'], expression['formula'], expression['decimal_places'])
-        cursor.execute(query, updated_expression_data)
-    
-    cursor.close()
-    pass
+    rows = [
+        (xblock_id, expression_name, expression['type'], expression['formula'], expression['decimal_places'])
+        for expression_name, expression in updated_expressions.items()
+    ]
+    if rows:
+        cursor.executemany(get_pool().sql(query), rows)
 
 
 def is_block_in_db(xblock_id):
-    
-    if mysql is None:
+    pool = get_pool()
+    if pool is None:
         return False
-    connection = mysql.connector.connect(**s.database)
-    
-    query = "SELECT id FROM edxapp.question_template WHERE xblock_id = '" + xblock_id + "'"
-    cursor = connection.cursor()
-    cursor.execute(query)
-    
-    rowcount = cursor.rowcount
-    cursor.close()
-    connection.close()
-
-    return (rowcount > 0)
+    if xblock_id in template_cache:
+        return True
+    with pool.cursor() as cursor:
+        cursor.execute(pool.sql("SELECT id FROM edxapp.question_template WHERE xblock_id = %s"), (xblock_id,))
+        return cursor.fetchone() is not None
 
 
 def delete_xblock(xblock_id):
-    
-    if mysql is None:
+    pool = get_pool()
+    if pool is None:
         return
-    connection = mysql.connector.connect(**s.database)
-    
-    delete_query_str = "DELETE FROM edxapp.question_template WHERE xblock_id like '%" + xblock_id + "%'"
-    cursor = connection.cursor()
-    cursor.execute(delete_query_str)
-    
-    cursor.close()
-    connection.commit()
-    connection.close()
-    
-    
+    with pool.cursor() as cursor:
+        cursor.execute(
+            pool.sql("DELETE FROM edxapp.question_template WHERE xblock_id LIKE %s"),
+            ('%' + xblock_id + '%',)
+        )
+    template_cache.invalidate(xblock_id, partial=True)
+
+
 def is_xblock_submitted(item_id):
-    
+
     # 1. TABLE submissions_studentitem(id)
     # 2. TABLE submissions_submission(student_item_id)
     """
     SELECT count(*) FROM edxapp.submissions_submission WHERE student_item_id IN (SELECT id FROM edxapp.submissions_studentitem WHERE item_id = item_id )
     """
-    
+
     is_submitted = False
-    
-    query = "SELECT count(*) FROM edxapp.submissions_submission WHERE student_item_id IN (SELECT id FROM edxapp.submissions_studentitem WHERE item_id = '" + item_id + "')"
-    if mysql is None:
+
+    query = "SELECT count(*) FROM edxapp.submissions_submission WHERE student_item_id IN (SELECT id FROM edxapp.submissions_studentitem WHERE item_id = %s)"
+    pool = get_pool()
+    if pool is None:
         return False
-    connection = mysql.connector.connect(**s.database)
-    cursor = connection.cursor()
-    cursor.execute(query)
-    row = cursor.fetchone()
-    if row is not None:
-        is_submitted = row[0] > 0
-        
-    cursor.close()
-    connection.close()
-
-    return is_submitted    
+    with pool.cursor() as cursor:
+        cursor.execute(pool.sql(query), (item_id,))
+        row = cursor.fetchone()
+        if row is not None:
+            is_submitted = row[0] > 0
+
+    return is_submitted
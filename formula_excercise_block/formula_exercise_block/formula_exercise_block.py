@@ -1,14 +1,13 @@
 """Formula Exercise XBlock (modernized for Python 3 & optional MySQL)."""
 
 import json
-import pkg_resources
 from xblock.core import XBlock
 from xblock.fields import Scope, JSONField, Integer, String, Boolean, Float
 from xblock.fragment import Fragment
 from xblock.exceptions import JsonHandlerError
 from xblock.validation import Validation
 from xblockutils.studio_editable import StudioEditableXBlockMixin, FutureFields
-from xblockutils.resources import ResourceLoader
+from xblock_resource_cache import CachedResourceLoader
 from xblock.scorable import ScorableXBlockMixin, Score
 
 try:  # submissions service optional (workbench may not have it)
@@ -24,7 +23,7 @@ try:
 except Exception:  # pragma: no cover
     pass
 
-loader = ResourceLoader(__name__)
+loader = CachedResourceLoader(__name__)
 
 
 @XBlock.needs("i18n")
@@ -91,8 +90,7 @@ class FormulaExerciseXBlock(StudioEditableXBlockMixin, ScorableXBlockMixin, XBlo
 
     def resource_string(self, path):
         """Handy helper for getting resources from our kit."""
-        data = pkg_resources.resource_string(__name__, path)
-        return data.decode("utf8")
+        return loader.load_unicode(path)
 
     def student_view(self, context=None):
         """
@@ -238,7 +236,11 @@ class FormulaExerciseXBlock(StudioEditableXBlockMixin, ScorableXBlockMixin, XBlo
         for var_name, var_value in self.generated_variables.items():
             formula_service_variables[var_name] = [self.variables[var_name], var_value]
 
-        evaluation_result = formula_service.evaluate_submission(formula_service_variables, formula_service_expressions)
+        # Key the compiled formulas on the usage id: the workbench gives the
+        # block a new mock location on every request, but the same usage id.
+        evaluation_result = formula_service.evaluate_submission(
+            formula_service_variables, formula_service_expressions, xblock_id=str(self.scope_ids.usage_id)
+        )
         points_earned = self.max_points
         for _expr_name, point in evaluation_result.items():
             if point == 0:
@@ -342,7 +344,9 @@ class FormulaExerciseXBlock(StudioEditableXBlockMixin, ScorableXBlockMixin, XBlo
         formula_service_variables = {}
         for var_name, var_value in self.generated_variables.items():
             formula_service_variables[var_name] = [self.variables[var_name], var_value]
-        expression_values = formula_service.evaluate_expressions(formula_service_variables, self.expressions)
+        expression_values = formula_service.evaluate_expressions(
+            formula_service_variables, self.expressions, xblock_id=str(self.scope_ids.usage_id)
+        )
         return {'expression_values': expression_values}
 
     @staticmethod
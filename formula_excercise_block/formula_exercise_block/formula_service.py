@@ -1,5 +1,15 @@
+import ast
+import operator
+import threading
+from collections import OrderedDict
+
 import cexprtk
 
+try:
+    import numpy  # Optional dependency (install with batch extra), for evaluate_expressions_batch
+except ImportError:  # pragma: no cover
+    numpy = None
+
 
 def is_int(value):
   try:
@@ -9,13 +19,14 @@ def is_int(value):
     return False
 
 
-def evaluate_submission(variable_values, expression_values):
+def evaluate_submission(variable_values, expression_values, xblock_id=None):
     """
     Evaluates whether a submission is correct with respect to variable values and expression values
     
     Parameters:
         + variable_values: a dict in which each element is { variable name: [ variable instance, variable value ]}
         + expression_values: a dict in which each element is { expression name: [ expression instance, expression value of student ] }
+        + xblock_id: the id of the block the expressions belong to, see evaluate_expressions
     
     Returns:
         + a dict in which each element is (expression_name: 0 / 1) indicating whether the corresponding expression value is correct (1) or not (0) with respect to the expression formula
@@ -25,7 +36,7 @@ def evaluate_submission(variable_values, expression_values):
     for expr_name, expr_data in expression_values.items():
         expressions[expr_name] = expr_data[0]
     
-    cexprtk_expression_values = evaluate_expressions(variable_values, expressions)
+    cexprtk_expression_values = evaluate_expressions(variable_values, expressions, xblock_id)
     
     result = {} # result (expression name : 0 / 1)
     for expr_name, expr_data in expression_values.items():
@@ -55,13 +66,113 @@ def evaluate_submission(variable_values, expression_values):
     return result
 
 
-def evaluate_expressions(variable_values, expressions):
+def coerce_variable_value(variable, value):
+    """
+    Coerces a generated variable `value` to the variable's type (int or float)
+    """
+    if variable['type'] == 'int':  # integer
+        if is_int(value):
+            return int(value)
+        return int(float(value))
+    # float
+    return float(value)
+
+
+def formula_text(expr_name, expr_formula):
+    """
+    Returns the formula of the expression `expr_name` as a plain str
+    """
+    # Guard: ensure plain str (cexprtk may internally call .encode)
+    if isinstance(expr_formula, bytes):  # unexpected legacy state
+        try:
+            expr_formula = expr_formula.decode('utf-8')
+        except Exception:
+            expr_formula = expr_formula.decode(errors='ignore')
+    return expr_formula
+
+
+def compile_expression(expr_name, expr_formula, symbol_table):
+    """
+    Parses the formula of the expression `expr_name` into a cexprtk.Expression bound to `symbol_table`
+    """
+    # Pass plain str to cexprtk (encoding again would create bytes and break its internal .encode call)
+    try:
+        return cexprtk.Expression(expr_formula, symbol_table)
+    except AttributeError as e:  # capture bytes/encode related surprises
+        # Re-raise with more context so handler can surface cleanly
+        raise AttributeError(f"cexprtk build Expression failed for {expr_name} formula={expr_formula!r} type={type(expr_formula)}: {e}")
+
+
+def round_expression_value(expression, value):
+    """
+    Rounds an expression's value to the expression's type and decimal places
+    """
+    if (expression['type'] == 'int'):
+        return round(value, 0)
+    return round(value, expression['decimal_places']) # ??? http://stackoverflow.com/questions/455612/limiting-floats-to-two-decimal-points
+
+
+# How many blocks' compiled expressions each thread keeps.
+COMPILED_EXPRESSIONS_SIZE = 256
+
+_compiled = threading.local()
+
+
+class CompiledExpressions(object):
+    """
+    The formulas of a block, compiled against one symbol table holding the block's variables.
+
+    Evaluating the formulas again only needs the variables' new values set in the symbol table.
+    """
+
+    def __init__(self, variable_names):
+        self.symbol_table = cexprtk.Symbol_Table(dict((name, 0.0) for name in variable_names), add_constants=True)
+        self.expressions = {}
+
+    def set_values(self, cexprtk_variables):
+        for var_name, var_value in cexprtk_variables.items():
+            self.symbol_table.variables[var_name] = var_value
+
+    def expression(self, expr_name, expr_formula):
+        """
+        Returns the compiled `expr_formula`, compiling it the first time
+        """
+        cexprtk_expression = self.expressions.get(expr_formula)
+        if cexprtk_expression is None:
+            cexprtk_expression = compile_expression(expr_name, expr_formula, self.symbol_table)
+            self.expressions[expr_formula] = cexprtk_expression
+        return cexprtk_expression
+
+
+def compiled_expressions(xblock_id, variable_names):
+    """
+    Returns this thread's CompiledExpressions of the block `xblock_id` with the variables `variable_names`
+
+    cexprtk symbol tables and expressions can't be shared between threads, so each thread compiles its own.
+    """
+    cache = getattr(_compiled, 'cache', None)
+    if cache is None:
+        cache = _compiled.cache = OrderedDict()
+    key = (xblock_id, tuple(sorted(variable_names)))
+    compiled = cache.get(key)
+    if compiled is None:
+        compiled = cache[key] = CompiledExpressions(key[1])
+        while len(cache) > COMPILED_EXPRESSIONS_SIZE:
+            cache.popitem(last=False)
+    else:
+        cache.move_to_end(key)
+    return compiled
+
+
+def evaluate_expressions(variable_values, expressions, xblock_id=None):
     """
     Evaluates the expressions with respect to the variable values.
     
     Parameters:
         + variables_values: a dict in which each element is { variables name : [ variable instance, variable value ] } 
         + expressions: a dict in which each element is { expression name : expression instance }
+        + xblock_id: the id of the block the expressions belong to. When given, the formulas are compiled
+          once per thread and block, and reused for the block's later evaluations.
         
     Returns:
         + a dict in which each element is { expression name : expression value }
@@ -70,52 +181,161 @@ def evaluate_expressions(variable_values, expressions):
     result = {} # result (expression name : 0 / 1)
     
     for var_name, var_data in variable_values.items():
-        variable = var_data[0]
-        var_value = 0
-        var_type = variable['type']
-        
-        if var_type == 'int':  # integer
-            if (is_int(var_data[1])):
-                var_value = int(var_data[1])
-            else:
-                var_value = int(float(var_data[1]))
-        else: # float
-            var_value = float(var_data[1])
-        
-        cexprtk_variables[var_name] = var_value
+        cexprtk_variables[var_name] = coerce_variable_value(var_data[0], var_data[1])
     
-    
-    #    create SymbolTable
-    symbol_table = cexprtk.Symbol_Table(cexprtk_variables, add_constants= True)
+    if xblock_id is None:
+        #    create SymbolTable
+        symbol_table = cexprtk.Symbol_Table(cexprtk_variables, add_constants= True)
+        compiled = None
+    else:
+        compiled = compiled_expressions(xblock_id, cexprtk_variables)
+        compiled.set_values(cexprtk_variables)
 
     for expr_name, expression in expressions.items():
-        expr_formula = expression['formula']
-        # Guard: ensure plain str (cexprtk may internally call .encode)
-        if isinstance(expr_formula, bytes):  # unexpected legacy state
-            try:
-                expr_formula = expr_formula.decode('utf-8')
-            except Exception:
-                expr_formula = expr_formula.decode(errors='ignore')
-        expr_type = expression['type']
-        decimal_places = expression['decimal_places']
-        # Pass plain str to cexprtk (encoding again would create bytes and break its internal .encode call)
-        try:
-            cexprtk_expression = cexprtk.Expression(expr_formula, symbol_table)
-        except AttributeError as e:  # capture bytes/encode related surprises
-            # Re-raise with more context so handler can surface cleanly
-            raise AttributeError(f"cexprtk build Expression failed for {expr_name} formula={expr_formula!r} type={type(expr_formula)}: {e}")
-        cexprtk_expression_value = cexprtk_expression.value()
-        
-        # perform the rounding appropriately
-        if (expr_type == 'int'):
-            result[expr_name] = round(cexprtk_expression_value, 0)
+        expr_formula = formula_text(expr_name, expression['formula'])
+        if compiled is None:
+            cexprtk_expression = compile_expression(expr_name, expr_formula, symbol_table)
         else:
-            result[expr_name] = round(cexprtk_expression_value, decimal_places) # ??? http://stackoverflow.com/questions/455612/limiting-floats-to-two-decimal-points
+            cexprtk_expression = compiled.expression(expr_name, expr_formula)
         
+        # perform the rounding appropriately
+        result[expr_name] = round_expression_value(expression, cexprtk_expression.value())
     
     return result
 
 
+# The operators of the formulas evaluate_expressions_batch evaluates with NumPy.
+VECTOR_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+}
+
+
+def vectorize_formula(expr_formula, variable_names):
+    """
+    Returns a function computing `expr_formula` from a dict of NumPy columns { variable name : values },
+    or None if NumPy can't compute it exactly as cexprtk does.
+
+    That is a formula of the variables, +, -, *, / and parentheses, with at most one number, which isn't a divisor:
+    cexprtk folds numbers together and may turn a division by a number into a multiplication, changing the last bits of
+    the result. Functions, powers and everything else is left to cexprtk too.
+    """
+    try:
+        tree = ast.parse(expr_formula.strip(), mode='eval')
+    except SyntaxError:
+        return None
+    numbers = [node for node in ast.walk(tree) if isinstance(node, ast.Constant)]
+    if len(numbers) > 1:
+        return None
+    return _vectorize(tree.body, expr_formula, variable_names)
+
+
+def _vectorize(node, expr_formula, variable_names):
+    if isinstance(node, ast.BinOp) and type(node.op) in VECTOR_OPERATORS:
+        divisor = node.right.operand if isinstance(node.right, ast.UnaryOp) else node.right
+        if isinstance(node.op, ast.Div) and isinstance(divisor, ast.Constant):
+            return None
+        left = _vectorize(node.left, expr_formula, variable_names)
+        right = _vectorize(node.right, expr_formula, variable_names)
+        if left is None or right is None:
+            return None
+        compute = VECTOR_OPERATORS[type(node.op)]
+        return lambda columns: compute(left(columns), right(columns))
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.UAdd, ast.USub)):
+        operand = _vectorize(node.operand, expr_formula, variable_names)
+        if operand is None or isinstance(node.op, ast.UAdd):
+            return operand
+        return lambda columns: -operand(columns)
+    if isinstance(node, ast.Name) and node.id in variable_names:
+        return lambda columns: columns[node.id]
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        # the number as cexprtk reads it
+        try:
+            value = cexprtk.evaluate_expression(ast.get_source_segment(expr_formula.strip(), node), {})
+        except Exception:
+            return None
+        return lambda columns: value
+    return None
+
+
+def round_expression_values(expression, values):
+    """
+    Rounds an array of expression values as round_expression_value does
+    """
+    if expression['type'] == 'int':
+        # both round halfway values to even
+        return numpy.round(values, 0)
+    # NumPy rounds to decimal places by scaling, which may differ from round()
+    return numpy.array([round(value, expression['decimal_places']) for value in values.tolist()], dtype=numpy.float64)
+
+
+def evaluate_expressions_batch(variables, expressions, variable_matrix):
+    """
+    Evaluates the expressions for many sets of variable values, e.g. to regrade the submissions of a cohort.
+    The results are the ones evaluate_expressions gives for each set of values.
+    
+    Parameters:
+        + variables: a dict in which each element is { variable name : variable instance }
+        + expressions: a dict in which each element is { expression name : expression instance }
+        + variable_matrix: a NumPy array (or a list of lists) with a row of variable values for each set,
+          in the order of `variables`
+        
+    Returns:
+        + a dict in which each element is { expression name : NumPy array of the expression's value for each row }
+    
+    Formulas of plain arithmetic (see vectorize_formula) are computed with NumPy on whole columns, the other formulas
+    are compiled once with cexprtk and evaluated row by row.
+    """
+    if numpy is None:
+        raise ImportError("evaluate_expressions_batch needs NumPy, install formula-exercise-xblock[batch]")
+    
+    variable_matrix = numpy.asarray(variable_matrix, dtype=numpy.float64)
+    if variable_matrix.ndim != 2 or variable_matrix.shape[1] != len(variables):
+        raise ValueError("variable_matrix must have a column for each of the %d variables, not shape %s"
+                         % (len(variables), variable_matrix.shape))
+    row_count = variable_matrix.shape[0]
+    
+    # coerce the columns as coerce_variable_value does: int variables are truncated,
+    # and + 0.0 turns the -0.0 truncating gives for -1 < value < 0 into the 0 int() gives
+    columns = {}
+    for column, (var_name, variable) in enumerate(variables.items()):
+        if variable['type'] == 'int':
+            columns[var_name] = numpy.trunc(variable_matrix[:, column]) + 0.0
+        else:
+            columns[var_name] = variable_matrix[:, column]
+    
+    result = {}
+    compiled_rows = {} # expression name : (expression instance, compiled cexprtk expression)
+    compiled = None
+    with numpy.errstate(all='ignore'):  # cexprtk gives inf and nan silently too
+        for expr_name, expression in expressions.items():
+            expr_formula = formula_text(expr_name, expression['formula'])
+            vectorized = vectorize_formula(expr_formula, columns)
+            if vectorized is not None:
+                values = numpy.broadcast_to(numpy.asarray(vectorized(columns), dtype=numpy.float64), (row_count,))
+                result[expr_name] = round_expression_values(expression, values)
+                continue
+            if compiled is None:
+                compiled = CompiledExpressions(variables)
+            compiled_rows[expr_name] = (expression, compiled.expression(expr_name, expr_formula))
+    
+    if compiled_rows:
+        computed = dict((expr_name, numpy.empty(row_count)) for expr_name in compiled_rows)
+        names = list(columns)
+        rows = numpy.column_stack([columns[var_name] for var_name in names]).tolist() if names else [[]] * row_count
+        for row, values in enumerate(rows):
+            compiled.set_values(dict(zip(names, values)))
+            for expr_name, (_expression, cexprtk_expression) in compiled_rows.items():
+                computed[expr_name][row] = cexprtk_expression.value()
+        for expr_name, (expression, _cexprtk_expression) in compiled_rows.items():
+            result[expr_name] = round_expression_values(expression, computed[expr_name])
+    
+    # in the order of the expressions, as evaluate_expressions gives them
+    return dict((expr_name, result[expr_name]) for expr_name in expressions)
+
+
 def check_expressions(expressions):
     """
     Checks whether the expressions are parse-able
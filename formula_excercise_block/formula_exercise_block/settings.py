@@ -6,3 +6,18 @@ database = {
   	'raise_on_warnings': True,
     'buffered': True,
 }
+
+# db_service keeps up to `size` connections open; one idle for more than
+# `check_after` seconds is checked before it's used again.
+database_pool = {
+    'size': 5,
+    'check_after': 30,
+    'timeout': 10,
+}
+
+# db_service keeps up to `size` question templates in memory, each for
+# `ttl` seconds; edits made in another process show up after that.
+template_cache = {
+    'ttl': 300,
+    'size': 1000,
+}
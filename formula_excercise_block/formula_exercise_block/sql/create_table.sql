@@ -12,6 +12,7 @@ CREATE TABLE edxapp.variable (
 	min_value INT(6) NOT NULL,
 	max_value INT(6) NOT NULL,
 	decimal_places INT(3),
+	INDEX variable_xblock_id (xblock_id),
 	FOREIGN KEY (xblock_id) REFERENCES edxapp.question_template(xblock_id) ON DELETE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8 COLLATE=utf8_general_ci AUTO_INCREMENT=40;
 
@@ -22,5 +23,6 @@ CREATE TABLE edxapp.expression (
 	type VARCHAR(32) NOT NULL,
 	formula VARCHAR(2048) NOT NULL,
 	decimal_places INT(3),
+	INDEX expression_xblock_id (xblock_id),
 	FOREIGN KEY (xblock_id) REFERENCES edxapp.question_template(xblock_id) ON DELETE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8 COLLATE=utf8_general_ci AUTO_INCREMENT=40;
\ No newline at end of file
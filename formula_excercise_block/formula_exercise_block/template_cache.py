@@ -0,0 +1,83 @@
+"""
+A process-wide cache of question templates, for db_service.
+
+A question template, with its variables and expressions, is authored
+content: it only changes when it's edited in Studio. db_service reads
+templates through a TemplateCache, so the learner views of a block need no
+database queries while its template is cached. Edits and deletions made
+through db_service drop the cached template; the ones made by another
+process show up once the `ttl` of the cached copy runs out.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+def _copy(data):
+    """Copy a (question_template, variables, expressions) tuple, so callers can't change the cached one."""
+    question_template, variables, expressions = data
+    return (
+        question_template,
+        dict((name, dict(variable)) for name, variable in variables.items()),
+        dict((name, dict(expression)) for name, expression in expressions.items()),
+    )
+
+
+class TemplateCache(object):
+    """
+    Keeps the (question_template, variables, expressions) of up to `size`
+    xblocks, each for `ttl` seconds.
+    """
+
+    def __init__(self, ttl=300, size=1000):
+        self.ttl = ttl
+        self.size = size
+        self._templates = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def get(self, xblock_id):
+        """Returns a copy of the cached template data of `xblock_id`, or None."""
+        with self._lock:
+            entry = self._templates.get(xblock_id)
+            if entry is None or entry[0] <= time.monotonic():
+                self._templates.pop(xblock_id, None)
+                self.stats['misses'] += 1
+                return None
+            self._templates.move_to_end(xblock_id)
+            self.stats['hits'] += 1
+        return _copy(entry[1])
+
+    def __contains__(self, xblock_id):
+        with self._lock:
+            entry = self._templates.get(xblock_id)
+            return entry is not None and entry[0] > time.monotonic()
+
+    def put(self, xblock_id, question_template, variables, expressions):
+        """Caches the template data of `xblock_id`."""
+        if self.ttl <= 0 or self.size <= 0:
+            return
+        data = _copy((question_template, variables, expressions))
+        with self._lock:
+            self._templates[xblock_id] = (time.monotonic() + self.ttl, data)
+            self._templates.move_to_end(xblock_id)
+            while len(self._templates) > self.size:
+                self._templates.popitem(last=False)
+
+    def invalidate(self, xblock_id, partial=False):
+        """
+        Drops the cached template data of `xblock_id`, or with `partial`, of
+        every xblock whose id contains `xblock_id`.
+        """
+        with self._lock:
+            if partial:
+                for cached_id in [cached_id for cached_id in self._templates if xblock_id in cached_id]:
+                    del self._templates[cached_id]
+            else:
+                self._templates.pop(xblock_id, None)
+
+    def clear(self):
+        """Drops all cached template data."""
+        with self._lock:
+            self._templates.clear()
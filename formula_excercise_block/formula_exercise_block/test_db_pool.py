@@ -0,0 +1,195 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+import unittest
+
+import db_pool
+import db_service
+import template_cache
+
+# The tables of sql/create_table.sql, in SQLite's dialect.
+SQLITE_TABLES = [
+    "CREATE TABLE edxapp.question_template (id INTEGER PRIMARY KEY, xblock_id VARCHAR(255) NOT NULL UNIQUE, template VARCHAR(2048) NOT NULL)",
+    "CREATE TABLE edxapp.variable (id INTEGER PRIMARY KEY, xblock_id VARCHAR(255) NOT NULL, name VARCHAR(32) NOT NULL, type VARCHAR(32) NOT NULL, min_value INT NOT NULL, max_value INT NOT NULL, decimal_places INT)",
+    "CREATE TABLE edxapp.expression (id INTEGER PRIMARY KEY, xblock_id VARCHAR(255) NOT NULL, name VARCHAR(32) NOT NULL, type VARCHAR(32) NOT NULL, formula VARCHAR(2048) NOT NULL, decimal_places INT)",
+    "CREATE INDEX edxapp.variable_xblock_id ON variable (xblock_id)",
+    "CREATE INDEX edxapp.expression_xblock_id ON expression (xblock_id)",
+    "CREATE TABLE edxapp.submissions_studentitem (id INTEGER PRIMARY KEY, item_id VARCHAR(255))",
+    "CREATE TABLE edxapp.submissions_submission (id INTEGER PRIMARY KEY, student_item_id INT)",
+]
+
+
+def sqlite_pool(directory, **options):
+    """
+    Returns a ConnectionPool on an SQLite stand-in for the edxapp database, in `directory`.
+    """
+    path = os.path.join(directory, 'edxapp.db')
+
+    def connect():
+        connection = sqlite3.connect(':memory:', check_same_thread=False)
+        connection.execute("ATTACH DATABASE ? AS edxapp", (path,))
+        return connection
+
+    return db_pool.ConnectionPool(connect, paramstyle=sqlite3.paramstyle, **options)
+
+
+class ConnectionPoolTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.pool = sqlite_pool(self.directory, size=2, timeout=0.01)
+        with self.pool.cursor() as cursor:
+            cursor.execute("CREATE TABLE edxapp.item (value INT)")
+
+    def tearDown(self):
+        self.pool.close()
+        shutil.rmtree(self.directory)
+
+    def test_reuses_connections(self):
+        for value in range(3):
+            with self.pool.cursor() as cursor:
+                cursor.execute(self.pool.sql("INSERT INTO edxapp.item (value) VALUES (%s)"), (value,))
+        self.assertEqual(self.pool.stats['connects'], 1)
+        self.assertEqual(self.pool.stats['reuses'], 3)
+
+    def test_rolls_back_failed_work(self):
+        with self.assertRaises(ZeroDivisionError):
+            with self.pool.cursor() as cursor:
+                cursor.execute("INSERT INTO edxapp.item (value) VALUES (1)")
+                1 / 0
+        with self.pool.cursor() as cursor:
+            cursor.execute("SELECT count(*) FROM edxapp.item")
+            self.assertEqual(cursor.fetchone()[0], 0)
+
+    def test_replaces_broken_connections(self):
+        self.pool.check_after = 0
+        with self.pool.connection() as connection:
+            pass
+        connection.close()  # as if the server had dropped it
+        with self.pool.cursor() as cursor:
+            cursor.execute("SELECT count(*) FROM edxapp.item")
+        self.assertEqual(self.pool.stats['discarded'], 1)
+        self.assertEqual(self.pool.stats['connects'], 2)
+
+    def test_returns_connections_on_any_exception(self):
+        for _ in range(3):
+            borrowing = self.pool.connection()
+            borrowing.__enter__()
+            borrowing.__exit__(KeyboardInterrupt, KeyboardInterrupt(), None)
+            # What a generator abandoned inside the `with` block does.
+            borrowing = self.pool.connection()
+            borrowing.__enter__()
+            borrowing.gen.close()
+        with self.pool.connection(), self.pool.connection():
+            pass
+        self.assertEqual(self.pool.stats['connects'], 2)
+
+    def test_waits_for_a_free_connection(self):
+        with self.pool.connection(), self.pool.connection():
+            with self.assertRaises(db_pool.PoolExhausted):
+                with self.pool.connection():
+                    pass
+        with self.pool.connection():
+            pass
+
+
+class DbServiceSqliteTest(unittest.TestCase):
+
+    xblock_id = "block-v1:Home+CS107+2017_T1+type@formula_exercise_block+block@it's"
+
+    variables = {
+        'a': {'name': 'a', 'type': 'int', 'min_value': 0, 'max_value': 10, 'decimal_places': 2},
+        'b': {'name': 'b', 'type': 'float', 'min_value': 10, 'max_value': 20, 'decimal_places': 3},
+    }
+
+    expressions = {
+        'sum': {'name': 'sum', 'type': 'float', 'formula': 'a+b', 'decimal_places': 2},
+    }
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.pool = sqlite_pool(self.directory)
+        with self.pool.cursor() as cursor:
+            for table in SQLITE_TABLES:
+                cursor.execute(table)
+        db_service.set_pool(self.pool)
+
+    def tearDown(self):
+        db_service.set_pool(None)
+        shutil.rmtree(self.directory)
+
+    def test_question_template_round_trip(self):
+        self.assertFalse(db_service.is_block_in_db(self.xblock_id))
+        db_service.create_question_template(self.xblock_id, "Given <a> and <b>", self.variables, self.expressions)
+        self.assertTrue(db_service.is_block_in_db(self.xblock_id))
+        self.assertEqual(
+            db_service.fetch_question_template_data(self.xblock_id),
+            ("Given <a> and <b>", self.variables, self.expressions)
+        )
+
+        variables = {'a': self.variables['a']}
+        db_service.update_question_template(self.xblock_id, "Given <a>", variables, self.expressions)
+        self.assertEqual(
+            db_service.fetch_question_template_data(self.xblock_id),
+            ("Given <a>", variables, self.expressions)
+        )
+
+        db_service.delete_xblock(self.xblock_id)
+        self.assertFalse(db_service.is_block_in_db(self.xblock_id))
+        self.assertEqual(self.pool.stats['connects'], 1)
+
+    def test_fetch_question_template_data(self):
+        self.assertEqual(db_service.fetch_question_template_data(self.xblock_id), ("", {}, {}))
+
+        db_service.create_question_template(self.xblock_id, "No variables", {}, {})
+        self.assertEqual(db_service.fetch_question_template_data(self.xblock_id), ("No variables", {}, {}))
+
+        variables = dict(
+            ('v%d' % number, {'name': 'v%d' % number, 'type': 'int', 'min_value': 0, 'max_value': number, 'decimal_places': 0})
+            for number in range(100)
+        )
+        db_service.update_question_template(self.xblock_id, "Many variables", variables, self.expressions)
+        question_template, fetched_variables, expressions = db_service.fetch_question_template_data(self.xblock_id)
+        self.assertEqual(question_template, "Many variables")
+        self.assertEqual(list(fetched_variables.items()), list(variables.items()))
+        self.assertEqual(expressions, self.expressions)
+
+    def test_template_cache(self):
+        db_service.create_question_template(self.xblock_id, "Given <a> and <b>", self.variables, self.expressions)
+        borrowed = self.pool.stats['reuses']
+
+        # A learner view needs no queries while the template is cached.
+        self.assertTrue(db_service.is_block_in_db(self.xblock_id))
+        question_template, variables, expressions = db_service.fetch_question_template_data(self.xblock_id)
+        self.assertEqual((question_template, variables, expressions), ("Given <a> and <b>", self.variables, self.expressions))
+        self.assertEqual(self.pool.stats['reuses'], borrowed)
+        variables['a']['max_value'] = 1000
+        self.assertEqual(db_service.fetch_question_template_data(self.xblock_id)[1], self.variables)
+
+        db_service.update_question_template(self.xblock_id, "Given <a>", {}, {})
+        self.assertEqual(db_service.fetch_question_template_data(self.xblock_id), ("Given <a>", {}, {}))
+
+        db_service.delete_xblock(self.xblock_id)
+        self.assertNotIn(self.xblock_id, db_service.template_cache)
+        self.assertFalse(db_service.is_block_in_db(self.xblock_id))
+
+    def test_template_cache_expires(self):
+        cache = template_cache.TemplateCache(ttl=0.01)
+        cache.put(self.xblock_id, "Given <a>", {}, {})
+        self.assertEqual(cache.get(self.xblock_id), ("Given <a>", {}, {}))
+        time.sleep(0.02)
+        self.assertIsNone(cache.get(self.xblock_id))
+        self.assertEqual(cache.stats, {'hits': 1, 'misses': 1})
+
+    def test_is_xblock_submitted(self):
+        with self.pool.cursor() as cursor:
+            cursor.execute("INSERT INTO edxapp.submissions_studentitem (id, item_id) VALUES (1, ?)", (self.xblock_id,))
+            cursor.execute("INSERT INTO edxapp.submissions_submission (student_item_id) VALUES (1)")
+        self.assertTrue(db_service.is_xblock_submitted(self.xblock_id))
+        self.assertFalse(db_service.is_xblock_submitted(self.xblock_id + "' OR '1'='1"))
+
+
+if __name__ == '__main__':
+    unittest.main()
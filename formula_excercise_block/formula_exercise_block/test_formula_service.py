@@ -79,7 +79,7 @@ class FormulaServiceTest(unittest.TestCase):
         
         
         self.assertTrue(len(result) == 4)
-    for expression_name, evaluation_result in result.items():
+        for expression_name, evaluation_result in result.items():
             self.assertTrue(evaluation_result)
   
     
@@ -157,7 +157,7 @@ class FormulaServiceTest(unittest.TestCase):
         
         
         self.assertTrue(len(result) == 4)
-    for expression_name, evaluation_result in result.items():
+        for expression_name, evaluation_result in result.items():
             self.assertFalse(evaluation_result)
   
 
@@ -395,7 +395,7 @@ class FormulaServiceTest(unittest.TestCase):
         
         
         check_result = formula_service.check_expressions(expressions)
-        self.assertTrue(length(check_result) == 1)
+        self.assertTrue(len(check_result) == 1)
         self.assertTrue('expr4' in check_result)
         
         
@@ -539,5 +539,74 @@ class FormulaServiceTest(unittest.TestCase):
         self.assertAlmostEqual(expected_tan_value, calculated_tan_value, 2)
 
 
+    def test_evaluate_compiled_expressions(self):
+        
+        a_variable = { 'name': 'a', 'type': 'int', 'min_value': 0, 'max_value': 10, 'decimal_places': 0 }
+        b_variable = { 'name': 'b', 'type': 'float', 'min_value': 0, 'max_value': 10, 'decimal_places': 2 }
+        
+        expressions = {
+            'Sum': { 'name': 'Sum', 'type': 'float', 'formula': 'a+b', 'decimal_places': 2 },
+            'Power': { 'name': 'Power', 'type': 'int', 'formula': 'a^2+sin(b)', 'decimal_places': 0 },
+            'Circle': { 'name': 'Circle', 'type': 'float', 'formula': 'pi*b^2', 'decimal_places': 3 }
+        }
+        
+        # the compiled formulas are reused with each student's values
+        for a_value, b_value in [ (10, 5.5), (3, 0.25), ('7', '1.75') ]:
+            variables = {
+                'a': [ a_variable, a_value ],
+                'b': [ b_variable, b_value ]
+            }
+            self.assertEqual(
+                formula_service.evaluate_expressions(variables, expressions, xblock_id='block-compiled'),
+                formula_service.evaluate_expressions(variables, expressions)
+            )
+        
+        # another block with the same formulas gets its own symbol table
+        variables = { 'a': [ a_variable, 2 ], 'b': [ b_variable, 4 ] }
+        result = formula_service.evaluate_expressions(variables, expressions, xblock_id='block-other')
+        self.assertTrue(result['Sum'] == 6)
+        
+        # the variables of a block may change when it is edited
+        variables = { 'a': [ a_variable, 2 ] }
+        result = formula_service.evaluate_expressions(variables, { 'Double': { 'name': 'Double', 'type': 'int', 'formula': '2*a', 'decimal_places': 0 } }, xblock_id='block-compiled')
+        self.assertTrue(result['Double'] == 4)
+
+
+    @unittest.skipIf(formula_service.numpy is None, "NumPy is not installed")
+    def test_evaluate_expressions_batch(self):
+        
+        variables = {
+            'a': { 'name': 'a', 'type': 'int', 'min_value': 0, 'max_value': 10, 'decimal_places': 0 },
+            'b': { 'name': 'b', 'type': 'float', 'min_value': 0, 'max_value': 10, 'decimal_places': 2 }
+        }
+        
+        expressions = {
+            'Sum': { 'name': 'Sum', 'type': 'float', 'formula': 'a+b', 'decimal_places': 2 },
+            'Quotient': { 'name': 'Quotient', 'type': 'float', 'formula': '(a-1.5)/b', 'decimal_places': 3 },
+            'Third': { 'name': 'Third', 'type': 'float', 'formula': 'b/3', 'decimal_places': 3 },
+            'Power': { 'name': 'Power', 'type': 'int', 'formula': 'a^2+sin(b)', 'decimal_places': 0 },
+            'Constant': { 'name': 'Constant', 'type': 'float', 'formula': '7.5/9', 'decimal_places': 3 },
+            'Divided': { 'name': 'Divided', 'type': 'float', 'formula': 'b/a', 'decimal_places': 3 },
+            'DividedSine': { 'name': 'DividedSine', 'type': 'float', 'formula': 'sin(b)/a', 'decimal_places': 3 }
+        }
+        
+        # int variables are truncated, as evaluate_expressions does, -0.7 to 0 rather than -0
+        variable_matrix = [ [10, 5.5], [3.7, 0.25], [0, 0], [-2, 1.125], [7, 9.995], [-0.7, 2.5] ]
+        
+        result = formula_service.evaluate_expressions_batch(variables, expressions, variable_matrix)
+        self.assertEqual(list(result), list(expressions))
+        for row, (a_value, b_value) in enumerate(variable_matrix):
+            expected = formula_service.evaluate_expressions(
+                { 'a': [ variables['a'], a_value ], 'b': [ variables['b'], b_value ] },
+                expressions
+            )
+            for expr_name, expr_value in expected.items():
+                # repr tells inf from -inf and 0.0 from -0.0, and nan equals nan
+                self.assertEqual(repr(float(result[expr_name][row])), repr(float(expr_value)), (expr_name, row))
+        
+        with self.assertRaises(ValueError):
+            formula_service.evaluate_expressions_batch(variables, expressions, [ [1, 2, 3] ])
+
+
 if __name__ == '__main__':
     unittest.main()
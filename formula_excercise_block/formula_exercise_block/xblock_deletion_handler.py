@@ -19,6 +19,8 @@ if SignalHandler is not None:
         """Handle deletion inside full platform (no-op in workbench)."""
         usage_key = usage_key.for_branch(None)
         if db_service is not None:
+            # Drop the cached template even if the rows can't be deleted.
+            db_service.template_cache.invalidate(str(usage_key), partial=True)
             try:
                 db_service.delete_xblock(str(usage_key))
             except Exception:
@@ -41,6 +41,7 @@ setup(
     ],
     install_requires=[
         'XBlock',
+        'xblock-resource-cache',
         'xblock-utils',
         'cexprtk',
     ],
@@ -48,6 +49,9 @@ setup(
         'mysql': [
             'mysql-connector-python>=8.0,<9.0'
         ],
+        'batch': [
+            'numpy'
+        ],
     },
     entry_points={
         'xblock.v1': [
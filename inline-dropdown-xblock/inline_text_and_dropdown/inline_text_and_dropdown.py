@@ -5,8 +5,7 @@ import random
 import textwrap
 from io import StringIO
 
-import pkg_resources
-from django.template import Context, Template
+from django.template import Context
 from django.utils.translation import gettext as _
 from django.utils.translation import ngettext
 from lxml import etree
@@ -14,8 +13,8 @@ from lxml.etree import Element, ElementTree, SubElement
 from web_fragments.fragment import Fragment
 from xblock.core import XBlock
 from xblock.fields import Boolean, Dict, Float, Integer, List, Scope, String
-from xblockutils.resources import ResourceLoader
 from xblockutils.settings import ThemableXBlockMixin, XBlockWithSettingsMixin
+from xblock_resource_cache import CachedResourceLoader
 try:
     from xmodule.progress import Progress
 except Exception:
@@ -36,7 +35,7 @@ except Exception:
 from inline_text_and_dropdown.xml_parser import XmlParser
 
 log = logging.getLogger(__name__)
-loader = ResourceLoader(__name__)
+loader = CachedResourceLoader(__name__)
 
 
 @XBlock.needs('i18n')
@@ -422,23 +421,20 @@ class InlineTextAndDropdownXBlock(XBlock, XBlockWithSettingsMixin, ThemableXBloc
         Gets the content of a resource
         """
 
-        resource_content = pkg_resources.resource_string(__name__, resource_path)
-        return str(resource_content, encoding='utf-8')
+        return loader.load_unicode(resource_path)
 
     def render_template(self, template_path, context={}):
         """
         Evaluate a template by resource path, applying the provided context
         """
 
-        template_str = str(self.load_resource(template_path))
-        return Template(template_str).render(Context(context))
+        return loader.load_django_template(template_path).render(Context(context))
 
     def resource_string(self, path):
         """
         Handy helper for getting resources from our kit.
         """
-        data = pkg_resources.resource_string(__name__, path)
-        return data.decode('utf-8')
+        return loader.load_unicode(path)
 
     def _get_body(self, xmlstring):
         """
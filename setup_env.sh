@@ -38,6 +38,13 @@ pip install django-pyfs
 # 5. Install XBlocks in development mode
 echo "📚 Installing XBlocks in development mode..."
 
+if [ -d "xblock-resource-cache" ]; then
+    echo "  - Installing xblock-resource-cache..."
+    pip install -e ./xblock-resource-cache
+else
+    echo "  ⚠️  Warning: xblock-resource-cache directory not found"
+fi
+
 if [ -d "xblock-sdk" ]; then
     echo "  - Installing XBlock SDK..."
     pip install -e ./xblock-sdk
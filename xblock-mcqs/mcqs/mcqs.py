@@ -1,8 +1,6 @@
 """ An XBlock to for Multiple Choice Questions """
 
-import pkg_resources
-
-from django.template import Template, Context
+from django.template import Context
 
 from xblock.core import XBlock
 from xblock.fields import Scope, Integer, String, List, Boolean, Float
@@ -11,6 +9,10 @@ from xblock.scorable import ScorableXBlockMixin, Score
 from xblock.validation import ValidationMessage
 
 from xblockutils.studio_editable import StudioEditableXBlockMixin
+from xblock_resource_cache import CachedResourceLoader
+
+
+loader = CachedResourceLoader(__name__)
 
 
 class McqsXBlock(ScorableXBlockMixin, XBlock, StudioEditableXBlockMixin):
@@ -51,8 +53,7 @@ class McqsXBlock(ScorableXBlockMixin, XBlock, StudioEditableXBlockMixin):
         """
         Handy helper for getting resources from our kit.
         """
-        data = pkg_resources.resource_string(__name__, path)
-        return data.decode("utf8")
+        return loader.load_unicode(path)
 
     def student_view(self, context=None):
         """
@@ -64,7 +65,7 @@ class McqsXBlock(ScorableXBlockMixin, XBlock, StudioEditableXBlockMixin):
 
         context.update({'self': self})
 
-        html = Template(self.resource_string("static/html/mcqs.html")).render(Context(context))
+        html = loader.load_django_template("static/html/mcqs.html").render(Context(context))
         frag = Fragment(html)
         frag.add_css(self.resource_string("static/css/mcqs.css"))
         frag.add_javascript(self.resource_string("static/js/src/mcqs.js"))
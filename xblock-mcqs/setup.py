@@ -29,6 +29,7 @@ setup(
     ],
     install_requires=[
         'XBlock',
+        'xblock-resource-cache',
         'xblock-utils',
     ],
     entry_points={
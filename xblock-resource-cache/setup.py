@@ -0,0 +1,17 @@
+"""Setup for the cached XBlock resource loader."""
+
+from setuptools import setup
+
+
+setup(
+    name='xblock-resource-cache',
+    version='0.1',
+    description='A ResourceLoader that keeps the resources and templates it reads',
+    packages=[
+        'xblock_resource_cache',
+    ],
+    install_requires=[
+        'Django',
+        'XBlock',
+    ],
+)
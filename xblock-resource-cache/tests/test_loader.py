@@ -0,0 +1,50 @@
+"""Tests for CachedResourceLoader."""
+
+import os
+import unittest
+
+import django
+from django.conf import settings
+
+from xblock_resource_cache import CachedResourceLoader, clear
+
+if not settings.configured:
+    settings.configure(TEMPLATES=[{'BACKEND': 'django.template.backends.django.DjangoTemplates'}])
+    django.setup()
+
+TEMPLATE = os.path.join(os.path.dirname(__file__), 'resources', 'hello.html')
+
+
+class CachedResourceLoaderTest(unittest.TestCase):
+    """Tests for CachedResourceLoader."""
+
+    def setUp(self):
+        clear()
+        self.loader = CachedResourceLoader(__name__)
+        with open(TEMPLATE, encoding='utf-8') as template_file:
+            self.original = template_file.read()
+        self.addCleanup(self._restore)
+
+    def _restore(self):
+        with open(TEMPLATE, 'w', encoding='utf-8') as template_file:
+            template_file.write(self.original)
+        clear()
+
+    def test_resources_are_read_once(self):
+        text = self.loader.load_unicode('resources/hello.html')
+        self.assertEqual(text, 'Hello {{ name }}\n')
+        self.assertIs(self.loader.load_unicode('/resources/hello.html'), text)
+
+    def test_templates_are_compiled_once(self):
+        template = self.loader.load_django_template('resources/hello.html')
+        self.assertIs(self.loader.load_django_template('resources/hello.html'), template)
+        self.assertEqual(self.loader.render_django_template('resources/hello.html', {'name': 'Ada'}), 'Hello Ada\n')
+
+    def test_changed_files_are_read_again(self):
+        self.loader.render_django_template('resources/hello.html', {'name': 'Ada'})
+        with open(TEMPLATE, 'w', encoding='utf-8') as template_file:
+            template_file.write('Goodbye {{ name }}\n')
+        stat = os.stat(TEMPLATE)
+        os.utime(TEMPLATE, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000))
+        self.assertEqual(self.loader.load_unicode('resources/hello.html'), 'Goodbye {{ name }}\n')
+        self.assertEqual(self.loader.render_django_template('resources/hello.html', {'name': 'Ada'}), 'Goodbye Ada\n')
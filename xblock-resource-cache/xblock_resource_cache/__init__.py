@@ -0,0 +1,101 @@
+"""
+A cached resource loader for the XBlocks in this repository.
+
+`CachedResourceLoader` is the `ResourceLoader` XBlocks already use (from
+`xblock.utils.resources`, formerly xblock-utils), except that each resource
+is read once and kept, keyed on its package and path, and each Django
+template is compiled once. A resource that comes from a file is read again
+when the file's modification time changes, so edits show up without
+restarting the server; that costs one stat per use.
+"""
+
+import importlib
+import importlib.resources
+import os
+import threading
+
+from django.template import Context, Engine, Template
+from django.template.backends.django import get_installed_libraries
+from xblock.utils.resources import ResourceLoader
+
+# Resources read by any loader, by (package, path), as (file mtime, text).
+_RESOURCES = {}
+# Compiled templates, by (package, path, engine), as (source text, Template).
+_TEMPLATES = {}
+_lock = threading.Lock()
+
+
+def _mtime(resource):
+    """Return the modification time of `resource`'s file, or None if it isn't a file."""
+    try:
+        return os.stat(resource).st_mtime_ns
+    except (OSError, TypeError):
+        return None
+
+
+def clear():
+    """Forget all the resources and templates read so far."""
+    with _lock:
+        _RESOURCES.clear()
+        _TEMPLATES.clear()
+
+
+class CachedResourceLoader(ResourceLoader):
+    """Loads resources relative to the module named `module_name`, keeping what it reads."""
+
+    def __init__(self, module_name):
+        super().__init__(module_name)
+        self._package = None
+        self._engine = None
+
+    @property
+    def package(self):
+        """The package the resources are read from."""
+        if self._package is None:
+            self._package = importlib.import_module(self.module_name).__package__
+        return self._package
+
+    def load_unicode(self, resource_path):
+        """Return the text of the resource at `resource_path`."""
+        # Like ResourceLoader, tolerate the leading slash pkg_resources ignored.
+        resource_path = resource_path.lstrip('/')
+        resource = importlib.resources.files(self.package).joinpath(resource_path)
+        mtime = _mtime(resource)
+        key = (self.package, resource_path)
+        cached = _RESOURCES.get(key)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, resource.read_text(encoding="utf-8"))
+            with _lock:
+                _RESOURCES[key] = cached
+        return cached[1]
+
+    def load_django_template(self, template_path, engine=None):
+        """
+        Return the Django template at `template_path`, compiled once per change of its source.
+
+        Without `engine`, the template uses the default Django engine, as
+        `Template(text)` does.
+        """
+        text = self.load_unicode(template_path)
+        key = (self.package, template_path.lstrip('/'), engine)
+        cached = _TEMPLATES.get(key)
+        if cached is None or cached[0] is not text:
+            cached = (text, Template(text, engine=engine))
+            with _lock:
+                _TEMPLATES[key] = cached
+        return cached[1]
+
+    def render_django_template(self, template_path, context=None, i18n_service=None):
+        """
+        Evaluate a django template by resource path, applying the provided context.
+
+        The template is compiled with the same engine as `ResourceLoader`'s,
+        which is made once per loader.
+        """
+        context = context or {}
+        context['_i18n_service'] = i18n_service
+        if self._engine is None:
+            libraries = get_installed_libraries()
+            libraries['i18n'] = 'xblock.utils.templatetags.i18n'
+            self._engine = Engine(libraries=libraries)
+        return self.load_django_template(template_path, self._engine).render(Context(context))
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Compare WSGI and ASGI handler throughput when some handlers are slow.
+
+Calls a handler that waits `--fast-ms`, or `--slow-ms` for a `--slow-share`
+of the calls, the way a handler waiting on MySQL or grading a large answer
+does. Under WSGI the calls go through Django's WSGI handler from
+`--workers` threads, like that many synchronous workers. Under ASGI they
+go through Django's ASGI handler to `async_handler`, `--concurrency` at a
+time on one event loop, with `--threads` handler threads. Each mode runs
+in its own process against a throwaway SQLite database.
+
+Usage: python benchmarks/bench_asgi_handlers.py [--calls N] [--workers N] [--concurrency N] [--threads N]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "workbench.settings")
+
+import django  # isort:skip  # pylint: disable=wrong-import-position
+
+from xblock.core import XBlock  # isort:skip  # pylint: disable=wrong-import-position
+
+
+class WaitingBlock(XBlock):
+    """An XBlock whose handler waits as long as it's asked to."""
+    @XBlock.json_handler
+    def wait(self, data, suffix=''):  # pylint: disable=unused-argument
+        """Wait `data['ms']` milliseconds."""
+        time.sleep(data['ms'] / 1000)
+        return {}
+
+
+def waits(args):
+    """Return how long each call's handler waits, in ms."""
+    rand = random.Random(0)
+    return [args.slow_ms if rand.random() < args.slow_share else args.fast_ms for _ in range(args.calls)]
+
+
+def run_wsgi(url, args):
+    """Make the calls through the WSGI handler, return their latencies and the elapsed time."""
+    from django.test import Client  # pylint: disable=import-outside-toplevel
+
+    def call(numbered_wait):
+        number, wait = numbered_wait
+        start = time.perf_counter()
+        response = Client().post(f"{url}?student=student_{number % 50}", json.dumps({'ms': wait}), 'application/json')
+        assert response.status_code == 200, response.content
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.workers) as pool:
+        latencies = list(pool.map(call, enumerate(waits(args))))
+    return latencies, time.perf_counter() - start
+
+
+def run_asgi(url, args):
+    """Make the calls through the ASGI handler, return their latencies and the elapsed time."""
+    from django.test import AsyncClient  # pylint: disable=import-outside-toplevel
+
+    async def make_calls():
+        slots = asyncio.Semaphore(args.concurrency)
+
+        async def call(number, wait):
+            async with slots:
+                start = time.perf_counter()
+                response = await AsyncClient().post(
+                    f"{url}?student=student_{number % 50}", json.dumps({'ms': wait}), 'application/json',
+                )
+                assert response.status_code == 200, response.content
+                return time.perf_counter() - start
+
+        return await asyncio.gather(*(call(number, wait) for number, wait in enumerate(waits(args))))
+
+    start = time.perf_counter()
+    latencies = asyncio.run(make_calls())
+    return latencies, time.perf_counter() - start
+
+
+@XBlock.register_temp_plugin(WaitingBlock, 'bench_wait')
+def serve(args):
+    """Run one mode's calls in this process, and print its results as JSON."""
+    django.setup()
+    from workbench import scenarios  # pylint: disable=import-outside-toplevel
+
+    scenarios.add_xml_scenario('bench_wait', "Waiting handler", "<bench_wait/>")
+    url = f"/handler/{scenarios.SCENARIOS['bench_wait'].usage_id}/wait/"
+    latencies, elapsed = (run_asgi if args.serve == 'asgi' else run_wsgi)(url, args)
+    print(json.dumps({'latencies': latencies, 'elapsed': elapsed}))
+
+
+def main():
+    """Run the benchmark and print a table of results."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=400, help="handler calls in each mode")
+    parser.add_argument('--fast-ms', type=float, default=2, help="how long the fast handlers wait")
+    parser.add_argument('--slow-ms', type=float, default=300, help="how long the slow handlers wait")
+    parser.add_argument('--slow-share', type=float, default=0.2, help="the share of slow handler calls")
+    parser.add_argument('--workers', type=int, default=4, help="WSGI worker threads")
+    parser.add_argument('--concurrency', type=int, default=64, help="ASGI calls in flight at once")
+    parser.add_argument('--threads', type=int, default=16, help="ASGI handler threads")
+    parser.add_argument('--serve', choices=['wsgi', 'asgi'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        serve(args)
+        return
+
+    with tempfile.TemporaryDirectory() as db_dir:
+        env = dict(
+            os.environ,
+            WORKBENCH_DATABASES=json.dumps({
+                'default': {
+                    'ENGINE': 'django.db.backends.sqlite3',
+                    'NAME': os.path.join(db_dir, 'bench.db'),
+                    'OPTIONS': {'timeout': 30},
+                    'CONN_MAX_AGE': None,
+                }
+            }),
+            WORKBENCH_ASYNC_HANDLER_THREADS=str(args.threads),
+        )
+        manage = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'manage.py')
+        subprocess.run([sys.executable, manage, 'migrate', '-v0'], env=env, check=True)
+
+        print(
+            f"{args.calls} handler calls, {args.slow_share:.0%} waiting {args.slow_ms:g} ms, "
+            f"the rest {args.fast_ms:g} ms"
+        )
+        print(f"{'server':<34}{'calls/s':>9}{'p50 ms':>9}{'p99 ms':>9}")
+        modes = [
+            ('wsgi', f"WSGI, {args.workers} workers", 'false'),
+            ('asgi', f"ASGI, {args.concurrency} in flight, {args.threads} threads", 'true'),
+        ]
+        for mode, name, async_handlers in modes:
+            output = subprocess.run(
+                [sys.executable, __file__, '--serve', mode] + sys.argv[1:],
+                env=dict(env, WORKBENCH_ASYNC_HANDLERS=async_handlers),
+                check=True, capture_output=True, text=True,
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            latencies = sorted(result['latencies'])
+            percentiles = statistics.quantiles(latencies, n=100)
+            print(
+                f"{name:<34}{len(latencies) / result['elapsed']:>9.1f}"
+                f"{statistics.median(latencies) * 1000:>9.1f}{percentiles[98] * 1000:>9.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
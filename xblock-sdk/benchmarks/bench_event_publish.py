@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Measure how long a handler spends publishing events.
+
+Publishes `--events` events, in bursts of `--burst` (a drag-and-drop drop
+publishes three), to each sink: written on the spot, as publishing did
+before events were queued, and through `EventQueue`, whose background
+thread writes them in batches. Reports the time a publish takes, and for
+the queue, the time until everything is written and how many were dropped.
+
+Usage: python benchmarks/bench_event_publish.py [--events N] [--burst N] [--queue-size N]
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "workbench.settings")
+
+import django  # isort:skip  # pylint: disable=wrong-import-position
+
+django.setup()
+
+from workbench.events import (  # isort:skip  # pylint: disable=wrong-import-position
+    EventQueue,
+    JsonLinesEventSink,
+    LogEventSink,
+    SqliteEventSink,
+)
+
+DATA = {'value': 1, 'max_value': 1, 'item_id': 3, 'location': 'top', 'is_correct': True}
+
+
+def make_event(number):
+    """Return the dict `EventQueue.publish` would make for the `number`th event."""
+    return {
+        'time': time.time(),
+        'event_type': 'edx.drag_and_drop_v2.item.dropped',
+        'block_type': 'drag-and-drop-v2',
+        'usage_id': 'bench.drag-and-drop-v2.d0.u0',
+        'user_id': f'student_{number % 50}',
+        'data': DATA,
+    }
+
+
+def direct(sink, events, burst):
+    """Write each burst straight to `sink`, return the mean seconds per event."""
+    start = time.perf_counter()
+    for first in range(0, events, burst):
+        for number in range(first, min(first + burst, events)):
+            sink.write([make_event(number)])
+    elapsed = time.perf_counter() - start
+    sink.close()
+    return elapsed / events
+
+
+def queued(sink, events, burst, queue_size):
+    """Publish through an `EventQueue`, return the mean seconds per publish, to drain, and the stats."""
+    event_queue = EventQueue(sink, max_size=queue_size)
+    start = time.perf_counter()
+    for first in range(0, events, burst):
+        for number in range(first, min(first + burst, events)):
+            event = make_event(number)
+            event_queue.publish(event['event_type'], event['block_type'], event['usage_id'], event['user_id'], DATA)
+    published = time.perf_counter()
+    event_queue.close(timeout=60)
+    return (published - start) / events, time.perf_counter() - start, event_queue.stats()
+
+
+def main():
+    """Run the benchmark and print a table of results."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=10000, help="events to publish to each sink")
+    parser.add_argument('--burst', type=int, default=3, help="events published by each handler call")
+    parser.add_argument('--queue-size', type=int, default=10000, help="events the queue holds before dropping")
+    args = parser.parse_args()
+
+    # Log to a file, as the workbench does, rather than to the terminal.
+    with tempfile.TemporaryDirectory() as directory:
+        handler = logging.FileHandler(os.path.join(directory, 'events.log'))
+        logging.getLogger('workbench.events').addHandler(handler)
+        logging.getLogger('workbench.events').setLevel(logging.INFO)
+        sinks = [
+            ('log', lambda _name: LogEventSink()),
+            ('jsonl', lambda name: JsonLinesEventSink(os.path.join(directory, f'{name}.jsonl'))),
+            ('sqlite', lambda name: SqliteEventSink(os.path.join(directory, f'{name}.sqlite3'))),
+        ]
+        print(f"{args.events} events in bursts of {args.burst}")
+        print(f"{'sink':<8}{'direct us':>11}{'queued us':>11}{'drained s':>11}{'batches':>9}{'dropped':>9}")
+        for name, make_sink in sinks:
+            direct_seconds = direct(make_sink(f'{name}-direct'), args.events, args.burst)
+            queued_seconds, drained, stats = queued(
+                make_sink(f'{name}-queued'), args.events, args.burst, args.queue_size,
+            )
+            print(
+                f"{name:<8}{direct_seconds * 1e6:>11.1f}{queued_seconds * 1e6:>11.1f}"
+                f"{drained:>11.2f}{stats['batches']:>9}{stats['dropped']:>9}"
+            )
+        handler.close()
+
+
+if __name__ == "__main__":
+    main()
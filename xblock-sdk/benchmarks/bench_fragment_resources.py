@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Report scenario page sizes with fragment resource bundling.
+
+Shows a vertical of several thumbs blocks and problems, like a course unit,
+through the workbench URLs: as the page's own fragment renders it, and with
+its inline CSS and JavaScript bundled by `bundle_fragment_resources`. Runs
+against a throwaway SQLite database, with bundles in a throwaway directory.
+
+Usage: python benchmarks/bench_fragment_resources.py [--blocks N]
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "workbench.settings")
+DB_DIR = tempfile.mkdtemp()
+os.environ["WORKBENCH_DATABASES"] = json.dumps({
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(DB_DIR, 'bench.db'),
+    }
+})
+os.environ["WORKBENCH_FRAGMENT_BUNDLE_DIR"] = os.path.join(DB_DIR, 'bundles')
+
+import django  # isort:skip  # pylint: disable=wrong-import-position
+
+django.setup()
+
+from django.conf import settings  # isort:skip  # pylint: disable=wrong-import-position
+from django.core.management import call_command  # isort:skip  # pylint: disable=wrong-import-position
+from django.test import Client, override_settings  # isort:skip  # pylint: disable=wrong-import-position
+
+from workbench import scenarios  # isort:skip  # pylint: disable=wrong-import-position
+
+PROBLEM_XML = """
+<problem_demo>
+    <textinput_demo name="answer" input_type="int"/>
+    <equality_demo name="check" left="./answer/@student_input" right="=4"/>
+</problem_demo>
+"""
+
+
+def page_size(client, url, bundle):
+    """Return the size of the page at `url`, and of the bundles it links to."""
+    workbench_settings = dict(settings.WORKBENCH, bundle_fragment_resources=bundle)
+    with override_settings(WORKBENCH=workbench_settings):
+        response = client.get(url)
+    bundle_urls = set(re.findall(r'/bundle/[0-9a-f]+\.(?:css|js)', response.content.decode('utf-8')))
+    bundles = sum(len(client.get(bundle_url).content) for bundle_url in bundle_urls)
+    return len(response.content), bundles
+
+
+def main():
+    """Run the benchmark and print a table of results."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--blocks', type=int, default=10, help="thumbs blocks and problems in the vertical")
+    args = parser.parse_args()
+
+    call_command('migrate', verbosity=0)
+    xml = "<vertical_demo>%s</vertical_demo>" % (("<thumbs/>" + PROBLEM_XML) * args.blocks)
+    scenarios.add_xml_scenario("bench.0", "Fragment resources benchmark", xml)
+    scenarios.get_scenarios.initialized = True
+    client = Client()
+    url = "/scenario/bench.0/"
+
+    print(f"vertical of {args.blocks} thumbs blocks and {args.blocks} problems")
+    print(f"{'resources':<22}{'page bytes':>12}{'bundle bytes':>14}")
+    for name, bundle in (('as rendered', False), ('bundled', True)):
+        page, bundles = page_size(client, url, bundle)
+        print(f"{name:<22}{page:>12}{bundles:>14}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Compare the one-blob-per-scope and one-row-per-field KVS layouts.
+
+Runs concurrent thumbs `vote` handler calls against a throwaway SQLite
+database with each layout, and reports throughput and how many votes were
+lost to concurrent read-modify-write cycles.
+
+Usage: python benchmarks/bench_kvs_layouts.py [--threads N] [--calls N]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "workbench.settings")
+DB_DIR = tempfile.mkdtemp()
+os.environ["WORKBENCH_DATABASES"] = json.dumps({
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(DB_DIR, 'bench.db'),
+        'OPTIONS': {'timeout': 60},
+    }
+})
+
+import django  # isort:skip  # pylint: disable=wrong-import-position
+
+django.setup()
+
+import webob  # isort:skip  # pylint: disable=wrong-import-position
+
+from django.core.management import call_command  # isort:skip  # pylint: disable=wrong-import-position
+from django.db import connection  # isort:skip  # pylint: disable=wrong-import-position
+
+from workbench import runtime  # isort:skip  # pylint: disable=wrong-import-position
+
+LAYOUTS = [
+    ('blob per scope', runtime.WorkbenchDjangoKeyValueStore),
+    ('row per field', runtime.WorkbenchFieldKeyValueStore),
+]
+
+
+def vote(usage_id, student_id):
+    """Make one 'up' vote on the thumbs block, like `views.handler` would."""
+    with runtime.WORKBENCH_KVS.request_cache():
+        block_runtime = runtime.WorkbenchRuntime(student_id)
+        block = block_runtime.get_block(usage_id)
+        request = webob.Request.blank('/', method='POST', body=json.dumps({'voteType': 'up'}).encode('utf-8'))
+        block_runtime.handle(block, 'vote', request)
+
+
+def run_layout(kvs, threads, calls):
+    """Hammer a fresh thumbs block with `threads` x `calls` votes, return (seconds, upvotes, errors)."""
+    runtime.WORKBENCH_KVS = kvs
+    runtime.ID_MANAGER.set_scenario(f"bench-{kvs.__class__.__name__.lower()}")
+    usage_id = runtime.WorkbenchRuntime().parse_xml_string("<thumbs/>")
+    # Create the shared rows up front: the blob layout has no unique index, so
+    # racing to create them would leave duplicates behind.
+    vote(usage_id, "warmup")
+    errors = []
+
+    def worker(number):
+        try:
+            for _ in range(calls):
+                try:
+                    vote(usage_id, f"student_{number}")
+                except Exception as ex:  # pylint: disable=broad-exception-caught
+                    errors.append(ex)
+        finally:
+            connection.close()
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    block = runtime.WorkbenchRuntime("reader").get_block(usage_id)
+    return elapsed, block.upvotes - 1, errors
+
+
+def main():
+    """Run the benchmark and print a table of results."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=8, help="concurrent students")
+    parser.add_argument('--calls', type=int, default=50, help="votes per student")
+    args = parser.parse_args()
+
+    call_command('migrate', verbosity=0)
+    expected = args.threads * args.calls
+    print(f"{args.threads} threads x {args.calls} votes = {expected} votes per layout")
+    print(f"{'layout':<18}{'seconds':>9}{'votes/s':>10}{'stored':>9}{'lost':>7}{'errors':>8}")
+    for name, kvs_class in LAYOUTS:
+        elapsed, upvotes, errors = run_layout(kvs_class(), args.threads, args.calls)
+        print(
+            f"{name:<18}{elapsed:>9.2f}{expected / elapsed:>10.1f}{upvotes:>9}"
+            f"{expected - len(errors) - upvotes:>7}{len(errors):>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Measure requests/sec for serving an XBlock's static asset.
+
+Requests a real file resource (the equality checker's icon) and a
+vendor-bundle-sized JavaScript resource through the workbench URLs: read on
+every request, served from `RESOURCE_CACHE`, served gzipped, and answered
+with a 304 for a browser that already has it.
+
+Usage: python benchmarks/bench_package_resource.py [--requests N]
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "workbench.settings")
+
+import django  # isort:skip  # pylint: disable=wrong-import-position
+
+django.setup()
+
+from xblock.core import XBlock  # isort:skip  # pylint: disable=wrong-import-position
+
+from django.test import Client  # isort:skip  # pylint: disable=wrong-import-position
+
+from workbench.resources import RESOURCE_CACHE  # isort:skip  # pylint: disable=wrong-import-position
+
+# About the size of a minified vendor bundle.
+BUNDLE = b"".join(b"function f%d(a,b){return a.map(function(x){return x+b*%d})}\n" % (i, i) for i in range(4000))
+
+
+class BundleBlock(XBlock):
+    """Serves one large JavaScript resource."""
+
+    @classmethod
+    def open_local_resource(cls, uri):
+        """Return the bundle, whatever the uri."""
+        return io.BytesIO(BUNDLE)
+
+
+def requests_per_second(client, url, count, **headers):
+    """Make `count` requests for `url`, return (requests per second, response size)."""
+    response = client.get(url, **headers)
+    start = time.perf_counter()
+    for _ in range(count):
+        response = client.get(url, **headers)
+    return count / (time.perf_counter() - start), len(response.content)
+
+
+@XBlock.register_temp_plugin(BundleBlock, "bench_bundle")
+def main():
+    """Run the benchmark and print a table of results."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=1000, help="requests per measurement")
+    args = parser.parse_args()
+
+    client = Client()
+    cache_size = RESOURCE_CACHE.max_entries or 256
+    resources = [
+        ('icon.png', '/resource/equality_demo/public/images/correct-icon.png'),
+        ('bundle.js', '/resource/bench_bundle/public/bundle.js'),
+    ]
+    print(f"{'resource':<12}{'serving':<22}{'req/s':>10}{'bytes':>10}")
+    for name, url in resources:
+        etag = client.get(url)['ETag']
+        modes = [
+            ('read every request', 0, {}),
+            ('cached', cache_size, {}),
+            ('cached, gzip', cache_size, {'HTTP_ACCEPT_ENCODING': 'gzip, br'}),
+            ('cached, 304', cache_size, {'HTTP_IF_NONE_MATCH': etag}),
+        ]
+        for mode, max_entries, headers in modes:
+            RESOURCE_CACHE.clear()
+            RESOURCE_CACHE.max_entries = max_entries
+            rate, size = requests_per_second(client, url, args.requests, **headers)
+            print(f"{name:<12}{mode:<22}{rate:>10.0f}{size:>10}")
+
+
+if __name__ == "__main__":
+    main()
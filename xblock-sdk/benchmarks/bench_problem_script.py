@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Measure the cost of running a problem's script, as each view and check does.
+
+Runs a script that builds a randomized data set and fits a line to it,
+the way a statistics problem might, through `ScriptRunner`: run every
+time, from the (script, seed) cache, and in sandboxed worker processes
+with and without the cache. `--students` students, each with their own
+seed, view the problem `--views` times each.
+
+Usage: python benchmarks/bench_problem_script.py [--students N] [--views N]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sample_xblocks.basic.scripts import ScriptRunner  # isort:skip  # pylint: disable=wrong-import-position
+
+SCRIPT = """
+import random
+
+points = [(x, 3 * x + 7 + random.gauss(0, 5)) for x in range(2000)]
+n = len(points)
+mean_x = sum(x for x, _ in points) / n
+mean_y = sum(y for _, y in points) / n
+slope = (
+    sum((x - mean_x) * (y - mean_y) for x, y in points)
+    / sum((x - mean_x) ** 2 for x, _ in points)
+)
+intercept = mean_y - slope * mean_x
+answer = round(slope * 100 + intercept)
+"""
+
+
+def seconds_per_run(runner, students, views):
+    """Run the script `views` times for each of `students` seeds, return the mean seconds per run."""
+    runner.run(SCRIPT, 0)
+    start = time.perf_counter()
+    for _ in range(views):
+        for seed in range(1, students + 1):
+            runner.run(SCRIPT, seed)
+    return (time.perf_counter() - start) / (students * views)
+
+
+def main():
+    """Run the benchmark and print a table of results."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--students', type=int, default=20, help="students, each with their own seed")
+    parser.add_argument('--views', type=int, default=10, help="views of the problem per student")
+    args = parser.parse_args()
+
+    print(f"{args.students} students viewing the problem {args.views} times each")
+    print(f"{'running':<22}{'ms per view':>12}")
+    modes = [
+        ('every time', {'cache_size': 0}),
+        ('cached', {}),
+        ('sandboxed', {'cache_size': 0, 'sandbox': True}),
+        ('sandboxed, cached', {'sandbox': True}),
+    ]
+    for name, options in modes:
+        runner = ScriptRunner(**options)
+        try:
+            seconds = seconds_per_run(runner, args.students, args.views)
+        finally:
+            runner.close()
+        print(f"{name:<22}{seconds * 1000:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
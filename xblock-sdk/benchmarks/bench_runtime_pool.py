@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Measure handler latency with and without the runtime pool.
+
+Calls the thumbs `vote` handler through the workbench URLs, the way the
+browser does, first building a new `WorkbenchRuntime` for every request and
+then checking runtimes out of `RUNTIME_POOL`. Runs against a throwaway
+SQLite database.
+
+Usage: python benchmarks/bench_runtime_pool.py [--calls N] [--students N]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "workbench.settings")
+DB_DIR = tempfile.mkdtemp()
+os.environ["WORKBENCH_DATABASES"] = json.dumps({
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(DB_DIR, 'bench.db'),
+    }
+})
+
+import django  # isort:skip  # pylint: disable=wrong-import-position
+
+django.setup()
+
+from django.core.management import call_command  # isort:skip  # pylint: disable=wrong-import-position
+from django.test import Client  # isort:skip  # pylint: disable=wrong-import-position
+
+from workbench import runtime  # isort:skip  # pylint: disable=wrong-import-position
+
+
+def measure(client, usage_id, calls, students):
+    """Make `calls` votes spread over `students` students, return per-call latencies in ms."""
+    url = f"/handler/{usage_id}/vote/"
+    body = json.dumps({'voteType': 'up'})
+    latencies = []
+    for call in range(calls):
+        start = time.perf_counter()
+        response = client.post(
+            f"{url}?student=student_{call % students}", body, content_type='application/json',
+        )
+        latencies.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200, response.content
+    return latencies
+
+
+def main():
+    """Run the benchmark and print a table of results."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=1000, help="handler calls per measurement")
+    parser.add_argument('--students', type=int, default=20, help="distinct students making the calls")
+    args = parser.parse_args()
+
+    call_command('migrate', verbosity=0)
+    runtime.ID_MANAGER.set_scenario("bench-runtime-pool")
+    usage_id = runtime.WorkbenchRuntime().parse_xml_string("<thumbs/>")
+    client = Client()
+    pool_size = runtime.RUNTIME_POOL.max_users
+
+    print(f"{args.calls} vote handler calls from {args.students} students")
+    print(f"{'runtimes':<18}{'mean ms':>9}{'median ms':>11}{'p95 ms':>9}{'pool hits':>11}")
+    for name, max_users in (('new per request', 0), ('pooled', pool_size or 100)):
+        runtime.RUNTIME_POOL.clear()
+        runtime.RUNTIME_POOL.max_users = max_users
+        runtime.RUNTIME_POOL.stats.update(hits=0, misses=0)
+        measure(client, usage_id, args.students, args.students)  # warm up
+        latencies = measure(client, usage_id, args.calls, args.students)
+        p95 = statistics.quantiles(latencies, n=20)[-1]
+        print(
+            f"{name:<18}{statistics.mean(latencies):>9.3f}{statistics.median(latencies):>11.3f}"
+            f"{p95:>9.3f}{runtime.RUNTIME_POOL.stats['hits']:>11}"
+        )
+
+
+if __name__ == "__main__":
+    main()
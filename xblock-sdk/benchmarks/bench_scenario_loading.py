@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Measure workbench startup with eager and lazy scenario loading.
+
+Stands in for a set of installed XBlocks with one block declaring
+`--scenarios` scenarios, then times `init_scenarios()` (what startup and the
+reset_state view run) and the first request for one scenario, with
+`WORKBENCH['lazy_scenarios']` off and on. Runs against a throwaway SQLite
+database.
+
+Usage: python benchmarks/bench_scenario_loading.py [--scenarios N]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "workbench.settings")
+DB_DIR = tempfile.mkdtemp()
+os.environ["WORKBENCH_DATABASES"] = json.dumps({
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(DB_DIR, 'bench.db'),
+    }
+})
+
+import django  # isort:skip  # pylint: disable=wrong-import-position
+
+django.setup()
+
+from xblock.core import XBlock  # isort:skip  # pylint: disable=wrong-import-position
+
+from django.conf import settings  # isort:skip  # pylint: disable=wrong-import-position
+from django.core.management import call_command  # isort:skip  # pylint: disable=wrong-import-position
+from django.test import Client, override_settings  # isort:skip  # pylint: disable=wrong-import-position
+
+from workbench import scenarios  # isort:skip  # pylint: disable=wrong-import-position
+from workbench.runtime_util import reset_global_state  # isort:skip  # pylint: disable=wrong-import-position
+
+SCENARIO_XML = """
+<vertical_demo>
+    <problem_demo>
+        <html_demo><p>What is 2 + 2?</p></html_demo>
+        <textinput_demo name="answer" input_type="int"/>
+        <equality_demo name="check" left="./answer/@student_input" right="=4"/>
+    </problem_demo>
+    <thumbs/>
+    <sequence_demo>
+        <html_demo><p>One</p></html_demo>
+        <html_demo><p>Two</p></html_demo>
+        <view_counter_demo/>
+    </sequence_demo>
+    <attempts_scoreboard_demo/>
+</vertical_demo>
+"""
+
+
+class ScenarioSource(XBlock):
+    """Declares the benchmark's scenarios, like the installed XBlocks would."""
+    count = 0
+
+    @classmethod
+    def workbench_scenarios(cls):
+        """Return `count` copies of a mid-sized scenario."""
+        return [(f"Benchmark scenario {i}", SCENARIO_XML) for i in range(cls.count)]
+
+
+@XBlock.register_temp_plugin(ScenarioSource, "bench_scenarios")
+def main():
+    """Run the benchmark and print a table of results."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenarios', type=int, default=60, help="scenarios to declare")
+    args = parser.parse_args()
+    ScenarioSource.count = args.scenarios
+
+    call_command('migrate', verbosity=0)
+    client = Client()
+    print(f"{args.scenarios} scenarios declared")
+    print(f"{'loading':<10}{'init_scenarios s':>18}{'first page s':>14}{'loaded':>8}")
+    for lazy in (False, True):
+        with override_settings(WORKBENCH=dict(settings.WORKBENCH, lazy_scenarios=lazy)):
+            reset_global_state()
+            start = time.perf_counter()
+            scenarios.init_scenarios()
+            startup = time.perf_counter() - start
+            scenarios.get_scenarios.initialized = True
+
+            start = time.perf_counter()
+            response = client.get("/scenario/bench_scenarios.0/")
+            first_page = time.perf_counter() - start
+            assert response.status_code == 200, response.status_code
+
+            loaded = sum(scenario.loaded for scenario in scenarios.SCENARIOS.values())
+        print(f"{'lazy' if lazy else 'eager':<10}{startup:>18.3f}{first_page:>14.3f}{loaded:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Compare the XBlockState encodings in `workbench.state_codecs`.
+
+Reports the stored size of a row and the time to encode and decode it, for a
+small row and for rows shaped like the large drag-and-drop `item_state` and
+vectordraw `answer` fields.
+
+Usage: python benchmarks/bench_state_codecs.py [--repeat N]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "workbench.settings")
+
+import django  # isort:skip  # pylint: disable=wrong-import-position
+
+django.setup()
+
+from django.conf import settings  # isort:skip  # pylint: disable=wrong-import-position
+from django.test import override_settings  # isort:skip  # pylint: disable=wrong-import-position
+
+from workbench.state_codecs import decode_state, encode_state  # isort:skip  # pylint: disable=wrong-import-position
+
+CONFIGURATIONS = [
+    ('json-pretty', None),
+    ('json', None),
+    ('orjson', None),
+    ('json', 'zlib'),
+    ('orjson', 'zlib'),
+    ('orjson', 'zstd'),
+]
+
+
+def sample_rows():
+    """Return (name, state dict) pairs resembling real workbench rows."""
+    small = {'views': 12, 'voted': True, 'student_input': 'forty two'}
+    dragdrop = {
+        'item_state': {
+            str(i): {'zone': f'zone-{i % 7}', 'correct': i % 3 != 0, 'x_percent': 12.5 * (i % 8)}
+            for i in range(200)
+        },
+        'attempts': 3,
+        'completed': False,
+        'grade': 0.66,
+    }
+    vectordraw = {
+        'answer': {
+            'vectors': {
+                f'v{i}': {'tail': [i * 0.5, -i * 0.25], 'tip': [i * 1.5, i * 0.75], 'style': 'arrow'}
+                for i in range(150)
+            },
+            'points': {f'p{i}': [i, i * i % 17] for i in range(100)},
+        },
+        'result': {'ok': False, 'msg': 'Vector v3 does not start at the origin.'},
+    }
+    return [('small', small), ('dragdrop item_state', dragdrop), ('vectordraw answer', vectordraw)]
+
+
+def main():
+    """Run the benchmark and print a table of results."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=2000, help="encode/decode calls per measurement")
+    args = parser.parse_args()
+
+    print(f"{'row':<22}{'codec':<14}{'compression':<13}{'bytes':>8}{'encode us':>12}{'decode us':>12}")
+    for row_name, data in sample_rows():
+        for codec, compression in CONFIGURATIONS:
+            workbench_settings = dict(
+                settings.WORKBENCH,
+                state_codec=codec,
+                state_compression=compression,
+                state_compression_threshold=1024,
+            )
+            with override_settings(WORKBENCH=workbench_settings):
+                try:
+                    state_format, text = encode_state(data)
+                except django.core.exceptions.ImproperlyConfigured as ex:
+                    print(f"{row_name:<22}{codec:<14}{str(compression):<13}  skipped: {ex}")
+                    continue
+                encode_time = timeit.timeit(lambda: encode_state(data), number=args.repeat)
+                decode_time = timeit.timeit(lambda: decode_state(state_format, text), number=args.repeat)
+            print(
+                f"{row_name:<22}{codec:<14}{str(compression):<13}{len(text.encode('utf-8')):>8}"
+                f"{encode_time / args.repeat * 1e6:>12.1f}{decode_time / args.repeat * 1e6:>12.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Stress `KeyValueStore.increment` with concurrent threads.
+
+Every thread increments the same user_state_summary counter, like a class
+voting on one thumbs block at once. The script reports throughput for each
+key-value store and exits with an error if any increment was lost.
+
+The test database pytest uses is an in-memory SQLite database, which can't be
+shared between threads, so this runs against a throwaway SQLite file instead.
+
+Usage: python benchmarks/stress_counters.py [--threads N] [--increments N]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "workbench.settings")
+DB_DIR = tempfile.mkdtemp()
+os.environ["WORKBENCH_DATABASES"] = json.dumps({
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(DB_DIR, 'stress.db'),
+        'OPTIONS': {'timeout': 60},
+    }
+})
+
+import django  # isort:skip  # pylint: disable=wrong-import-position
+
+django.setup()
+
+from xblock.fields import Scope  # isort:skip  # pylint: disable=wrong-import-position
+from xblock.runtime import KeyValueStore  # isort:skip  # pylint: disable=wrong-import-position
+
+from django.core.management import call_command  # isort:skip  # pylint: disable=wrong-import-position
+from django.db import connection  # isort:skip  # pylint: disable=wrong-import-position
+
+from workbench.runtime import (  # isort:skip  # pylint: disable=wrong-import-position
+    WorkbenchDjangoKeyValueStore,
+    WorkbenchFieldKeyValueStore,
+)
+
+
+def stress(kvs, threads, increments):
+    """Increment one counter `threads` x `increments` times, return (seconds, final value, errors)."""
+    key = KeyValueStore.Key(
+        scope=Scope.user_state_summary,
+        user_id=None,
+        block_scope_id=f"stress.thumbs.d0.u{kvs.__class__.__name__}",
+        field_name="upvotes",
+    )
+    errors = []
+
+    def worker():
+        try:
+            for _ in range(increments):
+                try:
+                    # Like a handler: each increment is its own request.
+                    with kvs.request_cache():
+                        kvs.increment(key, 1)
+                except Exception as ex:  # pylint: disable=broad-exception-caught
+                    errors.append(ex)
+        finally:
+            connection.close()
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return time.perf_counter() - start, kvs.get(key), errors
+
+
+def main():
+    """Run the stress test, print the results and exit non-zero on lost increments."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=16, help="concurrent requests")
+    parser.add_argument('--increments', type=int, default=50, help="increments per thread")
+    args = parser.parse_args()
+
+    call_command('migrate', verbosity=0)
+    expected = args.threads * args.increments
+    print(f"{args.threads} threads x {args.increments} increments = {expected} per store")
+    print(f"{'store':<30}{'seconds':>9}{'incr/s':>10}{'value':>8}{'errors':>8}")
+    lost = False
+    for kvs_class in (WorkbenchDjangoKeyValueStore, WorkbenchFieldKeyValueStore):
+        elapsed, value, errors = stress(kvs_class(), args.threads, args.increments)
+        print(f"{kvs_class.__name__:<30}{elapsed:>9.2f}{expected / elapsed:>10.1f}{value:>8}{len(errors):>8}")
+        lost = lost or errors or value != expected
+
+    if lost:
+        sys.exit("Increments were lost!")
+
+
+if __name__ == "__main__":
+    main()
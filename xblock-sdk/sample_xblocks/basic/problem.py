@@ -37,19 +37,156 @@ A rough sequence diagram::
 
 
 import inspect
-import random
+import re
 import string
+import threading
 import time
+from collections import OrderedDict
 
 from web_fragments.fragment import Fragment
 from xblock.core import XBlock
 from xblock.fields import Any, Boolean, Dict, Integer, Scope, String
-from xblock.run_script import run_script
 
+from .scripts import ScriptTimeout, get_script_runner
 
+# A querypath to one attribute of a block, like "./answer/@student_input".
+ATTRIBUTE_PATH = re.compile(r"^(?P<path>.+)/@(?P<attr>\w+)$")
+
+
+class CheckPlan:
+    """
+    How a problem's `check` handler finds its inputs and its checkers' arguments.
+
+    Compiling a plan runs the problem's querypaths once: the named children
+    and the checkers become usage ids, and each checker argument becomes a
+    binding, one of:
+
+      ('attr', (usage_id, attr_name))  an attribute of a block, for "./input/@attr"
+      ('query', path)                  any other "."-prefixed querypath
+      ('context', name)                a "$name" value from the problem's script
+      ('const', value)                 an "=integer" constant
+
+    Everything in a plan comes from the problem's content, so plans are kept
+    for the `max_plans` most recently checked problem definitions. Content
+    only changes when the problem is parsed again, as when a scenario is
+    reloaded with the same ids, so `ProblemBlock.parse_xml` drops the plans
+    of the definition it parses.
+    """
+    max_plans = 256
+    _plans = OrderedDict()
+    _lock = threading.Lock()
+
+    def __init__(self, inputs, checkers):
+        self.inputs = inputs
+        self.checkers = checkers
+
+    @classmethod
+    def for_problem(cls, problem):
+        """Return the plan for `problem`, compiling it if it isn't cached."""
+        key = (problem.scope_ids.def_id, tuple(problem.children))
+        with cls._lock:
+            plan = cls._plans.get(key)
+            if plan is not None:
+                cls._plans.move_to_end(key)
+        if plan is not None:
+            return plan
+        plan = cls.compile(problem)
+        with cls._lock:
+            cls._plans[key] = plan
+            while len(cls._plans) > cls.max_plans:
+                cls._plans.popitem(last=False)
+        return plan
+
+    @classmethod
+    def forget(cls, def_id):
+        """Drop the plans of the problem definition `def_id`."""
+        with cls._lock:
+            for key in [key for key in cls._plans if key[0] == def_id]:
+                del cls._plans[key]
+
+    @classmethod
+    def clear(cls):
+        """Drop all cached plans."""
+        with cls._lock:
+            cls._plans.clear()
+
+    @classmethod
+    def compile(cls, problem):
+        """Resolve `problem`'s children and checker arguments into a new plan."""
+        runtime = problem.runtime
+        inputs = {}
+        for child_id in problem.children:
+            child = runtime.get_block(child_id)
+            if child.name:
+                inputs[child.name] = child_id
+
+        checkers = []
+        for checker in runtime.querypath(problem, "./checker"):
+            bindings = {}
+            for arg_name, arg_value in checker.arguments.items():
+                if arg_value.startswith("."):
+                    bindings[arg_name] = cls._bind_path(problem, arg_value)
+                elif arg_value.startswith("$"):
+                    bindings[arg_name] = ('context', arg_value[1:])
+                elif arg_value.startswith("="):
+                    bindings[arg_name] = ('const', int(arg_value[1:]))
+                else:
+                    raise ValueError("Couldn't interpret checker argument: %r" % arg_value)
+            checkers.append((checker.scope_ids.usage_id, checker.name, checker.arguments, bindings))
+        return cls(inputs, checkers)
+
+    @staticmethod
+    def _bind_path(problem, path):
+        """Return the binding for the querypath `path`."""
+        match = ATTRIBUTE_PATH.match(path)
+        if match:
+            attr = match.group('attr')
+            for block in problem.runtime.querypath(problem, match.group('path')):
+                if hasattr(block, attr):
+                    return ('attr', (block.scope_ids.usage_id, attr))
+        return ('query', path)
+
+    def run(self, problem, submissions, context):
+        """
+        Submit `submissions` to the inputs, then run the checkers.
+
+        Returns the `submitResults` and `checkResults` dicts for `ProblemBlock.check`.
+        """
+        runtime = problem.runtime
+        submit_results = {}
+        for input_name, submission in submissions.items():
+            child = runtime.get_block(self.inputs[input_name])
+            submit_results[input_name] = child.submit(submission)
+            child.save()
+
+        check_results = {}
+        for checker_id, checker_name, _arguments, bindings in self.checkers:
+            checker = runtime.get_block(checker_id)
+            kwargs = dict(checker.arguments)
+            for arg_name, (kind, value) in bindings.items():
+                if kind == 'attr':
+                    usage_id, attr = value
+                    kwargs[arg_name] = getattr(runtime.get_block(usage_id), attr)
+                elif kind == 'query':
+                    # TODO: What is the specific promised semantic of the iterability
+                    # of the value returned by querypath?
+                    kwargs[arg_name] = list(runtime.querypath(problem, value))[0]
+                elif kind == 'context':
+                    kwargs[arg_name] = context.get(value)
+                else:
+                    kwargs[arg_name] = value
+            result = checker.check(**kwargs)
+            if checker_name:
+                check_results[checker_name] = result
+        return submit_results, check_results
+
+
+@XBlock.wants('settings')
 class ProblemBlock(XBlock):
     """A generalized container of InputBlocks and Checkers.
 
+    How scripts are run can be configured in the block's settings bucket
+    (see `script_runner`).
     """
     script = String(help="Python code to compute values", scope=Scope.content, default="")
     seed = Integer(help="Random seed for this student", scope=Scope.user_state, default=0)
@@ -59,6 +196,8 @@ class ProblemBlock(XBlock):
     @classmethod
     def parse_xml(cls, node, runtime, keys):
         block = runtime.construct_xblock_from_class(cls, keys)
+        # The content may have changed, so compile the check plan again.
+        CheckPlan.forget(keys.def_id)
 
         # Find <script> children, turn them into script content.
         for child in node:
@@ -69,19 +208,34 @@ class ProblemBlock(XBlock):
 
         return block
 
+    SCRIPT_TIMEOUT_MESSAGE = "The script of this problem took too long to run. Please try again later."
+
     def set_student_seed(self):
         """Set a random seed for the student so they each have different but repeatable data."""
         # Don't return zero, that's the default, and the sign that we should make a new seed.
         self.seed = int(time.time() * 1000) % 100 + 1
 
+    def script_runner(self):
+        """
+        Return the `ScriptRunner` for this block's script.
+
+        Its options (`cache_size`, `sandbox`, `timeout`, `memory_limit` and
+        `workers`) come from the "script_runner" key of the block's settings
+        bucket, if the runtime provides the settings service.
+        """
+        options = {}
+        settings_service = self.runtime.service(self, 'settings')
+        if settings_service:
+            options = settings_service.get_settings_bucket(self).get('script_runner', {})
+        return get_script_runner(**options)
+
     def calc_context(self, context):
         """If we have a script, run it, and return the resulting context."""
         if self.script:
             # Seed the random number for the student
             if not self.seed:
                 self.set_student_seed()
-            random.seed(self.seed)
-            script_vals = run_script(self.script)
+            script_vals = self.script_runner().run(self.script, self.seed)
             context = dict(context)
             context.update(script_vals)
         return context
@@ -92,7 +246,10 @@ class ProblemBlock(XBlock):
         if context is None:
             context = {}
 
-        context = self.calc_context(context)
+        try:
+            context = self.calc_context(context)
+        except ScriptTimeout:
+            return Fragment(self.runtime.render_template("problem_error.html", message=self.SCRIPT_TIMEOUT_MESSAGE))
 
         result = Fragment()
         named_child_frags = []
@@ -124,6 +281,7 @@ class ProblemBlock(XBlock):
                 }
 
                 function handleCheckResults(results) {
+                    $(element).find('.problem-error').text(results.error || '').toggle(!!results.error);
                     $.each(results.submitResults || {}, function(input, result) {
                         callIfExists(runtime.childMap(element, input), 'handleSubmit', result);
                     });
@@ -170,47 +328,15 @@ class ProblemBlock(XBlock):
 
         """
         self.problem_attempted = True
-        context = self.calc_context({})
-
-        child_map = {}
-        # self.children is an attribute obtained from ChildrenModelMetaclass, so disable the
-        # static pylint checking warning about this.
-        for child_id in self.children:
-            child = self.runtime.get_block(child_id)
-            if child.name:
-                child_map[child.name] = child
-
-        # For each InputBlock, call the submit() method with the browser-sent
-        # input data.
-        submit_results = {}
-        for input_name, submission in submissions.items():
-            child = child_map[input_name]
-            submit_results[input_name] = child.submit(submission)
-            child.save()
-
-        # For each Checker, find the values it wants, and pass them to its
-        # check() method.
-        checkers = list(self.runtime.querypath(self, "./checker"))
-        check_results = {}
-        for checker in checkers:
-            arguments = checker.arguments
-            kwargs = {}
-            kwargs.update(arguments)
-            for arg_name, arg_value in arguments.items():
-                if arg_value.startswith("."):
-                    values = list(self.runtime.querypath(self, arg_value))
-                    # TODO: What is the specific promised semantic of the iterability
-                    # of the value returned by querypath?
-                    kwargs[arg_name] = values[0]
-                elif arg_value.startswith("$"):
-                    kwargs[arg_name] = context.get(arg_value[1:])
-                elif arg_value.startswith("="):
-                    kwargs[arg_name] = int(arg_value[1:])
-                else:
-                    raise ValueError("Couldn't interpret checker argument: %r" % arg_value)
-            result = checker.check(**kwargs)
-            if checker.name:
-                check_results[checker.name] = result
+        try:
+            context = self.calc_context({})
+        except ScriptTimeout:
+            return {'submitResults': {}, 'checkResults': {}, 'error': self.SCRIPT_TIMEOUT_MESSAGE}
+
+        # Submit to each InputBlock, then pass each Checker the values it
+        # wants, as worked out once per problem by its `CheckPlan`.
+        plan = CheckPlan.for_problem(self)
+        submit_results, check_results = plan.run(self, submissions, context)
 
         return {
             'submitResults': submit_results,
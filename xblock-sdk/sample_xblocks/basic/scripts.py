@@ -0,0 +1,157 @@
+"""Running the Python scripts in problems.
+
+A problem's script is run with the random number generator seeded for the
+student, so its results depend only on the script and the seed.
+`ScriptRunner` keeps the results of recently run (script, seed) pairs, and
+can run scripts in a pool of worker processes, with a time and memory
+limit, so a slow or greedy script can't stall the server.
+
+This code is in the XBlock layer.
+
+"""
+
+
+import copy
+import functools
+import hashlib
+import multiprocessing
+import pickle
+import random
+import threading
+import types
+from collections import OrderedDict
+
+from xblock.run_script import run_script
+
+
+class ScriptTimeout(Exception):
+    """A problem's script ran for longer than it's allowed to."""
+
+
+def script_values(pycode, seed):
+    """Run `pycode` with the random number generator seeded with `seed`, and return its globals."""
+    random.seed(seed)
+    values = run_script(pycode)
+    values.pop('__builtins__', None)
+    return values
+
+
+def _sandboxed_script_values(pycode, seed):
+    """Run `pycode` in a worker process, and return the globals that can be sent back."""
+    values = {}
+    for name, value in script_values(pycode, seed).items():
+        try:
+            pickle.dumps(value)
+        except Exception:  # pylint: disable=broad-except
+            # Modules, functions and the like can't leave the worker.
+            continue
+        values[name] = value
+    return values
+
+
+def _copy_values(values):
+    """
+    Return a deep copy of a script's globals, so changing it can't change the remembered ones.
+
+    Modules, and any other values that can't be copied, are shared.
+    """
+    copied = {}
+    for name, value in values.items():
+        if isinstance(value, types.ModuleType):
+            copied[name] = value
+            continue
+        try:
+            copied[name] = copy.deepcopy(value)
+        except Exception:  # pylint: disable=broad-except
+            copied[name] = value
+    return copied
+
+
+def _limit_worker(memory_limit):
+    """Limit the address space of a worker process to `memory_limit` bytes."""
+    if memory_limit:
+        import resource  # pylint: disable=import-outside-toplevel
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+
+
+class ScriptRunner:
+    """
+    Runs problem scripts, remembering the results for `cache_size` (script, seed) pairs.
+
+    With `sandbox`, scripts run in a pool of `workers` processes, each
+    limited to `memory_limit` bytes, and a script that runs longer than
+    `timeout` seconds raises `ScriptTimeout`. Only the values that can be
+    pickled come back from a sandboxed script.
+    """
+    def __init__(self, cache_size=256, sandbox=False, timeout=5, memory_limit=256 * 1024 * 1024, workers=2):
+        self.cache_size = cache_size
+        self.sandbox = sandbox
+        self.timeout = timeout
+        self.memory_limit = memory_limit
+        self.workers = workers
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+        self._pool = None
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def run(self, script, seed):
+        """Return a new dict of the globals `script` defines when run with `seed`."""
+        key = (hashlib.sha256(script.encode('utf-8')).digest(), seed)
+        with self._lock:
+            values = self._results.get(key)
+            if values is not None:
+                self._results.move_to_end(key)
+                self.stats['hits'] += 1
+                return _copy_values(values)
+            self.stats['misses'] += 1
+
+        if self.sandbox:
+            values = self._run_sandboxed(script, seed)
+        else:
+            values = script_values(script, seed)
+
+        if self.cache_size:
+            with self._lock:
+                self._results[key] = values
+                while len(self._results) > self.cache_size:
+                    self._results.popitem(last=False)
+        return _copy_values(values)
+
+    def _run_sandboxed(self, script, seed):
+        """Run `script` in the worker pool, within the time limit."""
+        with self._lock:
+            if self._pool is None:
+                # Forking a threaded server isn't safe, so workers are spawned.
+                self._pool = multiprocessing.get_context('spawn').Pool(
+                    self.workers, initializer=_limit_worker, initargs=(self.memory_limit,),
+                )
+            pool = self._pool
+        result = pool.apply_async(_sandboxed_script_values, (script, seed))
+        try:
+            return result.get(self.timeout)
+        except multiprocessing.TimeoutError as ex:
+            # The worker is stuck in the script, the only way to stop it is
+            # to stop the pool; the next script starts a new one.
+            with self._lock:
+                if self._pool is pool:
+                    self._pool = None
+            pool.terminate()
+            raise ScriptTimeout(f"Script ran for more than {self.timeout} seconds") from ex
+
+    def clear(self):
+        """Forget all remembered results."""
+        with self._lock:
+            self._results.clear()
+
+    def close(self):
+        """Stop the worker pool, if there is one."""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.terminate()
+
+
+@functools.lru_cache(maxsize=None)
+def get_script_runner(**options):
+    """Return the shared `ScriptRunner` for these `options`."""
+    return ScriptRunner(**options)
@@ -9,7 +9,15 @@ import json
 import pytest
 import webob
 
-from workbench.runtime import WorkbenchRuntime
+from django.db import connection
+from django.test.client import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from sample_xblocks.basic.problem import CheckPlan
+from sample_xblocks.basic.scripts import ScriptRunner, ScriptTimeout
+from workbench import scenarios
+from workbench.runtime import ID_MANAGER, WORKBENCH_KVS, WorkbenchRuntime
 
 
 def make_request(body):
@@ -50,3 +58,147 @@ def test_problem_submission():
     resp_data = json.loads(text_of_response(resp).decode('utf-8'))
     assert resp_data['checkResults']['votes_named'] == True
     assert resp_data['checkResults']['votes_named'] == True
+
+
+def test_script_results_are_cached():
+    runner = ScriptRunner(cache_size=2)
+    script = """
+        import random
+        a = random.randint(1, 1000)
+    """
+    first = runner.run(script, 1)
+    assert 'random' in first and '__builtins__' not in first
+    assert runner.run(script, 1) == first
+    assert runner.stats == {'hits': 1, 'misses': 1}
+
+    # Changing the result doesn't change what's cached.
+    first['a'] = None
+    assert runner.run(script, 1)['a'] is not None
+
+    runner.run(script, 2)
+    runner.run(script, 3)
+    runner.run(script, 1)
+    assert runner.stats == {'hits': 2, 'misses': 4}
+
+    # Nor does changing a value in it.
+    nested = runner.run("a = {'b': [1, 2]}\n", 1)
+    nested['a']['b'].append(3)
+    assert runner.run("a = {'b': [1, 2]}\n", 1)['a'] == {'b': [1, 2]}
+
+
+def test_sandboxed_scripts():
+    runner = ScriptRunner(sandbox=True, timeout=2, memory_limit=512 * 1024 * 1024, workers=1)
+    try:
+        values = runner.run("import random\na = random.randint(1, 1000)\n", 7)
+        # The module can't come back from the worker, the values do.
+        assert values == {'a': ScriptRunner().run("import random\na = random.randint(1, 1000)\n", 7)['a']}
+
+        with pytest.raises(MemoryError):
+            runner.run("a = bytearray(1024 * 1024 * 1024)\n", 0)
+
+        with pytest.raises(ScriptTimeout):
+            runner.run("while True:\n    pass\n", 0)
+        assert runner.run("a = 1\n", 0) == {'a': 1}
+    finally:
+        runner.close()
+
+
+@pytest.mark.django_db
+def test_script_timeout_shows_an_error(monkeypatch):
+    runtime = WorkbenchRuntime()
+    problem = runtime.get_block(runtime.parse_xml_string("""
+        <problem_demo>
+            <textinput_demo name='vote_count' input_type='int'/>
+            <script>
+                numvotes = 4
+            </script>
+            <equality_demo name='votes_named' left='./vote_count/@student_input' right='$numvotes'/>
+        </problem_demo>
+    """))
+
+    def slow_run(self, script, seed):
+        raise ScriptTimeout("Script ran for more than 5 seconds")
+
+    monkeypatch.setattr(ScriptRunner, 'run', slow_run)
+    assert problem.SCRIPT_TIMEOUT_MESSAGE in runtime.render(problem, 'student_view').content
+    json_data = json.dumps({"vote_count": [{"name": "input", "value": "4"}]})
+    resp_data = json.loads(text_of_response(runtime.handle(problem, 'check', make_request(json_data))).decode('utf-8'))
+    assert resp_data == {'submitResults': {}, 'checkResults': {}, 'error': problem.SCRIPT_TIMEOUT_MESSAGE}
+
+
+def numbers_problem(count):
+    """Return a problem with `count` inputs, each checked against its index."""
+    return "<problem_demo>%s</problem_demo>" % "".join(
+        f"<textinput_demo name='answer{i}' input_type='int'/>"
+        f"<equality_demo name='check{i}' left='./answer{i}/@student_input' right='={i}'/>"
+        for i in range(count)
+    )
+
+
+@pytest.mark.django_db
+def test_check_queries_dont_grow_with_inputs():
+    CheckPlan.clear()
+    queries = {}
+    for count in (1, 5):
+        slug = f"check_plan_{count}"
+        scenarios.add_xml_scenario(slug, "Check plan", numbers_problem(count))
+        try:
+            handler_url = reverse('handler', kwargs={
+                'usage_id': scenarios.SCENARIOS[slug].usage_id,
+                'handler_slug': 'check',
+            }) + '?student=checker'
+            submissions = {f"answer{i}": [{"name": "input", "value": str(i)}] for i in range(count)}
+            for _ in range(2):
+                with CaptureQueriesContext(connection) as captured:
+                    response = Client().post(handler_url, json.dumps(submissions), "text/json")
+            results = response.json()
+        finally:
+            scenarios.remove_scenario(slug)
+        assert results['checkResults'] == {f"check{i}": True for i in range(count)}
+        queries[count] = len(captured)
+
+    # One plan for each problem, reused by the second check.
+    assert len(CheckPlan._plans) == 2  # pylint: disable=protected-access
+    assert queries[5] == queries[1]
+
+
+@pytest.mark.django_db
+def test_check_plan_follows_reloaded_content():
+    CheckPlan.clear()
+    submissions = {"answer0": [{"name": "input", "value": "0"}]}
+    usage_ids, results = [], []
+    for right in ("=0", "=1"):
+        # After a reset, the scenario is loaded with new content but the same ids.
+        WORKBENCH_KVS.clear()
+        ID_MANAGER.clear()
+        scenarios.add_xml_scenario("check_plan", "Check plan", numbers_problem(1).replace("=0", right))
+        try:
+            usage_ids.append(scenarios.SCENARIOS["check_plan"].usage_id)
+            handler_url = reverse('handler', kwargs={'usage_id': usage_ids[-1], 'handler_slug': 'check'})
+            results.append(Client().post(handler_url, json.dumps(submissions), "text/json").json())
+        finally:
+            scenarios.remove_scenario("check_plan")
+    assert usage_ids[0] == usage_ids[1]
+    assert [result['checkResults']['check0'] for result in results] == [True, False]
+
+
+@pytest.mark.django_db
+def test_check_plan_follows_named_inputs():
+    CheckPlan.clear()
+    results = []
+    for named in (False, True):
+        # After a reset, the scenario is loaded with the same ids, but the input now has a name.
+        WORKBENCH_KVS.clear()
+        ID_MANAGER.clear()
+        xml = numbers_problem(1)
+        if not named:
+            xml = xml.replace("name='answer0' ", "")
+        scenarios.add_xml_scenario("check_plan", "Check plan", xml)
+        try:
+            usage_id = scenarios.SCENARIOS["check_plan"].usage_id
+            handler_url = reverse('handler', kwargs={'usage_id': usage_id, 'handler_slug': 'check'})
+            submissions = {"answer0": [{"name": "input", "value": "0"}]} if named else {}
+            results.append(Client().post(handler_url, json.dumps(submissions), "text/json").json())
+        finally:
+            scenarios.remove_scenario("check_plan")
+    assert results[1]['checkResults'] == {'check0': True}
@@ -67,10 +67,13 @@ class ThumbsBlockBase:
             log.error('error!')
             return None
 
-        if data['voteType'] == 'up':
-            self.upvotes += 1
+        # Vote totals are shared by every student, so let the runtime count
+        # them atomically if it can; otherwise concurrent votes get lost.
+        field_name = 'upvotes' if data['voteType'] == 'up' else 'downvotes'
+        if hasattr(self.runtime, 'increment'):
+            self.runtime.increment(self, field_name)
         else:
-            self.downvotes += 1
+            setattr(self, field_name, getattr(self, field_name) + 1)
 
         self.voted = True
 
@@ -6,7 +6,7 @@ fields.
 
 from django.contrib import admin
 
-from .models import XBlockState
+from .models import XBlockFieldState, XBlockState
 
 
 @admin.register(XBlockState)
@@ -18,9 +18,23 @@ class XBlockStateAdmin(admin.ModelAdmin):
     categories. Since things like `tag` and `scenario` are set on write, weird
     things could happen if you muck with them later on.
     """
-    list_display = ['scope_id', 'scope', 'user_id', 'state']
-    list_filter = ['scope', 'user_id', 'scenario', 'tag']
+    list_display = ['scope_id', 'scope', 'user_id', 'state_format', 'state']
+    list_filter = ['scope', 'user_id', 'scenario', 'tag', 'state_format']
     search_fields = ['user_id', 'scope_id', 'state']
     readonly_fields = [
-        'scope', 'scope_id', 'scenario', 'tag', 'user_id', 'created'
+        'scope', 'scope_id', 'scenario', 'tag', 'user_id', 'created', 'state_format'
+    ]
+
+
+@admin.register(XBlockFieldState)
+class XBlockFieldStateAdmin(admin.ModelAdmin):
+    """Basic admin operations for the XBlockFieldState model.
+
+    As with `XBlockStateAdmin`, only the stored values can be edited.
+    """
+    list_display = ['scope_id', 'scope', 'user_id', 'field_name', 'value', 'int_value']
+    list_filter = ['scope', 'user_id', 'scenario', 'tag']
+    search_fields = ['user_id', 'scope_id', 'field_name', 'value']
+    readonly_fields = [
+        'scope', 'scope_id', 'scenario', 'tag', 'user_id', 'field_name', 'created'
     ]
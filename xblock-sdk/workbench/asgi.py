@@ -0,0 +1,32 @@
+"""
+ASGI config for workbench project.
+
+This module contains the ASGI application for ASGI servers, such as uvicorn
+or daphne:
+
+    uvicorn workbench.asgi:application --workers 2
+
+It should expose a module-level variable named ``application``.
+
+Under ASGI, the XBlock handler URLs are served by async views, which run
+each handler call, and the flush of the state it changes, in a pool of
+``WORKBENCH['async_handler_threads']`` threads. A slow handler then holds a
+thread of that pool rather than a whole worker process, so a few processes
+can serve many concurrent students. The other views are Django's usual
+synchronous ones.
+
+"""
+
+
+import os
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "workbench.settings")
+os.environ.setdefault("WORKBENCH_ASYNC_HANDLERS", "true")
+
+# pylint: disable=wrong-import-position
+from django.core.asgi import get_asgi_application  # isort:skip
+
+
+# This application object is used by any ASGI server configured to use this
+# file.
+application = get_asgi_application()
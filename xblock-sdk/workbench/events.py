@@ -0,0 +1,350 @@
+"""Publishing the events XBlocks emit with `runtime.publish`.
+
+`WorkbenchRuntime.publish` only puts each event on `EVENTS`, a bounded
+in-memory queue; a background thread takes them off in batches and hands
+them to the sink chosen by `WORKBENCH['event_sink']`, so a handler never
+waits for the events it publishes to be written. When the sink falls so far
+behind that the queue fills up, new events are dropped and counted rather
+than making handlers wait; `EventQueue.stats` reports how full the queue
+has been and how many events were dropped.
+
+The sinks here log events, append them to a JSON lines file, or insert
+them into an SQLite database, and the last two can be queried afterwards,
+to replay the events for analytics.
+
+This code is in the Workbench layer.
+
+"""
+
+
+import atexit
+import copy
+import importlib
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+
+log = logging.getLogger(__name__)
+
+EVENT_FIELDS = ('time', 'event_type', 'block_type', 'usage_id', 'user_id', 'data')
+
+
+def _matches(event, event_type=None, usage_id=None, user_id=None, since=None):
+    """Whether `event` passes the filters `EventSink.query` takes."""
+    return (
+        (event_type is None or event['event_type'] == event_type) and
+        (usage_id is None or event['usage_id'] == usage_id) and
+        (user_id is None or event['user_id'] == user_id) and
+        (since is None or event['time'] > since)
+    )
+
+
+def _make_directory(path):
+    """Make the directory `path` goes in, if it doesn't exist yet."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+
+class EventSink:
+    """
+    Where published events end up.
+
+    `write` is only called from the queue's background thread, with a list
+    of events, each a dict of `EVENT_FIELDS`; `close` too.
+    """
+    def write(self, events):
+        """Write a batch of `events`."""
+        raise NotImplementedError
+
+    def query(self, event_type=None, usage_id=None, user_id=None, since=None, limit=None):
+        """
+        Return the written events that match, oldest first.
+
+        `since` is a timestamp, only the events after it are returned.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """Release whatever the sink holds open."""
+
+
+class LogEventSink(EventSink):
+    """Log each event at INFO level."""
+    def write(self, events):
+        for event in events:
+            log.info(
+                "XBlock event %s for %s (usage_id=%s):",
+                event['event_type'],
+                event['block_type'],
+                event['usage_id'],
+            )
+            log.info(event['data'])
+
+
+class JsonLinesEventSink(EventSink):
+    """Append each event to the file at `path`, as a line of JSON."""
+    def __init__(self, path='var/events.jsonl'):
+        self.path = path
+        self._file = None
+
+    def write(self, events):
+        if self._file is None:
+            _make_directory(self.path)
+            self._file = open(self.path, 'a', encoding='utf-8')  # pylint: disable=consider-using-with
+        self._file.write(''.join(json.dumps(event, default=str) + '\n' for event in events))
+        self._file.flush()
+
+    def query(self, event_type=None, usage_id=None, user_id=None, since=None, limit=None):
+        events = []
+        if not os.path.exists(self.path):
+            return events
+        with open(self.path, encoding='utf-8') as event_file:
+            for line in event_file:
+                event = json.loads(line)
+                if _matches(event, event_type, usage_id, user_id, since):
+                    events.append(event)
+                    if limit is not None and len(events) >= limit:
+                        break
+        return events
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class SqliteEventSink(EventSink):
+    """
+    Insert the events into the `event` table of the SQLite database at `path`.
+
+    Each batch is one transaction. The database is in WAL mode, so it can
+    be queried while events are being written.
+    """
+    def __init__(self, path='var/events.sqlite3'):
+        self.path = path
+        self._connection = None
+
+    def _connect(self):
+        """Open the database, making the table if needed."""
+        _make_directory(self.path)
+        db = sqlite3.connect(self.path)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS event ("
+            "id INTEGER PRIMARY KEY, time REAL, event_type TEXT, block_type TEXT, "
+            "usage_id TEXT, user_id TEXT, data TEXT)"
+        )
+        db.execute("CREATE INDEX IF NOT EXISTS event_type_time ON event (event_type, time)")
+        db.execute("CREATE INDEX IF NOT EXISTS event_usage_id_time ON event (usage_id, time)")
+        db.commit()
+        return db
+
+    def write(self, events):
+        if self._connection is None:
+            self._connection = self._connect()
+        with self._connection:
+            self._connection.executemany(
+                "INSERT INTO event (time, event_type, block_type, usage_id, user_id, data) VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        event['time'], event['event_type'], event['block_type'],
+                        event['usage_id'], event['user_id'], json.dumps(event['data'], default=str),
+                    )
+                    for event in events
+                ],
+            )
+
+    def query(self, event_type=None, usage_id=None, user_id=None, since=None, limit=None):
+        if not os.path.exists(self.path):
+            return []
+        filters = {'event_type': event_type, 'usage_id': usage_id, 'user_id': user_id}
+        conditions = [f"{column} = ?" for column, value in filters.items() if value is not None]
+        params = [value for value in filters.values() if value is not None]
+        if since is not None:
+            conditions.append("time > ?")
+            params.append(since)
+        sql = f"SELECT {', '.join(EVENT_FIELDS)} FROM event"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        db = sqlite3.connect(self.path)
+        try:
+            rows = db.execute(sql, params).fetchall()
+        finally:
+            db.close()
+        return [dict(zip(EVENT_FIELDS, row[:-1] + (json.loads(row[-1]),))) for row in rows]
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+class _Marker:
+    """Put on the queue by `flush` and `close`; set once the events before it are written."""
+    def __init__(self, stop):
+        self.stop = stop
+        self.done = threading.Event()
+
+
+class EventQueue:
+    """
+    Hands published events to `sink` from a background thread.
+
+    The queue holds up to `max_size` events. The thread writes up to
+    `batch_size` events at a time, waiting at most `flush_interval` seconds
+    for a batch to fill up. The thread starts with the first event, and
+    stops at `close`.
+    """
+    def __init__(self, sink, max_size=10000, batch_size=500, flush_interval=0.5):
+        self.sink = sink
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(max_size)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stats = {'published': 0, 'dropped': 0, 'written': 0, 'failed': 0, 'batches': 0, 'max_depth': 0}
+
+    def publish(self, event_type, block_type, usage_id, user_id, data):
+        """
+        Queue an event, and return whether there was room for it.
+
+        The event keeps a copy of `data`, so the caller can go on changing it.
+        """
+        try:
+            data = copy.deepcopy(data)
+        except Exception:  # pylint: disable=broad-except
+            # Something in `data` can't be copied; keep what the sinks would write.
+            data = json.loads(json.dumps(data, default=str))
+        event = {
+            'time': time.time(),
+            'event_type': event_type,
+            'block_type': block_type,
+            'usage_id': usage_id,
+            'user_id': user_id,
+            'data': data,
+        }
+        with self._lock:
+            if self._thread is None:
+                self._start()
+            try:
+                self._queue.put_nowait(event)
+            except queue.Full:
+                self._stats['dropped'] += 1
+                return False
+            self._stats['published'] += 1
+            self._stats['max_depth'] = max(self._stats['max_depth'], self._queue.qsize())
+        return True
+
+    def _start(self):
+        """Start the thread writing the events; call with `_lock` held."""
+        self._thread = threading.Thread(target=self._run, name='workbench-events', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        """Write the queued events in batches, until a stopping marker."""
+        while True:
+            batch, marker = [], None
+            item = self._queue.get()
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if isinstance(item, _Marker):
+                    marker = item
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                timeout = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            if batch:
+                self._write(batch)
+            if marker is not None:
+                if marker.stop:
+                    self.sink.close()
+                    with self._lock:
+                        # Only now may another thread take from the queue.
+                        # Start one for anything queued after the marker.
+                        self._thread = None
+                        if not self._queue.empty():
+                            self._start()
+                marker.done.set()
+                if marker.stop:
+                    return
+
+    def _write(self, batch):
+        """Hand `batch` to the sink, counting it as written or failed."""
+        try:
+            self.sink.write(batch)
+        except Exception:  # pylint: disable=broad-except
+            log.exception("Failed to write %d XBlock events", len(batch))
+            outcome = 'failed'
+        else:
+            outcome = 'written'
+        with self._lock:
+            self._stats[outcome] += len(batch)
+            self._stats['batches'] += 1
+
+    def _wait_for(self, stop, timeout):
+        """Queue a marker after the queued events, and wait for the thread to reach it."""
+        with self._lock:
+            thread = self._thread
+            if thread is None:
+                return True
+        marker = _Marker(stop)
+        try:
+            self._queue.put(marker, timeout=timeout)
+        except queue.Full:
+            return False
+        if not marker.done.wait(timeout):
+            return False
+        if stop:
+            thread.join(timeout)
+        return True
+
+    def flush(self, timeout=10):
+        """Wait until the events queued so far are written, and return whether they were in time."""
+        return self._wait_for(False, timeout)
+
+    def close(self, timeout=10):
+        """Write the queued events, then stop the thread and close the sink."""
+        return self._wait_for(True, timeout)
+
+    def query(self, **filters):
+        """Return the written events that match `filters`, see `EventSink.query`."""
+        return self.sink.query(**filters)
+
+    def stats(self):
+        """Return the counts of events published, dropped, written and failed, and the queue's depth."""
+        with self._lock:
+            return dict(self._stats, depth=self._queue.qsize(), max_size=self._queue.maxsize)
+
+
+def _load_event_queue():
+    """Create the event queue for the sink selected by `settings.WORKBENCH['event_sink']`."""
+    sink_path = settings.WORKBENCH.get('event_sink', 'workbench.events.LogEventSink')
+    module_path, _, name = sink_path.rpartition('.')
+    sink = getattr(importlib.import_module(module_path), name)(**settings.WORKBENCH.get('event_sink_options', {}))
+    return EventQueue(
+        sink,
+        max_size=settings.WORKBENCH.get('event_queue_size', 10000),
+        batch_size=settings.WORKBENCH.get('event_batch_size', 500),
+        flush_interval=settings.WORKBENCH.get('event_flush_interval', 0.5),
+    )
+
+
+# Our global event queue
+EVENTS = _load_event_queue()
+atexit.register(EVENTS.close)
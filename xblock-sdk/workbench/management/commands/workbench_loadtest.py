@@ -0,0 +1,273 @@
+"""
+Replay a mix of block views and handler calls as many simulated students.
+"""
+
+
+import json
+import queue
+import random
+import threading
+import time
+from collections import defaultdict
+
+from xblock.core import XBlock
+from xblock.plugin import PluginMissingError
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+
+from workbench import scenarios
+from workbench.models import XBlockFieldState, XBlockState
+from workbench.views import get_scenario_slug
+
+# The built-in actions: the XML of the scenario each one runs against,
+# and either the view to render or the JSON handler to call with `data`.
+ACTIONS = {
+    'thumbs_view': {
+        'xml': "<thumbs/>",
+        'view': 'student_view',
+    },
+    'thumbs_vote': {
+        'xml': "<thumbs/>",
+        'handler': 'vote',
+        'data': {'voteType': 'up'},
+    },
+    'problem_check': {
+        'xml': """
+            <problem_demo>
+                <textinput_demo name="answer" input_type="int"/>
+                <equality_demo name="check" left="./answer/@student_input" right="=4"/>
+            </problem_demo>
+        """,
+        'handler': 'check',
+        'data': {'answer': [{'name': 'input', 'value': '4'}]},
+    },
+    'mcqs_view': {
+        'xml': "<mcqs/>",
+        'view': 'student_view',
+    },
+    'mcqs_check_answer': {
+        'xml': "<mcqs/>",
+        'handler': 'check_answer',
+        'data': {'ans': 1},
+    },
+    'dragdrop_drop_item': {
+        'xml': "<dragdrop2/>",
+        'handler': 'drop_item',
+        'data': {'val': 0, 'zone': 'top'},
+    },
+    'dragdrop_do_attempt': {
+        'xml': '<dragdrop2 mode="assessment" max_attempts="1000"/>',
+        'handler': 'do_attempt',
+        'data': {},
+    },
+    'vectordraw_check_answer': {
+        'xml': "<vectordraw/>",
+        'handler': 'check_answer',
+        'data': {'vectors': {}, 'points': {}},
+    },
+    'sortable_submit_answer': {
+        'xml': "<sortable/>",
+        'handler': 'submit_answer',
+        'data': ["Australia", "China", "Finland", "Pakistan", "United States"],
+    },
+}
+
+DEFAULT_MIX = {
+    'thumbs_view': 2,
+    'thumbs_vote': 1,
+    'problem_check': 1,
+    'mcqs_view': 1,
+    'mcqs_check_answer': 2,
+    'dragdrop_drop_item': 2,
+    'dragdrop_do_attempt': 1,
+    'vectordraw_check_answer': 1,
+    'sortable_submit_answer': 1,
+}
+
+
+def percentile(sorted_values, percent):
+    """Return the `percent` percentile of `sorted_values`, by the nearest-rank method."""
+    rank = max(1, -(-len(sorted_values) * percent // 100))
+    return sorted_values[int(rank) - 1]
+
+
+class Command(BaseCommand):
+    """
+    Load-test the workbench's views, handlers and XBlock state store.
+
+    Each action in the mix is set up as its own scenario, then every
+    simulated student makes ``--requests`` requests, picking actions at
+    random by their weights, spread over ``--threads`` threads. Requests go
+    through the Django test client, so the whole request path is measured
+    without a web server: the view, ``WorkbenchRuntime.handle`` and the
+    configured key-value store, in the configured database.
+
+    Actions whose block type isn't installed are skipped. The scenarios and
+    the state the students leave behind are removed afterwards, unless
+    ``--keep-state`` is given.
+    """
+    help = "Replay a mix of XBlock views and handler calls as simulated students, and report latencies."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=20, help="Number of simulated students.")
+        parser.add_argument('--requests', type=int, default=10, help="Requests per student.")
+        parser.add_argument('--threads', type=int, default=4, help="Threads making requests.")
+        parser.add_argument(
+            '--mix',
+            help=(
+                "Weights of the actions to run, as name=weight pairs separated by commas "
+                f"(actions: {', '.join(ACTIONS)}), or the path of a JSON file of actions "
+                "like the built-in ones, each with a 'weight'."
+            ),
+        )
+        parser.add_argument('--seed', type=int, default=0, help="Random seed for the students' choices.")
+        parser.add_argument('--keep-state', action='store_true', help="Keep the scenarios and student state.")
+
+    def handle(self, *args, **options):
+        actions = self._actions(options['mix'])
+        runnable = {}
+        for name, action in actions.items():
+            url = self._set_up(name, action)
+            if url is not None:
+                runnable[name] = dict(action, url=url)
+        if not runnable:
+            raise CommandError("None of the actions' blocks are installed.")
+
+        try:
+            stats, elapsed = self._run(runnable, options)
+        finally:
+            if not options['keep_state']:
+                self._tear_down(runnable)
+        self._report(stats, elapsed, options)
+
+    def _actions(self, mix):
+        """Return the actions to run, by name, each with a weight."""
+        if mix is None:
+            return {name: dict(ACTIONS[name], weight=weight) for name, weight in DEFAULT_MIX.items()}
+        if mix.endswith('.json'):
+            with open(mix, encoding='utf-8') as mix_file:
+                return json.load(mix_file)
+        actions = {}
+        for item in mix.split(','):
+            name, _, weight = item.partition('=')
+            if name not in ACTIONS:
+                raise CommandError(f"Unknown action {name!r}")
+            actions[name] = dict(ACTIONS[name], weight=float(weight or 1))
+        return actions
+
+    def _set_up(self, name, action):
+        """Add the scenario for `action`, and return the URL its requests go to, or None."""
+        scenario_id = f"loadtest_{name}"
+        try:
+            scenarios.add_xml_scenario(scenario_id, f"Load test: {name}", action['xml'])
+        except PluginMissingError as ex:
+            self.stderr.write(f"Skipping {name}: block type {ex} isn't installed")
+            return None
+        if 'view' in action:
+            return reverse('scenario', kwargs={'scenario_id': scenario_id, 'view_name': action['view']})
+        usage_id = scenarios.SCENARIOS[scenario_id].usage_id
+        block_class = XBlock.load_class(usage_id.split('.')[1])
+        if not hasattr(block_class, action['handler']):
+            scenarios.remove_scenario(scenario_id)
+            self.stderr.write(f"Skipping {name}: no handler {action['handler']!r}")
+            return None
+        return reverse('handler', kwargs={'usage_id': usage_id, 'handler_slug': action['handler']})
+
+    def _tear_down(self, actions):
+        """Remove the scenarios and the state the load test made."""
+        for name in actions:
+            scenario_id = f"loadtest_{name}"
+            slug = get_scenario_slug(scenarios.SCENARIOS[scenario_id].usage_id)
+            scenarios.remove_scenario(scenario_id)
+            XBlockState.objects.filter(scenario=slug).delete()
+            XBlockFieldState.objects.filter(scenario=slug).delete()
+
+    def _run(self, actions, options):
+        """Make all the students' requests, and return the stats by action and the elapsed time."""
+        names = list(actions)
+        weights = [actions[name]['weight'] for name in names]
+        rand = random.Random(options['seed'])
+        jobs = queue.Queue()
+        for _ in range(options['requests']):
+            for student in range(options['students']):
+                jobs.put((f"loadtest_student_{student}", rand.choices(names, weights)[0]))
+
+        stats = defaultdict(lambda: {'latencies': [], 'queries': 0, 'statuses': defaultdict(int)})
+        lock = threading.Lock()
+        # Database connections are per thread, and so are the query counts.
+        counts = threading.local()
+
+        def count_queries(execute, sql, params, many, context):
+            counts.queries += 1
+            return execute(sql, params, many, context)
+
+        def work():
+            client = Client()
+            while True:
+                try:
+                    student, name = jobs.get_nowait()
+                except queue.Empty:
+                    return
+                action = actions[name]
+                url = f"{action['url']}?student={student}"
+                counts.queries = 0
+                start = time.perf_counter()
+                with connection.execute_wrapper(count_queries):
+                    try:
+                        if 'view' in action:
+                            status = client.get(url).status_code
+                        else:
+                            status = client.post(url, json.dumps(action['data']), 'application/json').status_code
+                    except Exception as ex:  # pylint: disable=broad-except
+                        status = type(ex).__name__
+                latency = time.perf_counter() - start
+                with lock:
+                    action_stats = stats[name]
+                    action_stats['latencies'].append(latency)
+                    action_stats['queries'] += counts.queries
+                    action_stats['statuses'][status] += 1
+
+        def work_in_thread():
+            try:
+                work()
+            finally:
+                connection.close()
+
+        start = time.perf_counter()
+        if options['threads'] <= 1:
+            work()
+        else:
+            threads = [threading.Thread(target=work_in_thread) for _ in range(options['threads'])]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        return stats, time.perf_counter() - start
+
+    def _report(self, stats, elapsed, options):
+        """Print a table of latency percentiles, throughput and query counts by action."""
+        total = sum(len(action_stats['latencies']) for action_stats in stats.values())
+        self.stdout.write(
+            f"{options['students']} students, {total} requests on {options['threads']} threads "
+            f"in {elapsed:.2f}s: {total / elapsed:.1f} requests/s"
+        )
+        self.stdout.write(
+            f"{'action':<26}{'requests':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}  statuses"
+        )
+        for name in sorted(stats):
+            action_stats = stats[name]
+            latencies = sorted(action_stats['latencies'])
+            count = len(latencies)
+            statuses = ", ".join(
+                f"{status}: {number}" for status, number in sorted(action_stats['statuses'].items(), key=str)
+            )
+            self.stdout.write(
+                f"{name:<26}{count:>9}"
+                f"{percentile(latencies, 50) * 1000:>9.1f}"
+                f"{percentile(latencies, 95) * 1000:>9.1f}"
+                f"{percentile(latencies, 99) * 1000:>9.1f}"
+                f"{action_stats['queries'] / count:>9.1f}  {statuses}"
+            )
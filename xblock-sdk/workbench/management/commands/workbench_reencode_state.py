@@ -0,0 +1,48 @@
+"""
+Re-encode every XBlockState row with the currently configured state codec.
+"""
+
+
+from django.core.management.base import BaseCommand
+
+from workbench.models import XBlockState
+
+
+class Command(BaseCommand):
+    """
+    Rewrite stored XBlock state after ``settings.WORKBENCH['state_codec']``
+    or ``['state_compression']`` has changed.
+
+    Rows are decoded with whatever format they were written in, so this is
+    safe to run more than once, or to interrupt.
+    """
+    help = "Re-encode all XBlockState rows with the configured state codec."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help="Number of rows to update per query.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        batch = []
+        rewritten = total = 0
+        for record in XBlockState.objects.order_by('pk').iterator(chunk_size=batch_size):
+            total += 1
+            old_encoding = (record.state_format, record.state)
+            record.set_state(record.get_state())
+            if (record.state_format, record.state) == old_encoding:
+                continue
+            batch.append(record)
+            if len(batch) >= batch_size:
+                XBlockState.objects.bulk_update(batch, ['state', 'state_format'])
+                rewritten += len(batch)
+                batch = []
+        if batch:
+            XBlockState.objects.bulk_update(batch, ['state', 'state_format'])
+            rewritten += len(batch)
+
+        self.stdout.write(f"Re-encoded {rewritten} of {total} XBlockState rows.")
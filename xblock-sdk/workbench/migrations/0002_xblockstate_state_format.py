@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workbench', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='xblockstate',
+            name='state_format',
+            field=models.CharField(default='json', max_length=20),
+        ),
+    ]
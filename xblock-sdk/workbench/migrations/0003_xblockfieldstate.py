@@ -0,0 +1,38 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:34
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workbench', '0002_xblockstate_state_format'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='XBlockFieldState',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(choices=[('usage', 'usage'), ('definition', 'definition'), ('type', 'type'), ('all', 'all'), ('parent', 'parent'), ('children', 'children')], db_index=True, max_length=50)),
+                ('scope_id', models.CharField(blank=True, db_index=True, max_length=255, verbose_name='Scope ID')),
+                ('user_id', models.CharField(blank=True, db_index=True, max_length=255, verbose_name='User ID')),
+                ('field_name', models.CharField(max_length=255)),
+                ('scenario', models.CharField(blank=True, db_index=True, max_length=255, null=True)),
+                ('tag', models.CharField(blank=True, db_index=True, max_length=50, null=True)),
+                ('created', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('value', models.TextField(blank=True, null=True)),
+                ('int_value', models.BigIntegerField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'XBlock Field State',
+                'verbose_name_plural': 'XBlock Field State',
+                'ordering': ['scope_id', 'scope', 'user_id', 'field_name'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='xblockfieldstate',
+            constraint=models.UniqueConstraint(fields=('scope', 'scope_id', 'user_id', 'field_name'), name='unique_xblock_field_state'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+from django.db import migrations, models
+from django.db.models import Value
+from django.db.models.functions import Coalesce
+
+from workbench.state_codecs import decode_state, encode_state
+
+
+def merge_duplicate_rows(apps, schema_editor):
+    """
+    Merge the rows of each (scope, scope_id, user_id) into its first one.
+
+    Concurrent requests could add the same row twice before the constraint
+    existed. Fields from later rows win.
+    """
+    XBlockState = apps.get_model('workbench', 'XBlockState')
+    first_rows = {}
+    for record in XBlockState.objects.order_by('pk'):
+        row_key = (record.scope or '', record.scope_id or '', record.user_id or '')
+        first = first_rows.setdefault(row_key, record)
+        if first is record:
+            continue
+        state = decode_state(first.state_format, first.state)
+        state.update(decode_state(record.state_format, record.state))
+        first.state_format, first.state = encode_state(state)
+        first.save()
+        record.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workbench', '0003_xblockfieldstate'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_rows, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='xblockstate',
+            constraint=models.UniqueConstraint(Coalesce('scope', Value('')), Coalesce('scope_id', Value('')), Coalesce('user_id', Value('')), name='unique_xblock_state'),
+        ),
+    ]
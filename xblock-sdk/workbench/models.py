@@ -6,14 +6,28 @@ make no effort to be smart about batch updates, so performance isn't great. We
 mostly use Django because we already have it as a dependency and because Django
 Admin gives us a lot of basic search/filtering for free.
 
+`XBlockState` keeps all the fields of a (scope, scope_id, user_id) in one JSON
+blob. `XBlockFieldState` is the alternative layout with one row per field, which
+lets single fields be updated atomically.
+
 """
 
 
 from xblock.fields import BlockScope, Scope
 
 from django.db import models
+from django.db.models import Value
+from django.db.models.functions import Coalesce
 from django.utils.timezone import now
 
+from .profiling import record_state
+from .state_codecs import decode_state, encode_state
+
+try:
+    import simplejson as json
+except ImportError:
+    import json
+
 
 def shorten_scope_name(scope_name):
     """
@@ -34,6 +48,16 @@ class XBlockState(models.Model):
         verbose_name = "XBlock State"
         verbose_name_plural = "XBlock State"
         ordering = ['scope_id', 'scope', 'user_id']
+        # One row per (scope, scope_id, user_id), with the NULLs of shared
+        # scopes counting as equal, so concurrent requests can't both add it.
+        constraints = [
+            models.UniqueConstraint(
+                Coalesce('scope', Value('')),
+                Coalesce('scope_id', Value('')),
+                Coalesce('user_id', Value('')),
+                name='unique_xblock_state',
+            ),
+        ]
 
     BLOCK_SCOPE_NAMES = [
         (shorten_scope_name(sentinel.attr_name), shorten_scope_name(sentinel.attr_name))
@@ -76,6 +100,8 @@ class XBlockState(models.Model):
     )
     created = models.DateTimeField(default=now, db_index=True)
     state = models.TextField(default="{}")
+    # How `state` is encoded, see `workbench.state_codecs`.
+    state_format = models.CharField(max_length=20, default="json")
 
     # pylint: disable=missing-format-attribute
     def __repr__(self):
@@ -86,10 +112,10 @@ class XBlockState(models.Model):
             "scenario={xb_state.scenario} " \
             "tag={xb_state.tag}>".format(xb_state=self)
 
-    @classmethod
-    def get_for_key(cls, key):
+    @staticmethod
+    def fields_for_key(key):
         """
-        Get or create the model row for a given `KeyValueStore.Key` `key`.
+        Return the model fields identifying the row for `KeyValueStore.Key` `key`.
         """
         if key.scope in [Scope.parent, Scope.children]:
             block_scope_full_name = key.scope.attr_name
@@ -114,17 +140,34 @@ class XBlockState(models.Model):
         else:
             scenario, tag, _ = scope_id.split(".", 2)
 
-        record, _ = cls.objects.get_or_create(
-            scope=block_scope_name,
-            scope_id=key.block_scope_id,
-            user_id=key.user_id,
-            scenario=scenario,
-            tag=tag,
-        )
+        return {
+            'scope': block_scope_name,
+            'scope_id': key.block_scope_id,
+            'user_id': key.user_id,
+            'scenario': scenario,
+            'tag': tag,
+        }
+
+    @classmethod
+    def get_for_key(cls, key):
+        """
+        Get or create the model row for a given `KeyValueStore.Key` `key`.
+        """
+        record, _ = cls.objects.get_or_create(**cls.fields_for_key(key))
         return record
 
+    def get_state(self):
+        """Decode and return the state dict stored in this row."""
+        record_state('read', len(self.state))
+        return decode_state(self.state_format, self.state)
+
+    def set_state(self, data):
+        """Encode the state dict `data` into this row, without saving it."""
+        self.state_format, self.state = encode_state(data)
+        record_state('written', len(self.state))
+
     @classmethod
-    def prep_for_scenario_loading(cls):
+    def prep_for_scenario_loading(cls, scenario=None):
         """
         This method should be executed once before loading scenarios.
 
@@ -133,9 +176,139 @@ class XBlockState(models.Model):
         delete all the children scoped entries in this method.
 
         Note that this should be called *once* before any scenario loading
-        happens. It should *not* be called before each scenario.
+        happens. It should *not* be called before each scenario, unless it's
+        given the slug of the `scenario` about to be loaded, to only delete
+        that scenario's entries.
+        """
+        records = cls.objects.filter(scope="children")
+        if scenario is not None:
+            records = records.filter(scenario=scenario)
+        records.delete()
+
+    def __str__(self):
+        return self.__repr__()
+
+
+class XBlockFieldState(models.Model):
+    """State storage for XBlock, with one row per field.
+
+    Like `XBlockState`, this class assumes your IDs were generated using
+    `ScenarioIdManager`. Missing user and scope ids are stored as "" rather
+    than NULL, so that the unique constraint covers every row.
+    """
+    class Meta:
+        """Class metadata"""
+        verbose_name = "XBlock Field State"
+        verbose_name_plural = "XBlock Field State"
+        ordering = ['scope_id', 'scope', 'user_id', 'field_name']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['scope', 'scope_id', 'user_id', 'field_name'],
+                name='unique_xblock_field_state',
+            ),
+        ]
+
+    scope = models.CharField(
+        max_length=50,
+        db_index=True,
+        choices=XBlockState.BLOCK_SCOPE_NAMES
+    )
+    scope_id = models.CharField(
+        max_length=255,
+        blank=True,
+        db_index=True,
+        verbose_name="Scope ID",
+    )
+    user_id = models.CharField(
+        max_length=255,
+        blank=True,
+        db_index=True,
+        verbose_name="User ID",
+    )
+    field_name = models.CharField(max_length=255)
+    scenario = models.CharField(
+        max_length=255,
+        blank=True,
+        null=True,
+        db_index=True,
+    )
+    tag = models.CharField(
+        max_length=50,
+        blank=True,
+        null=True,
+        db_index=True,
+    )
+    created = models.DateTimeField(default=now, db_index=True)
+    # Integer values live in `int_value`, so that they can be incremented in
+    # the database; everything else is JSON in `value`.
+    value = models.TextField(blank=True, null=True)
+    int_value = models.BigIntegerField(blank=True, null=True)
+
+    # pylint: disable=missing-format-attribute
+    def __repr__(self):
+        return "<XBlockFieldState id={xb_state.id} " \
+            "scope={xb_state.scope} " \
+            "scope_id={xb_state.scope_id} " \
+            "user_id={xb_state.user_id} " \
+            "field_name={xb_state.field_name}>".format(xb_state=self)
+
+    @staticmethod
+    def fields_for_key(key):
+        """
+        Return the model fields identifying the row for `KeyValueStore.Key` `key`.
+        """
+        fields = XBlockState.fields_for_key(key)
+        fields['scope_id'] = fields['scope_id'] or ''
+        fields['user_id'] = fields['user_id'] or ''
+        fields['field_name'] = key.field_name
+        return fields
+
+    @classmethod
+    def filter_for_key(cls, key):
+        """
+        Return a queryset of the (at most one) row for `KeyValueStore.Key` `key`.
+        """
+        fields = cls.fields_for_key(key)
+        return cls.objects.filter(
+            scope=fields['scope'],
+            scope_id=fields['scope_id'],
+            user_id=fields['user_id'],
+            field_name=fields['field_name'],
+        )
+
+    @staticmethod
+    def is_int_value(value):
+        """Whether `value` is stored in `int_value` rather than `value`."""
+        return type(value) is int and -2 ** 63 <= value < 2 ** 63  # pylint: disable=unidiomatic-typecheck
+
+    @classmethod
+    def columns_for_value(cls, value):
+        """Return the column values that store `value`."""
+        if cls.is_int_value(value):
+            record_state('written', 8)
+            return {'value': None, 'int_value': value}
+        encoded = json.dumps(value)
+        record_state('written', len(encoded))
+        return {'value': encoded, 'int_value': None}
+
+    def get_value(self):
+        """Return the field value stored in this row."""
+        if self.int_value is not None:
+            record_state('read', 8)
+            return self.int_value
+        record_state('read', len(self.value))
+        return json.loads(self.value)
+
+    @classmethod
+    def prep_for_scenario_loading(cls, scenario=None):
+        """
+        Delete the children entries before loading scenarios, see
+        `XBlockState.prep_for_scenario_loading`.
         """
-        cls.objects.filter(scope="children").delete()
+        records = cls.objects.filter(scope="children")
+        if scenario is not None:
+            records = records.filter(scenario=scenario)
+        records.delete()
 
     def __str__(self):
         return self.__repr__()
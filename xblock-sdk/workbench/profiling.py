@@ -0,0 +1,196 @@
+"""Opt-in profiling of XBlock handlers and views.
+
+With `WORKBENCH['profile']` on, each handler call and view render the
+runtime does for a request is measured: wall and CPU time, SQL queries
+and their time, key-value store operations, and the bytes of encoded state
+read and written. The measurements of the last `profile_buffer_size`
+requests are kept in `PROFILER`, which the `/profile/` view reports, by
+block type and handler or view name.
+
+With `WORKBENCH['profile_slowest']` set to N, every profiled request also
+runs under cProfile, and the statistics of the N slowest are kept.
+
+The store and models report their operations to whichever profile is
+active on the current thread through `record_kvs` and `record_state`,
+which do nothing otherwise.
+
+This code is in the Workbench layer.
+
+"""
+
+
+import cProfile
+import heapq
+import io
+import itertools
+import pstats
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+
+_local = threading.local()
+
+SUMMED_FIELDS = ('wall_time', 'cpu_time', 'queries', 'query_time', 'state_bytes_read', 'state_bytes_written')
+
+
+def record_kvs(operation):
+    """Count a key-value store `operation` ("get", "set", "delete" or "has") in the active profile."""
+    profile = getattr(_local, 'profile', None)
+    if profile is not None:
+        profile['kvs'][operation] += 1
+
+
+def record_state(direction, size):
+    """Count `size` bytes of encoded state "read" or "written" in the active profile."""
+    profile = getattr(_local, 'profile', None)
+    if profile is not None:
+        profile[f'state_bytes_{direction}'] += size
+
+
+class Profiler:
+    """
+    The measurements of the `max_records` most recently profiled requests.
+    """
+    def __init__(self, max_records):
+        self._records = deque(maxlen=max_records)
+        self._slowest = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def enabled():
+        """Whether profiling is turned on in the settings."""
+        return settings.WORKBENCH.get('profile', False)
+
+    @contextmanager
+    def profile(self, block_type, kind, name):
+        """
+        Measure the block's handler or view `name` (`kind` is "handler" or "view").
+
+        Only the outermost call on a thread is measured, so the rendering of
+        a block's children counts towards the block's own view.
+        """
+        if getattr(_local, 'profile', None) is not None or not self.enabled():
+            yield
+            return
+
+        record = {
+            'block_type': block_type,
+            'kind': kind,
+            'name': name,
+            'queries': 0,
+            'query_time': 0.0,
+            'kvs': defaultdict(int),
+            'state_bytes_read': 0,
+            'state_bytes_written': 0,
+        }
+
+        def count_query(execute, sql, params, many, context):
+            start = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                record['queries'] += 1
+                record['query_time'] += time.perf_counter() - start
+
+        slowest = settings.WORKBENCH.get('profile_slowest', 0)
+        profiler = cProfile.Profile() if slowest else None
+        _local.profile = record
+        start_wall, start_cpu = time.perf_counter(), time.thread_time()
+        try:
+            with connection.execute_wrapper(count_query):
+                if profiler is not None:
+                    try:
+                        profiler.enable()
+                    except ValueError:
+                        # Another profiler is already running on this thread.
+                        profiler = None
+                try:
+                    yield
+                finally:
+                    if profiler is not None:
+                        profiler.disable()
+        finally:
+            record['wall_time'] = time.perf_counter() - start_wall
+            record['cpu_time'] = time.thread_time() - start_cpu
+            _local.profile = None
+            record['kvs'] = dict(record['kvs'])
+            self._add(record, profiler, slowest)
+
+    def _add(self, record, profiler, slowest):
+        """Keep `record`, and its cProfile statistics if it's one of the `slowest`."""
+        with self._lock:
+            record['id'] = next(self._ids)
+            self._records.append(record)
+            if profiler is None:
+                return
+            entry = (record['wall_time'], record['id'], record, profiler)
+            if len(self._slowest) < slowest:
+                heapq.heappush(self._slowest, entry)
+            elif entry[:2] > self._slowest[0][:2]:
+                heapq.heapreplace(self._slowest, entry)
+            while len(self._slowest) > slowest:
+                heapq.heappop(self._slowest)
+
+    def records(self):
+        """Return the kept measurements, oldest first."""
+        with self._lock:
+            return list(self._records)
+
+    def summary(self):
+        """Return the kept measurements' totals, by block type, kind and name."""
+        totals = {}
+        for record in self.records():
+            key = (record['block_type'], record['kind'], record['name'])
+            total = totals.setdefault(key, {
+                'block_type': record['block_type'],
+                'kind': record['kind'],
+                'name': record['name'],
+                'count': 0,
+                'wall_time': 0.0,
+                'max_wall_time': 0.0,
+                'cpu_time': 0.0,
+                'queries': 0,
+                'query_time': 0.0,
+                'kvs': defaultdict(int),
+                'state_bytes_read': 0,
+                'state_bytes_written': 0,
+            })
+            total['count'] += 1
+            total['max_wall_time'] = max(total['max_wall_time'], record['wall_time'])
+            for field in SUMMED_FIELDS:
+                total[field] += record[field]
+            for operation, count in record['kvs'].items():
+                total['kvs'][operation] += count
+        for total in totals.values():
+            total['kvs'] = dict(total['kvs'])
+        return sorted(totals.values(), key=lambda total: -total['wall_time'])
+
+    def slowest(self):
+        """Return the measurements of the slowest requests with cProfile statistics, slowest first."""
+        with self._lock:
+            return [record for _, _, record, _ in sorted(self._slowest, key=lambda entry: entry[:2], reverse=True)]
+
+    def stats(self, record_id, limit=50):
+        """Return the cProfile report of the request `record_id` as text, or None if it isn't kept."""
+        with self._lock:
+            profilers = [profiler for _, rid, _, profiler in self._slowest if rid == record_id]
+        if not profilers:
+            return None
+        out = io.StringIO()
+        pstats.Stats(profilers[0], stream=out).sort_stats('cumulative').print_stats(limit)
+        return out.getvalue()
+
+    def clear(self):
+        """Drop all kept measurements."""
+        with self._lock:
+            self._records.clear()
+            self._slowest.clear()
+
+
+# Our global profiler
+PROFILER = Profiler(settings.WORKBENCH.get('profile_buffer_size', 1000))
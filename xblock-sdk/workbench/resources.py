@@ -0,0 +1,316 @@
+"""In-process caches of the resources XBlock pages use.
+
+`RESOURCE_CACHE` holds the local resources XBlocks serve through
+`package_resource`. Each resource is read once, and kept with its mimetype,
+an ETag, and gzip (and, if the `brotli` package is installed, brotli)
+versions of it when it's worth compressing. Resources read from files are
+re-read when the file changes, so editing a block's JavaScript still shows
+up on reload.
+
+`bundle_fragment_resources` bundles the inline CSS and JavaScript of a
+page's fragment into files kept in `FRAGMENT_BUNDLES`, served by the
+`fragment_bundle` view.
+
+This code is in the Workbench layer.
+
+"""
+
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import threading
+from collections import OrderedDict, namedtuple
+
+from web_fragments.fragment import Fragment, FragmentResource
+from xblock.core import XBlock, XBlockAside
+from xblock.plugin import PluginMissingError
+
+from django.conf import settings
+from django.urls import reverse
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Resources smaller than this aren't worth compressing.
+COMPRESSION_MIN_SIZE = 1024
+
+COMPRESSIBLE_TYPES = {
+    'application/javascript',
+    'application/json',
+    'application/xml',
+    'image/svg+xml',
+    'text/javascript',
+}
+
+CachedResource = namedtuple('CachedResource', 'content mimetype etag encoded path mtime')
+
+
+class ResourceNotFound(Exception):
+    """The block type doesn't exist, or won't serve the resource."""
+
+
+def _load_block_class(block_type):
+    """Return the XBlock or XBlockAside class for `block_type`."""
+    try:
+        return XBlock.load_class(block_type)
+    except PluginMissingError:
+        try:
+            return XBlockAside.load_class(block_type)
+        except PluginMissingError as ex:
+            raise ResourceNotFound(block_type) from ex
+
+
+def compress_resource(content, mimetype):
+    """Return the encodings of `content` worth serving, by Content-Encoding."""
+    if len(content) < COMPRESSION_MIN_SIZE:
+        return {}
+    if not (mimetype and (mimetype.startswith('text/') or mimetype in COMPRESSIBLE_TYPES)):
+        return {}
+    encoded = {'gzip': gzip.compress(content, mtime=0)}
+    if brotli is not None:
+        encoded['br'] = brotli.compress(content)
+    return {
+        encoding: data
+        for encoding, data in encoded.items()
+        if len(data) < len(content)
+    }
+
+
+def _read(block_type, resource):
+    """Read `resource` of `block_type` into a `CachedResource`."""
+    block_class = _load_block_class(block_type)
+    try:
+        with block_class.open_local_resource(resource) as resource_file:
+            content = resource_file.read()
+            path = getattr(resource_file, 'name', None)
+    except Exception as ex:
+        raise ResourceNotFound(resource) from ex
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    path = path if isinstance(path, str) and os.path.isfile(path) else None
+
+    mimetype, _ = mimetypes.guess_type(resource)
+    return CachedResource(
+        content=content,
+        mimetype=mimetype,
+        etag='"%s"' % hashlib.sha256(content).hexdigest()[:32],
+        encoded=compress_resource(content, mimetype),
+        path=path,
+        mtime=os.stat(path).st_mtime_ns if path else None,
+    )
+
+
+class ResourceCache:
+    """
+    The `max_entries` most recently served resources, keyed by (block_type, resource).
+    """
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def get(self, block_type, resource):
+        """
+        Return the `CachedResource` for `resource` of `block_type`.
+
+        Raises `ResourceNotFound` if there's no such block type or resource.
+        """
+        key = (block_type, resource)
+        with self._lock:
+            cached = self._entries.get(key)
+        if cached is not None and not self._is_stale(cached):
+            with self._lock:
+                self.stats['hits'] += 1
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+            return cached
+
+        cached = _read(block_type, resource)
+        with self._lock:
+            self.stats['misses'] += 1
+            if self.max_entries:
+                self._entries[key] = cached
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return cached
+
+    @staticmethod
+    def _is_stale(cached):
+        """Whether the file `cached` was read from has changed since."""
+        if cached.path is None:
+            return False
+        try:
+            return os.stat(cached.path).st_mtime_ns != cached.mtime
+        except OSError:
+            return True
+
+    def clear(self):
+        """Drop all cached resources."""
+        with self._lock:
+            self._entries.clear()
+
+
+def accepted_encoding(accept_encoding, available):
+    """
+    Return the best of the `available` encodings the Accept-Encoding header allows, or None.
+    """
+    accepted = set()
+    for item in accept_encoding.split(','):
+        encoding, _, params = item.strip().partition(';')
+        quality = params.strip()
+        if quality.startswith('q='):
+            try:
+                if float(quality[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(encoding.strip().lower())
+    for encoding in ('br', 'gzip'):
+        if encoding in available and encoding in accepted:
+            return encoding
+    return None
+
+
+def etag_matches(if_none_match, etag):
+    """Whether the If-None-Match header `if_none_match` includes `etag`."""
+    if if_none_match.strip() == '*':
+        return True
+    return any(
+        tag.strip().removeprefix('W/') == etag
+        for tag in if_none_match.split(',')
+    )
+
+
+class FragmentBundles:
+    """
+    Bundles of fragment resources, kept as files named by their content in `directory`.
+
+    Every process serving the workbench from the same directory can serve
+    every bundle, whichever process made it, and bundles aren't dropped
+    while pages may still link to them. The `max_entries` most recently
+    served bundles are also kept in memory.
+    """
+    def __init__(self, directory, max_entries):
+        self.directory = directory
+        self.max_entries = max_entries
+        self._bundles = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, texts, mimetype):
+        """
+        Bundle the resource `texts` into one file, and return its name.
+
+        The name is derived from the content, so the same resources always
+        make the same bundle.
+        """
+        separator = ";\n" if mimetype in JAVASCRIPT_TYPES else "\n"
+        content = separator.join(texts).encode('utf-8')
+        name = f"{hashlib.sha256(content).hexdigest()[:32]}.{'js' if mimetype in JAVASCRIPT_TYPES else 'css'}"
+        path = os.path.join(self.directory, name)
+        if not os.path.exists(path):
+            os.makedirs(self.directory, exist_ok=True)
+            # Write under another name first, so no process serves half a bundle.
+            temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temporary, 'wb') as bundle_file:
+                bundle_file.write(content)
+            os.replace(temporary, path)
+        return name
+
+    def get(self, name):
+        """Return the bundle called `name` as a `CachedResource`, or None if there's no such bundle."""
+        with self._lock:
+            cached = self._bundles.get(name)
+            if cached is not None:
+                self._bundles.move_to_end(name)
+                return cached
+        try:
+            with open(os.path.join(self.directory, name), 'rb') as bundle_file:
+                content = bundle_file.read()
+        except OSError:
+            return None
+        mimetype = 'application/javascript' if name.endswith('.js') else 'text/css'
+        cached = CachedResource(
+            content=content,
+            mimetype=mimetype,
+            etag=f'"{name.partition(".")[0]}"',
+            encoded=compress_resource(content, mimetype),
+            path=None,
+            mtime=None,
+        )
+        with self._lock:
+            self._bundles[name] = cached
+            while len(self._bundles) > self.max_entries:
+                self._bundles.popitem(last=False)
+        return cached
+
+    def clear(self):
+        """Drop the bundles kept in memory; they're read from their files again when served."""
+        with self._lock:
+            self._bundles.clear()
+
+
+JAVASCRIPT_TYPES = {'application/javascript', 'text/javascript'}
+
+BUNDLED_TYPES = JAVASCRIPT_TYPES | {'text/css'}
+
+
+def bundle_fragment_resources(fragment):
+    """
+    Return a copy of the page's `fragment` with its inline CSS and JavaScript bundled.
+
+    Each run of consecutive inline CSS or JavaScript resources with the
+    same placement is replaced by one URL to a bundle in
+    `FRAGMENT_BUNDLES`, which keeps them in the same order relative to the
+    URL resources around them. (The fragment's resources are already free
+    of duplicates: web_fragments drops them as fragments are combined.)
+    """
+    pods = fragment.to_dict()
+    pods['resources'] = [resource._asdict() for resource in _bundle_runs(fragment.resources)]
+    return Fragment.from_dict(pods)
+
+
+def _bundle_runs(resources):
+    """Replace each run of inline CSS or JavaScript in `resources` with a bundle URL."""
+    bundled = []
+    run = []
+
+    def end_run():
+        if len(run) == 1:
+            bundled.append(run[0])
+        elif run:
+            name = FRAGMENT_BUNDLES.add([resource.data for resource in run], run[0].mimetype)
+            url = reverse('fragment_bundle', kwargs={'bundle_name': name})
+            bundled.append(FragmentResource('url', url, run[0].mimetype, run[0].placement))
+        del run[:]
+
+    # Resources are rendered per placement, so runs are only broken up by
+    # resources in the same placement.
+    for placement in ('head', 'foot'):
+        for resource in resources:
+            if resource.placement != placement:
+                continue
+            if resource.kind == 'text' and resource.mimetype in BUNDLED_TYPES:
+                if run and run[0].mimetype != resource.mimetype:
+                    end_run()
+                run.append(resource)
+            else:
+                end_run()
+                bundled.append(resource)
+        end_run()
+    return bundled
+
+
+# Our global cache of XBlock resources
+RESOURCE_CACHE = ResourceCache(settings.WORKBENCH.get('resource_cache_size', 256))
+
+# Our global store of bundled fragment resources
+FRAGMENT_BUNDLES = FragmentBundles(
+    settings.WORKBENCH.get('fragment_bundle_dir', 'var/bundles'),
+    settings.WORKBENCH.get('fragment_bundle_cache_size', 64),
+)
@@ -5,10 +5,14 @@ Code in this file is a mix of Runtime layer and Workbench layer.
 """
 
 
+import copy
+import functools
 import importlib
-import itertools
 import logging
-from collections import defaultdict
+import threading
+from array import array
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from unittest.mock import Mock
 
@@ -21,22 +25,119 @@ from xblock.runtime import IdGenerator, IdReader, KeyValueStore, KvsFieldData, N
 import django.utils.translation
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, Q
 from django.template import loader as django_template_loader
 from django.templatetags.static import static
 from django.urls import reverse
 
-from .models import XBlockState
+from .events import EVENTS
+from .models import XBlockFieldState, XBlockState
+from .profiling import PROFILER, record_kvs
 from .util import make_safe_for_html
 
-try:
-    import simplejson as json
-except ImportError:
-    import json
-
 log = logging.getLogger(__name__)
 User = get_user_model()
 
 
+@contextmanager
+def _locked_rows(**filters):
+    """
+    Lock the `XBlockState` rows matching `filters` in a transaction, and yield them as a list.
+
+    Databases with SELECT ... FOR UPDATE lock just those rows. SQLite has no
+    row locks, so there a no-op UPDATE takes the database write lock before
+    the rows are read, and no other request can change them before they're
+    written.
+    """
+    with transaction.atomic():
+        rows = XBlockState.objects.filter(**filters)
+        if connection.features.has_select_for_update:
+            yield list(rows.select_for_update())
+        else:
+            rows.update(state=F('state'))
+            yield list(rows)
+
+
+@contextmanager
+def _locked_row(**filters):
+    """
+    Lock the `XBlockState` row matching `filters` in a transaction, and yield it.
+
+    Yields None if there's no such row yet. A missing row can't be locked, so
+    callers creating it rely on the unique constraint on (scope, scope_id,
+    user_id), and retry on IntegrityError if another request creates it first.
+    """
+    with _locked_rows(**filters) as rows:
+        yield rows[0] if rows else None
+
+
+def _merge_fields(current, state_dict, field_names):
+    """Copy the `field_names` of `state_dict` into the state dict `current`, dropping those it lacks."""
+    for field_name in field_names:
+        if field_name in state_dict:
+            current[field_name] = state_dict[field_name]
+        else:
+            current.pop(field_name, None)
+
+
+def _detached(value):
+    """Return a copy of `value` if it is a mutable JSON container."""
+    if isinstance(value, (dict, list)):
+        return copy.deepcopy(value)
+    return value
+
+
+class _RequestCache:
+    """
+    The `XBlockState` rows touched during one request, decoded once.
+
+    Rows are keyed on (scope, scope_id, user_id). Field mutations are applied
+    to the decoded state dicts in memory, and the rows they dirty are written
+    back in a single pass by `WorkbenchDjangoKeyValueStore.flush`.
+
+    `dirty` maps each changed row to the names of its changed fields. Other
+    requests may change the same rows in the meantime, so only those fields
+    are written back.
+
+    `prefetched` holds the (scenario, user_id) pairs whose rows have all been
+    loaded already, so a miss for one of them means the row doesn't exist yet.
+    """
+    def __init__(self):
+        self.rows = {}
+        self.dirty = defaultdict(set)
+        self.prefetched = set()
+        self.stats = {
+            'lookups': 0,
+            'writes': 0,
+            'queries': 0,
+            'row_loads': 0,
+            'row_saves': 0,
+        }
+
+    def add_row(self, record):
+        """Decode `record` and cache it, unless its row is already cached."""
+        row_key = (record.scope, record.scope_id, record.user_id)
+        if row_key not in self.rows:
+            self.rows[row_key] = (record, record.get_state())
+            self.stats['row_loads'] += 1
+        return self.rows[row_key]
+
+    def is_prefetched(self, fields):
+        """Whether the row identified by model `fields` was covered by a prefetch."""
+        return (fields['scenario'], fields['user_id']) in self.prefetched
+
+    @property
+    def queries_saved(self):
+        """
+        How many queries this request avoided compared to writing through.
+
+        Without the cache every lookup is a `get_or_create` and every write is
+        an additional `save`.
+        """
+        return self.stats['lookups'] + self.stats['writes'] - self.stats['queries']
+
+
 class WorkbenchDjangoKeyValueStore(KeyValueStore):
     """A Django model backed `KeyValueStore` for the Workbench to use.
 
@@ -49,54 +150,390 @@ class WorkbenchDjangoKeyValueStore(KeyValueStore):
 
     We store all fields for a given (scope, scope_id, user_id) in one JSON blob,
     rather than having a single row for each field name. This is why there's
-    some JSON packing/unpacking code.
+    some JSON packing/unpacking code, see `workbench.state_codecs`.
+
+    Inside `request_cache()` each row is read and decoded at most once, and
+    changed rows are written back once when the block exits. Outside of it,
+    every operation goes straight to the database.
     """
+    def __init__(self):
+        super().__init__()
+        self._local = threading.local()
+
     # Workbench-special methods.
     def clear(self):
         """Clear all data from the store."""
         XBlockState.objects.all().delete()
+        cache = self._request_cache
+        if cache is not None:
+            cache.rows.clear()
+            cache.dirty.clear()
+            cache.prefetched.clear()
+
+    def prep_for_scenario_loading(self, scenario=None):
+        """Reset any state that's necessary before we load scenarios, or just `scenario`."""
+        XBlockState.prep_for_scenario_loading(scenario)
 
-    def prep_for_scenario_loading(self):
-        """Reset any state that's necessary before we load scenarios."""
-        XBlockState.prep_for_scenario_loading()
+    def user_ids(self, after=None):
+        """
+        Return a queryset of the distinct ids of users with state, in order.
+
+        With `after`, only the ids that sort after it. The ordering and the
+        DISTINCT both come from the index on `user_id`.
+        """
+        user_ids = XBlockState.objects.filter(user_id__isnull=False)
+        if after is not None:
+            user_ids = user_ids.filter(user_id__gt=after)
+        return user_ids.order_by('user_id').values_list('user_id', flat=True).distinct()
+
+    @property
+    def _request_cache(self):
+        """The `_RequestCache` active on this thread, if any."""
+        return getattr(self._local, 'cache', None)
+
+    @contextmanager
+    def request_cache(self):
+        """
+        Cache rows for the duration of the block, flushing them on exit.
+
+        Nested uses share the outermost cache. Yields the `_RequestCache` so
+        callers can report its statistics.
+        """
+        cache = self._request_cache
+        if cache is not None:
+            yield cache
+            return
+
+        cache = self._local.cache = _RequestCache()
+        try:
+            yield cache
+        finally:
+            try:
+                self.flush()
+            finally:
+                self._local.cache = None
+            log.info(
+                "KVS request cache: %(lookups)d lookups, %(writes)d writes, %(queries)d queries, "
+                "%(row_loads)d rows loaded, %(row_saves)d rows saved",
+                cache.stats,
+            )
+            log.info("KVS request cache saved %d queries", cache.queries_saved)
+
+    def prefetch(self, scenario_slug, user_id):
+        """
+        Load every row of `scenario_slug` visible to `user_id` in one query.
+
+        This covers the shared content, settings and children rows as well as
+        `user_id`'s own state, so rendering the whole scenario tree afterwards
+        is served from memory. Only useful inside `request_cache()`; outside
+        of it there's nowhere to keep the rows, and this does nothing.
+        """
+        cache = self._request_cache
+        if cache is None or (scenario_slug, user_id) in cache.prefetched:
+            return
+        records = XBlockState.objects.filter(
+            Q(user_id=user_id) | Q(user_id__isnull=True),
+            scenario=scenario_slug,
+        )
+        cache.stats['queries'] += 1
+        for record in records:
+            cache.add_row(record)
+        cache.prefetched.update({(scenario_slug, user_id), (scenario_slug, None)})
+
+    def flush(self):
+        """Write every row changed in the active request cache."""
+        cache = self._request_cache
+        if cache is None:
+            return
+
+        # Rows a prefetch showed to be missing only exist in memory so far.
+        # Insert them all at once, whether or not they were written to, just
+        # like `get_or_create` would have.
+        new_rows = {}
+        for row_key, (record, state_dict) in cache.rows.items():
+            if record.pk is None:
+                record.set_state(state_dict)
+                new_rows[row_key] = record
+        if new_rows:
+            try:
+                with transaction.atomic():
+                    XBlockState.objects.bulk_create(new_rows.values())
+            except IntegrityError:
+                # Another request created some of these rows first.
+                self._create_or_merge(new_rows.values(), cache)
+            cache.stats['queries'] += 1
+            cache.stats['row_saves'] += len(new_rows)
+            for row_key, record in new_rows.items():
+                if record.pk is None:
+                    # This backend doesn't report the new primary keys; drop
+                    # the row so that it is reloaded if it's needed again.
+                    del cache.rows[row_key]
+
+        # Other requests may have changed the dirty rows since they were
+        # loaded, so lock them, merge just this request's changed fields into
+        # their current state, and write them all in one UPDATE.
+        dirty_rows = {
+            cache.rows[row_key][0].pk: row_key
+            for row_key in cache.dirty.keys() - new_rows.keys()
+        }
+        if dirty_rows:
+            with _locked_rows(pk__in=dirty_rows) as records:
+                for record in records:
+                    row_key = dirty_rows[record.pk]
+                    _record, state_dict = cache.rows[row_key]
+                    current = record.get_state()
+                    _merge_fields(current, state_dict, cache.dirty[row_key])
+                    record.set_state(current)
+                    cache.rows[row_key] = (record, current)
+                XBlockState.objects.bulk_update(records, ['state', 'state_format'])
+            cache.stats['queries'] += 3
+            cache.stats['row_saves'] += len(records)
+        cache.dirty.clear()
+
+    def _create_or_merge(self, records, cache):
+        """
+        Insert each of the new `records`, or merge its fields into the row another request created.
+        """
+        for record in records:
+            with transaction.atomic():
+                existing, created = XBlockState.objects.get_or_create(
+                    scope=record.scope, scope_id=record.scope_id, user_id=record.user_id,
+                    defaults={'scenario': record.scenario, 'tag': record.tag, 'state': record.state,
+                              'state_format': record.state_format},
+                )
+                if not created:
+                    state_dict = record.get_state()
+                    self._merge(existing, state_dict, state_dict.keys())
+            cache.stats['queries'] += 1 if created else 4
 
     @staticmethod
-    def _to_json_str(data):
+    def _merge(record, state_dict, field_names):
+        """
+        Save the `field_names` of `state_dict` into the current state of `record`.
+        """
+        with _locked_row(pk=record.pk):
+            record.refresh_from_db()
+            current = record.get_state()
+            _merge_fields(current, state_dict, field_names)
+            record.set_state(current)
+            record.save()
+
+    def increment(self, key, delta, default=0):
+        """
+        Add `delta` to the field `key` in the database, and return the result.
+
+        The row is locked while its blob is rewritten, so concurrent increments
+        are never lost. This happens immediately, even inside `request_cache()`.
+        A missing field counts as `default`.
+        """
+        fields = XBlockState.fields_for_key(key)
+        while True:
+            try:
+                with _locked_row(**fields) as record:
+                    if record is None:
+                        record = XBlockState(**fields)
+                    state_dict = record.get_state()
+                    value = state_dict.get(key.field_name, default) + delta
+                    state_dict[key.field_name] = value
+                    record.set_state(state_dict)
+                    record.save()
+                break
+            except IntegrityError:
+                # Another request created the row first; increment that one.
+                continue
+
+        cache = self._request_cache
+        if cache is not None:
+            cache.stats['queries'] += 3
+            row_key = (fields['scope'], fields['scope_id'], fields['user_id'])
+            if row_key in cache.rows:
+                # Keep this request's other pending changes to the row; they
+                # are flushed on top of the state we just saved.
+                _record, state_dict = cache.rows[row_key]
+                state_dict[key.field_name] = value
+            cache.rows[row_key] = (record, state_dict)
+            if row_key in cache.dirty:
+                cache.dirty[row_key].discard(key.field_name)
+        return value
+
+    def _load(self, key):
         """
-        Serialize data as a JSON string
+        Return the `(record, state_dict)` pair for `key`.
         """
-        return json.dumps(data, indent=2, sort_keys=True)
+        cache = self._request_cache
+        if cache is None:
+            record = XBlockState.get_for_key(key)
+            return record, record.get_state()
+
+        cache.stats['lookups'] += 1
+        fields = XBlockState.fields_for_key(key)
+        row_key = (fields['scope'], fields['scope_id'], fields['user_id'])
+        try:
+            return cache.rows[row_key]
+        except KeyError:
+            pass
+        if cache.is_prefetched(fields):
+            record = XBlockState(**fields)
+        else:
+            record, _ = XBlockState.objects.get_or_create(**fields)
+            cache.stats['queries'] += 1
+        return cache.add_row(record)
+
+    def _store(self, key, record, state_dict):
+        """
+        Persist `state_dict` on `record`, now or when the request cache flushes.
+        """
+        cache = self._request_cache
+        if cache is None:
+            record.set_state(state_dict)
+            record.save()
+            return
+
+        cache.stats['writes'] += 1
+        cache.dirty[(record.scope, record.scope_id, record.user_id)].add(key.field_name)
 
     # KeyValueStore methods.
     def get(self, key):
         """Get state for a given `KeyValueStore.Key`."""
-        record = XBlockState.get_for_key(key)
-        return json.loads(record.state)[key.field_name]
+        record_kvs('get')
+        _record, state_dict = self._load(key)
+        # Cached state outlives this call, so don't hand out mutable values
+        # that a block could change without calling `set`.
+        return _detached(state_dict[key.field_name])
 
     def set(self, key, value):
         """Set state for a given `KeyValueStore.Key` to `value`."""
-        record = XBlockState.get_for_key(key)
-        state_dict = json.loads(record.state)
-        state_dict[key.field_name] = value
-
-        record.state = self._to_json_str(state_dict)
-        record.save()
+        record_kvs('set')
+        record, state_dict = self._load(key)
+        state_dict[key.field_name] = _detached(value)
+        self._store(key, record, state_dict)
 
     def delete(self, key):
         """Delete state for a given `KeyValueStore.Key`."""
-        record = XBlockState.get_for_key(key)
-        state_dict = json.loads(record.state)
+        record_kvs('delete')
+        record, state_dict = self._load(key)
         del state_dict[key.field_name]
-        record.state = self._to_json_str(state_dict)
-        record.save()
+        self._store(key, record, state_dict)
 
     def has(self, key):
         """Check if an entry exists for `KeyValueStore.Key`."""
-        record = XBlockState.get_for_key(key)
-        state_dict = json.loads(record.state)
+        record_kvs('has')
+        _record, state_dict = self._load(key)
         return key.field_name in state_dict
 
 
+class WorkbenchFieldKeyValueStore(KeyValueStore):
+    """A Django model backed `KeyValueStore` that stores one row per field.
+
+    Unlike `WorkbenchDjangoKeyValueStore`, writing a field only touches that
+    field's row, with a single UPDATE, and integer fields can be incremented
+    in the database. Concurrent requests changing different fields of the same
+    block therefore can't overwrite each other.
+
+    Select it with::
+
+        WORKBENCH['kvs'] = 'workbench.runtime.WorkbenchFieldKeyValueStore'
+
+    The same scope_id convention as `WorkbenchDjangoKeyValueStore` applies.
+    """
+    # Workbench-special methods.
+    def clear(self):
+        """Clear all data from the store."""
+        XBlockFieldState.objects.all().delete()
+
+    def prep_for_scenario_loading(self, scenario=None):
+        """Reset any state that's necessary before we load scenarios, or just `scenario`."""
+        XBlockFieldState.prep_for_scenario_loading(scenario)
+
+    def user_ids(self, after=None):
+        """Return a queryset of the distinct ids of users with state, in order, see `WorkbenchDjangoKeyValueStore`."""
+        user_ids = XBlockFieldState.objects.exclude(user_id="")
+        if after is not None:
+            user_ids = user_ids.filter(user_id__gt=after)
+        return user_ids.order_by('user_id').values_list('user_id', flat=True).distinct()
+
+    @contextmanager
+    def request_cache(self):
+        """Every write goes straight to its own row, so there's nothing to cache."""
+        yield None
+
+    def prefetch(self, scenario_slug, user_id):
+        """Nothing to do, see `request_cache`."""
+
+    def flush(self):
+        """Nothing to do, see `request_cache`."""
+
+    def increment(self, key, delta, default=0):
+        """
+        Add `delta` to the integer field `key` in the database, and return the result.
+
+        A missing field counts as `default`.
+        """
+        records = XBlockFieldState.filter_for_key(key)
+        while True:
+            with transaction.atomic():
+                if records.filter(int_value__isnull=False).update(int_value=F('int_value') + delta):
+                    # The UPDATE keeps the row locked until the transaction
+                    # ends, so no other increment can land before this read.
+                    return records.values_list('int_value', flat=True).get()
+                # Not stored as an integer, so it can't be incremented in SQL:
+                # read and write it with the row locked, as in `_locked_row`.
+                if connection.features.has_select_for_update:
+                    record = records.select_for_update().first()
+                else:
+                    records.update(value=F('value'))
+                    record = records.first()
+                if record is not None:
+                    value = record.get_value() + delta
+                    records.update(**XBlockFieldState.columns_for_value(value))
+                    return value
+            try:
+                with transaction.atomic():
+                    XBlockFieldState.objects.create(
+                        int_value=default + delta,
+                        **XBlockFieldState.fields_for_key(key)
+                    )
+                return default + delta
+            except IntegrityError:
+                # Another request created the row first; increment that one.
+                continue
+
+    # KeyValueStore methods.
+    def get(self, key):
+        """Get state for a given `KeyValueStore.Key`."""
+        record_kvs('get')
+        try:
+            record = XBlockFieldState.filter_for_key(key).get()
+        except XBlockFieldState.DoesNotExist as ex:
+            raise KeyError(key.field_name) from ex
+        return record.get_value()
+
+    def set(self, key, value):
+        """Set state for a given `KeyValueStore.Key` to `value`."""
+        record_kvs('set')
+        columns = XBlockFieldState.columns_for_value(value)
+        if XBlockFieldState.filter_for_key(key).update(**columns):
+            return
+        try:
+            with transaction.atomic():
+                XBlockFieldState.objects.create(**columns, **XBlockFieldState.fields_for_key(key))
+        except IntegrityError:
+            # Another request created the row first; overwrite it.
+            XBlockFieldState.filter_for_key(key).update(**columns)
+
+    def delete(self, key):
+        """Delete state for a given `KeyValueStore.Key`."""
+        record_kvs('delete')
+        deleted, _ = XBlockFieldState.filter_for_key(key).delete()
+        if not deleted:
+            raise KeyError(key.field_name)
+
+    def has(self, key):
+        """Check if an entry exists for `KeyValueStore.Key`."""
+        record_kvs('has')
+        return XBlockFieldState.filter_for_key(key).exists()
+
+
 class ScenarioIdManager(IdReader, IdGenerator):
     """A scenario-aware ID manager.
 
@@ -110,32 +547,52 @@ class ScenarioIdManager(IdReader, IdGenerator):
     numbering is local to the definition_id. This is to help ensure that IDs
     shift around as little as possible when you add new content/scenarios.
 
+    The next number of every sequence is kept in one array, indexed through
+    the `_definition_seqs` and `_usage_seqs` dicts, rather than in a counter
+    object per sequence. Ids are only created while loading content, which
+    happens on one thread at a time.
+
     """
     def __init__(self):
-        self._block_types_to_id_seq = defaultdict(itertools.count)
-        self._def_ids_to_id_seq = defaultdict(itertools.count)
+        self._definition_seqs = {}
+        self._usage_seqs = {}
+        self._seqs = array('L')
         self._usages = {}
         self._definitions = {}
         self._aside_defs = {}
         self._aside_usages = {}
+        self._last_usage_id = None
         self.scenario = ""
         super().__init__()
 
     def clear(self):
         """Remove all entries."""
-        self._block_types_to_id_seq.clear()
-        self._def_ids_to_id_seq.clear()
+        self._definition_seqs.clear()
+        self._usage_seqs.clear()
+        del self._seqs[:]
         self._usages.clear()
         self._definitions.clear()
         self._aside_defs.clear()
         self._aside_usages.clear()
+        self._last_usage_id = None
         self.scenario = ""
 
+    def _next_in_seq(self, slots, seq_key):
+        """Return the next number of the sequence `seq_key` in `slots`, starting at 0."""
+        slot = slots.get(seq_key)
+        if slot is None:
+            slot = slots[seq_key] = len(self._seqs)
+            self._seqs.append(0)
+        number = self._seqs[slot]
+        self._seqs[slot] = number + 1
+        return number
+
     def create_usage(self, def_id):
         """Make a usage, storing its definition id."""
-        id_seq = self._def_ids_to_id_seq[def_id]
-        usage_id = f"{def_id}.u{next(id_seq)}"
+        usage_id = f"{def_id}.u{self._next_in_seq(self._usage_seqs, def_id)}"
         self._usages[usage_id] = def_id
+        if self._last_usage_id is None or usage_id > self._last_usage_id:
+            self._last_usage_id = usage_id
 
         return usage_id
 
@@ -152,8 +609,7 @@ class ScenarioIdManager(IdReader, IdGenerator):
         if slug:
             prefix += "." + slug
 
-        id_seq = self._block_types_to_id_seq[prefix]
-        def_id = f"{prefix}.d{next(id_seq)}"
+        def_id = f"{prefix}.d{self._next_in_seq(self._definition_seqs, prefix)}"
         self._definitions[def_id] = block_type
 
         return def_id
@@ -233,7 +689,38 @@ class ScenarioIdManager(IdReader, IdGenerator):
         """Sometimes you create a usage for testing and just want to grab it
         back. This gives an easy hook to do that.
         """
-        return sorted(self._usages.keys())[-1] if self._usages else None
+        return self._last_usage_id
+
+    def get_state(self):
+        """
+        Return everything this manager has allocated, as JSON-serializable data.
+
+        `set_state` restores it, so a restarted process can carry on with the
+        same ids without parsing the content again.
+        """
+        return {
+            'scenario': self.scenario,
+            'definition_seqs': {prefix: self._seqs[slot] for prefix, slot in self._definition_seqs.items()},
+            'usage_seqs': {def_id: self._seqs[slot] for def_id, slot in self._usage_seqs.items()},
+            'usages': self._usages,
+            'definitions': self._definitions,
+            'aside_defs': self._aside_defs,
+            'aside_usages': self._aside_usages,
+        }
+
+    def set_state(self, state):
+        """Replace everything this manager has allocated with `state`, from `get_state`."""
+        self.clear()
+        self.scenario = state['scenario']
+        for slots, seqs in ((self._definition_seqs, state['definition_seqs']), (self._usage_seqs, state['usage_seqs'])):
+            for seq_key, number in seqs.items():
+                slots[seq_key] = len(self._seqs)
+                self._seqs.append(number)
+        self._usages.update(state['usages'])
+        self._definitions.update(state['definitions'])
+        self._aside_defs.update((key, tuple(value)) for key, value in state['aside_defs'].items())
+        self._aside_usages.update((key, tuple(value)) for key, value in state['aside_usages'].items())
+        self._last_usage_id = max(self._usages, default=None)
 
 
 class WorkbenchRuntime(Runtime):
@@ -266,6 +753,46 @@ class WorkbenchRuntime(Runtime):
 
         super().__init__(ID_MANAGER, ID_MANAGER, services=services)
         self.user_id = user_id
+        self._blocks = None
+        self.block_cache_stats = {'hits': 0, 'misses': 0}
+
+    @contextmanager
+    def block_cache(self):
+        """
+        Return the same block object for a usage_id for the duration of the block.
+
+        `get_block` is called for the same children and parents over and over
+        while rendering a tree or checking a problem; inside `block_cache()`
+        each usage is only constructed once. Nested uses share the outermost
+        cache, and `block_cache_stats` counts its hits and misses.
+        """
+        if self._blocks is not None:
+            yield
+            return
+
+        self._blocks = {}
+        self.block_cache_stats = {'hits': 0, 'misses': 0}
+        try:
+            yield
+        finally:
+            self._blocks = None
+            log.info("Block cache: %(hits)d hits, %(misses)d misses", self.block_cache_stats)
+
+    def get_block(self, usage_id, for_parent=None):
+        """Get the block for `usage_id`, from the block cache if there is one."""
+        if self._blocks is None:
+            return super().get_block(usage_id, for_parent=for_parent)
+        try:
+            block = self._blocks[usage_id]
+        except KeyError:
+            self.block_cache_stats['misses'] += 1
+            block = self._blocks[usage_id] = super().get_block(usage_id, for_parent=for_parent)
+        else:
+            self.block_cache_stats['hits'] += 1
+            if for_parent is not None and block._parent_block is None:  # pylint: disable=protected-access
+                block._parent_block = for_parent  # pylint: disable=protected-access
+                block._parent_block_id = for_parent.scope_ids.usage_id  # pylint: disable=protected-access
+        return block
 
     def get_user_role(self):
         """Provide a dummy user role."""
@@ -309,13 +836,15 @@ class WorkbenchRuntime(Runtime):
     def handle(self, block, handler_name, request, suffix=''):
         """Patch the XBlock with required fields."""
         self._patch_xblock(block)
-        return super().handle(block, handler_name, request, suffix)
+        with PROFILER.profile(block.scope_ids.block_type, 'handler', handler_name):
+            return super().handle(block, handler_name, request, suffix)
 
     def render(self, block, view_name, context=None):
         """Renders using parent class render() method"""
         self._patch_xblock(block)
         try:
-            return super().render(block, view_name, context)
+            with PROFILER.profile(block.scope_ids.block_type, 'view', view_name):
+                return super().render(block, view_name, context)
         except NoSuchViewError:
             return Fragment("<i>No such view: %s on %s</i>"
                             % (view_name, make_safe_for_html(repr(block))))
@@ -345,7 +874,9 @@ class WorkbenchRuntime(Runtime):
 
         return wrapped
 
-    def handler_url(self, block, handler_name, suffix='', query='', thirdparty=False):  # pylint: disable=too-many-positional-arguments
+    def handler_url(  # pylint: disable=too-many-positional-arguments
+        self, block, handler_name, suffix='', query='', thirdparty=False
+    ):
         """Helper to get the correct url for the given handler"""
         # Be sure this really is a handler.
         func = getattr(block, handler_name, None)
@@ -383,18 +914,45 @@ class WorkbenchRuntime(Runtime):
         return reverse("package_resource", args=(block.scope_ids.block_type, uri))
 
     def publish(self, block, event_type, event_data):
-        """Mocks a publish event by logging args"""
-        log.info(
-            "XBlock event %s for %s (usage_id=%s):",
+        """Queue the event for the configured event sink, see `workbench.events`."""
+        EVENTS.publish(
             event_type,
             block.scope_ids.block_type,
-            block.scope_ids.usage_id
+            str(block.scope_ids.usage_id),
+            block.scope_ids.user_id,
+            event_data,
         )
-        log.info(event_data)
+
+    def increment(self, block, field_name, delta=1):
+        """
+        Add `delta` to the integer field `field_name` of `block`, and return the result.
+
+        Unlike `block.field_name += delta`, this is done by the key-value store
+        as a single atomic operation, so increments made by concurrent requests
+        are never lost.
+        """
+        # pylint: disable=protected-access
+        field = block.fields[field_name]
+        field_data = block._field_data
+        kvs = getattr(field_data, '_kvs', None)
+        if not hasattr(kvs, 'increment'):
+            value = getattr(block, field_name) + delta
+            setattr(block, field_name, value)
+            return value
+
+        value = kvs.increment(field_data._key(block, field_name), delta, default=field.default)
+        # Update the block as if it had read the new value, without marking
+        # the field dirty: saving it again could undo other increments.
+        field._set_cached_value(block, value)
+        block._dirty_fields.pop(field, None)
+        return value
 
     def query(self, block):
         """Return a BlockSet query on block"""
-        return _BlockSet(self, [block])
+        usage_id = block.scope_ids.usage_id
+        if usage_id not in SCENARIO_INDEX.children:
+            SCENARIO_INDEX.add_block(block)
+        return _BlockSet(self, [usage_id], blocks=[block])
 
     def _load_service(self, service_path):  # pylint: disable=inconsistent-return-statements
         """Load and and initialize a service instance.
@@ -406,9 +964,8 @@ class WorkbenchRuntime(Runtime):
         Returns an instance of the service, or `None` if the
         service could not be initialized.
         """
-        module_path, _, name = service_path.rpartition('.')
         try:
-            cls = getattr(importlib.import_module(module_path), name)
+            cls = _import_service_class(service_path)
             service_instance = cls()
             service_instance.runtime = self
             return service_instance
@@ -418,13 +975,145 @@ class WorkbenchRuntime(Runtime):
             log.exception('Could not initialize service defined at "%s"', service_path)
 
 
+@functools.lru_cache(maxsize=None)
+def _import_service_class(service_path):
+    """Import and return the class at `service_path`, once per path."""
+    module_path, _, name = service_path.rpartition('.')
+    return getattr(importlib.import_module(module_path), name)
+
+
+class WorkbenchRuntimePool:
+    """
+    Idle `WorkbenchRuntime` instances, kept per user between requests.
+
+    Building a runtime sets up all of its services, so the views check one
+    out of the pool for each request instead. A runtime is only ever used by
+    one request at a time, and its block cache lasts as long as the request.
+    Runtimes are kept for the `max_users` most recently seen users; a
+    `max_users` of 0 disables pooling.
+    """
+    def __init__(self, max_users):
+        self.max_users = max_users
+        self._idle = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0}
+
+    @contextmanager
+    def runtime(self, user_id):
+        """
+        Check out a runtime for `user_id` for the duration of the block.
+
+        A runtime whose request raised is dropped rather than reused.
+        """
+        with self._lock:
+            idle = self._idle.get(user_id)
+            runtime = idle.pop() if idle else None
+            self.stats['hits' if runtime else 'misses'] += 1
+        if runtime is None:
+            runtime = WorkbenchRuntime(user_id)
+
+        with runtime.block_cache():
+            yield runtime
+
+        if not self.max_users:
+            return
+        with self._lock:
+            self._idle.setdefault(user_id, []).append(runtime)
+            self._idle.move_to_end(user_id)
+            while len(self._idle) > self.max_users:
+                self._idle.popitem(last=False)
+
+    def clear(self):
+        """Drop all idle runtimes."""
+        with self._lock:
+            self._idle.clear()
+
+
+class ScenarioIndex:
+    """
+    The structure of the loaded content: each usage's children and parent,
+    and the usages each name or tag selects.
+
+    `querypath` works from this instead of constructing blocks to read their
+    `children`, `parent`, `name` and `tags` fields. Scenarios are indexed as
+    they are added, and any other usage the first time it is queried. A
+    usage's structure is assumed not to change once it has been parsed,
+    which holds in the workbench, where content only comes from XML.
+    """
+    def __init__(self):
+        self.children = {}
+        self.parents = {}
+        self.labels = defaultdict(set)
+
+    def clear(self):
+        """Remove all entries."""
+        self.children.clear()
+        self.parents.clear()
+        self.labels.clear()
+
+    def add_block(self, block):
+        """Index `block` and return its children's usage_ids."""
+        # Allow this method to access _class_tags for each block
+        # pylint: disable=W0212
+        usage_id = block.scope_ids.usage_id
+        children = tuple(getattr(block, "children", ()))
+        for label in {block.name, *(block.tags or ()), *block._class_tags}:
+            if label:
+                self.labels[label].add(usage_id)
+        self.parents[usage_id] = block.parent
+        for child_id in children:
+            self.parents[child_id] = usage_id
+        # Set last: a usage counts as indexed once it has its children.
+        self.children[usage_id] = children
+        return children
+
+    def add_tree(self, runtime, usage_id):
+        """Index `usage_id` and everything below it."""
+        pending = [usage_id]
+        while pending:
+            pending.extend(self.add_block(runtime.get_block(pending.pop())))
+
+    def _ensure(self, runtime, usage_id):
+        """Index `usage_id` if it isn't yet."""
+        if usage_id not in self.children:
+            self.add_block(runtime.get_block(usage_id))
+
+    def get_children(self, runtime, usage_id):
+        """Return the usage_ids of the children of `usage_id`."""
+        self._ensure(runtime, usage_id)
+        return self.children[usage_id]
+
+    def get_parent(self, runtime, usage_id):
+        """Return the usage_id of the parent of `usage_id`, or None."""
+        self._ensure(runtime, usage_id)
+        return self.parents[usage_id]
+
+    def tagged(self, runtime, usage_ids, tag):
+        """Return those of `usage_ids` whose name, tags or class tags include `tag`."""
+        for usage_id in usage_ids:
+            self._ensure(runtime, usage_id)
+        matches = self.labels.get(tag, ())
+        return [usage_id for usage_id in usage_ids if usage_id in matches]
+
+
 class _BlockSet:
     """
     Provide a collection of blocks
+
+    The set works on usage_ids from `SCENARIO_INDEX`; blocks are only
+    constructed when they are iterated over or their attributes are read.
     """
-    def __init__(self, runtime, blocks):
+    def __init__(self, runtime, usage_ids, blocks=None):
         self.runtime = runtime
-        self.blocks = blocks
+        self.usage_ids = list(dict.fromkeys(usage_ids))
+        self._blocks = blocks
+
+    @property
+    def blocks(self):
+        """The blocks in this set, in document order"""
+        if self._blocks is None:
+            self._blocks = [self.runtime.get_block(usage_id) for usage_id in self.usage_ids]
+        return self._blocks
 
     def __iter__(self):
         """
@@ -436,41 +1125,35 @@ class _BlockSet:
         """
         Create a `BlockSet` of all blocks' parents
         """
-        them = set()
-        for block in self.blocks:
-            if block.parent:
-                parent = self.runtime.get_block(block.parent)
-                them.add(parent)
-        return _BlockSet(self.runtime, them)
+        parent_ids = (SCENARIO_INDEX.get_parent(self.runtime, usage_id) for usage_id in self.usage_ids)
+        return _BlockSet(self.runtime, [parent_id for parent_id in parent_ids if parent_id])
 
     def children(self):
         """
         Create a `BlockSet` of all blocks' children
         """
-        them = set()
-        for block in self.blocks:
-            for child_id in getattr(block, "children", ()):
-                child = self.runtime.get_block(child_id)
-                them.add(child)
-        return _BlockSet(self.runtime, them)
+        return _BlockSet(self.runtime, [
+            child_id
+            for usage_id in self.usage_ids
+            for child_id in SCENARIO_INDEX.get_children(self.runtime, usage_id)
+        ])
 
     def descendants(self):
         """
         Create a `BlockSet` of all blocks and their children
         """
-        them = set()
+        them = []
 
-        def recur(block):
+        def recur(usage_id):
             """
             Descend into block children, recursively
             """
-            for child_id in getattr(block, "children", ()):
-                child = self.runtime.get_block(child_id)
-                them.add(child)
-                recur(child)
+            for child_id in SCENARIO_INDEX.get_children(self.runtime, usage_id):
+                them.append(child_id)
+                recur(child_id)
 
-        for block in self.blocks:
-            recur(block)
+        for usage_id in self.usage_ids:
+            recur(usage_id)
 
         return _BlockSet(self.runtime, them)
 
@@ -478,17 +1161,7 @@ class _BlockSet:
         """
         Create a `BlockSet` of all blocks matching the corresponding tag
         """
-        # Allow this method to access _class_tags for each block
-        # pylint: disable=W0212
-        them = set()
-        for block in self.blocks:
-            if block.name == tag:
-                them.add(block)
-            if block.tags and tag in block.tags:
-                them.add(block)
-            elif tag in block._class_tags:
-                them.add(block)
-        return _BlockSet(self.runtime, them)
+        return _BlockSet(self.runtime, SCENARIO_INDEX.tagged(self.runtime, self.usage_ids, tag))
 
     def attr(self, attr_name):
         """
@@ -499,12 +1172,25 @@ class _BlockSet:
                 yield getattr(block, attr_name)
 
 
+def _load_kvs():
+    """Create the key-value store selected by `settings.WORKBENCH['kvs']`."""
+    kvs_path = settings.WORKBENCH.get('kvs', 'workbench.runtime.WorkbenchDjangoKeyValueStore')
+    module_path, _, name = kvs_path.rpartition('.')
+    return getattr(importlib.import_module(module_path), name)()
+
+
 # Our global state (the "database").
-WORKBENCH_KVS = WorkbenchDjangoKeyValueStore()
+WORKBENCH_KVS = _load_kvs()
 
 # Our global id manager
 ID_MANAGER = ScenarioIdManager()
 
+# Our global index of the structure of scenarios, keyed by ID_MANAGER's ids
+SCENARIO_INDEX = ScenarioIndex()
+
+# Our global pool of runtimes, for the views to use
+RUNTIME_POOL = WorkbenchRuntimePool(settings.WORKBENCH.get('runtime_pool_size', 100))
+
 
 class WorkBenchUserService(UserService):
     """
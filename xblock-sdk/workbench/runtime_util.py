@@ -2,7 +2,7 @@
 Runtime utilities
 """
 
-from .runtime import ID_MANAGER, WORKBENCH_KVS
+from .runtime import ID_MANAGER, RUNTIME_POOL, SCENARIO_INDEX, WORKBENCH_KVS
 from .scenarios import init_scenarios
 
 
@@ -15,4 +15,6 @@ def reset_global_state():
     """
     WORKBENCH_KVS.clear()
     ID_MANAGER.clear()
+    SCENARIO_INDEX.clear()
+    RUNTIME_POOL.clear()
     init_scenarios()
@@ -5,38 +5,129 @@ This code is in the Workbench layer.
 """
 
 
+import functools
+import hashlib
+import json
 import logging
-from collections import namedtuple
+import threading
 
 from xblock.core import XBlock
 
 from django.conf import settings
 from django.template.defaultfilters import slugify
 
-from .runtime import WORKBENCH_KVS, WorkbenchRuntime
+from .runtime import ID_MANAGER, SCENARIO_INDEX, WORKBENCH_KVS, WorkbenchRuntime
 
 log = logging.getLogger(__name__)
 
 # Build the scenarios, which are named trees of usages.
 
-Scenario = namedtuple("Scenario", "description usage_id xml")
-
 SCENARIOS = {}
 
+# Serializes parsing scenarios, and guards `_loaded_slugs`.
+_LOAD_LOCK = threading.RLock()
+
+# The scenario slugs loaded since their children entries were last deleted.
+_loaded_slugs = set()
+
 
-def add_xml_scenario(scname, description, xml):
+class Scenario:
+    """
+    A named tree of usages, defined in XML.
+
+    A scenario's XML is parsed, and its content written to the key-value
+    store, the first time its `usage_id` is needed.
+    """
+    def __init__(self, description, usage_id, xml):
+        self.description = description
+        self.xml = xml
+        self.slug = slugify(description)
+        self._usage_id = usage_id
+
+    @property
+    def usage_id(self):
+        """The usage_id of the root of the scenario"""
+        if self._usage_id is None:
+            self.load()
+        return self._usage_id
+
+    @property
+    def loaded(self):
+        """Whether the scenario's XML has been parsed"""
+        return self._usage_id is not None
+
+    def load(self):
+        """
+        Parse the scenario's XML, unless it has been already.
+
+        Ids are given out per slug, in the order scenarios are parsed, so
+        every other scenario with the same slug is parsed first, in the order
+        they were added. That way each gets the same ids whichever of them is
+        opened first, as when all the scenarios were parsed up front.
+
+        This writes to the key-value store directly, so it mustn't happen
+        inside `WORKBENCH_KVS.request_cache()`.
+        """
+        with _LOAD_LOCK:
+            if self._usage_id is not None:
+                return
+            for scenario in list(SCENARIOS.values()):
+                if scenario.slug == self.slug and not scenario.loaded:
+                    scenario._parse()  # pylint: disable=protected-access
+            if self._usage_id is None:
+                self._parse()
+
+            state_file = settings.WORKBENCH.get('scenario_state_file')
+            if state_file and get_scenarios.initialized:
+                save_scenarios(state_file)
+
+    def _parse(self):
+        """Parse the scenario's XML, and write its content to the key-value store."""
+        if self.slug not in _loaded_slugs:
+            # Children are appended to, so clear out any left from an
+            # earlier run, see `XBlockState.prep_for_scenario_loading`.
+            WORKBENCH_KVS.prep_for_scenario_loading(self.slug)
+            _loaded_slugs.add(self.slug)
+
+        runtime = WorkbenchRuntime()
+        # WorkbenchRuntime has an id_generator, but most runtimes won't
+        # (because the generator will be contextual), so we
+        # pass it explicitly to parse_xml_string.
+        runtime.id_generator.set_scenario(self.slug)
+        usage_id = runtime.parse_xml_string(self.xml)
+        SCENARIO_INDEX.add_tree(runtime, usage_id)
+        self._usage_id = usage_id
+        log.info("Loaded scenario %r", self.description)
+
+    def __eq__(self, other):
+        if not isinstance(other, Scenario):
+            return NotImplemented
+        return (self.description, self._usage_id, self.xml) == (other.description, other._usage_id, other.xml)
+
+    def __repr__(self):
+        return f"Scenario({self.description!r}, {self._usage_id!r}, {self.xml!r})"
+
+
+def add_xml_scenario(scname, description, xml, lazy=False):
     """
     Add a scenario defined in XML.
+
+    With `lazy`, the XML is only parsed when the scenario is first used.
     """
     assert scname not in SCENARIOS, "Already have a %r scenario" % scname
-    runtime = WorkbenchRuntime()
+    scenario = Scenario(description, None, xml)
+    if not lazy:
+        scenario.load()
+    SCENARIOS[scname] = scenario
+
 
-    # WorkbenchRuntime has an id_generator, but most runtimes won't
-    # (because the generator will be contextual), so we
-    # pass it explicitly to parse_xml_string.
-    runtime.id_generator.set_scenario(slugify(description))
-    usage_id = runtime.parse_xml_string(xml)
-    SCENARIOS[scname] = Scenario(description, usage_id, xml)
+def load_scenarios(slug):
+    """
+    Load every scenario whose ids start with `slug`, so their usages exist.
+    """
+    for scenario in get_scenarios().values():
+        if scenario.slug == slug and not scenario.loaded:
+            scenario.load()
 
 
 def remove_scenario(scname):
@@ -46,7 +137,7 @@ def remove_scenario(scname):
     del SCENARIOS[scname]
 
 
-def add_class_scenarios(class_name, cls, fail_silently=True):
+def add_class_scenarios(class_name, cls, fail_silently=True, lazy=False):
     """
     Add scenarios from a class to the global collection of scenarios.
     """
@@ -55,7 +146,7 @@ def add_class_scenarios(class_name, cls, fail_silently=True):
         for i, (desc, xml) in enumerate(cls.workbench_scenarios()):
             scname = "%s.%d" % (class_name, i)
             try:
-                add_xml_scenario(scname, desc, xml)
+                add_xml_scenario(scname, desc, xml, lazy=lazy)
             except Exception:  # pylint: disable=broad-exception-caught
                 # don't allow a single bad scenario to block the whole workbench
                 if fail_silently:
@@ -67,25 +158,96 @@ def add_class_scenarios(class_name, cls, fail_silently=True):
 def init_scenarios():
     """
     Create all the scenarios declared in all the XBlock classes.
+
+    Unless `settings.WORKBENCH['lazy_scenarios']` is off, this only records
+    the scenarios; each is parsed when it's first used.
     """
     # Clear any existing scenarios, since this is used repeatedly during testing.
     SCENARIOS.clear()
-    if settings.WORKBENCH['reset_state_on_restart']:
-        WORKBENCH_KVS.clear()
-    else:
-        WORKBENCH_KVS.prep_for_scenario_loading()
+    with _LOAD_LOCK:
+        if settings.WORKBENCH['reset_state_on_restart']:
+            WORKBENCH_KVS.clear()
+        else:
+            WORKBENCH_KVS.prep_for_scenario_loading()
+        _loaded_slugs.clear()
 
     # Get all the XBlock classes, and add their scenarios.
+    lazy = settings.WORKBENCH.get('lazy_scenarios', True)
+    for class_name, cls in sorted(XBlock.load_classes(fail_silently=False)):
+        add_class_scenarios(class_name, cls, fail_silently=False, lazy=lazy)
+
+
+@functools.lru_cache(maxsize=None)
+def _scenarios_fingerprint():
+    """
+    Return a hash of the scenarios declared by all the XBlock classes.
+    """
+    digest = hashlib.sha256()
     for class_name, cls in sorted(XBlock.load_classes(fail_silently=False)):
-        add_class_scenarios(class_name, cls, fail_silently=False)
+        if hasattr(cls, "workbench_scenarios"):
+            digest.update(json.dumps([class_name, list(cls.workbench_scenarios())]).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def save_scenarios(path):
+    """
+    Write the loaded scenarios and the ids allocated for them to `path`.
+    """
+    state = {
+        'fingerprint': _scenarios_fingerprint(),
+        'scenarios': {
+            scname: [scenario.description, scenario.usage_id if scenario.loaded else None, scenario.xml]
+            for scname, scenario in SCENARIOS.items()
+        },
+        'ids': ID_MANAGER.get_state(),
+    }
+    with open(path, 'w', encoding='utf-8') as state_file:
+        json.dump(state, state_file)
+
+
+def restore_scenarios(path):
+    """
+    Load the scenarios written by `save_scenarios` instead of parsing them again.
+
+    The scenarios' content is already in the database from when they were
+    parsed, so this only restores their ids. Returns False, and leaves
+    everything untouched, if there's no saved state or the XBlock classes now
+    declare different scenarios.
+    """
+    try:
+        with open(path, encoding='utf-8') as state_file:
+            state = json.load(state_file)
+    except (OSError, ValueError):
+        return False
+    if state.get('fingerprint') != _scenarios_fingerprint():
+        return False
+
+    with _LOAD_LOCK:
+        ID_MANAGER.set_state(state['ids'])
+        SCENARIOS.clear()
+        SCENARIOS.update((scname, Scenario(*scenario)) for scname, scenario in state['scenarios'].items())
+        _loaded_slugs.clear()
+        _loaded_slugs.update(scenario.slug for scenario in SCENARIOS.values() if scenario.loaded)
+    return True
 
 
 def get_scenarios():
     """
     Return SCENARIOS, initializing it if required.
+
+    With `settings.WORKBENCH['scenario_state_file']` set, the first call
+    restores the scenarios from that file when it can, and they are saved to
+    it again whenever one is loaded.
     """
     if not SCENARIOS and not get_scenarios.initialized:
-        init_scenarios()
+        state_file = settings.WORKBENCH.get('scenario_state_file')
+        # Resetting the state on restart wipes the scenarios' content, so
+        # they have to be parsed again.
+        restore = state_file and not settings.WORKBENCH['reset_state_on_restart']
+        if not (restore and restore_scenarios(state_file)):
+            init_scenarios()
+            if state_file:
+                save_scenarios(state_file)
         get_scenarios.initialized = True
     return SCENARIOS
 
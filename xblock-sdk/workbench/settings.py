@@ -163,8 +163,10 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'workbench.urls'
 
-# Python dotted path to the WSGI application used by Django's runserver.
+# Python dotted path to the WSGI application used by Django's runserver,
+# and to the ASGI one, for ASGI servers that read this setting.
 WSGI_APPLICATION = 'workbench.wsgi.application'
+ASGI_APPLICATION = 'workbench.asgi.application'
 
 TEMPLATE_DIRS = []
 
@@ -241,7 +243,87 @@ WORKBENCH = {
     'services': {
         'fs': 'xblock.reference.plugins.FSService',
         'settings': 'workbench.services.SettingsService',
-    }
+    },
+
+    # The key-value store holding XBlock state: WorkbenchDjangoKeyValueStore
+    # keeps each block scope in one JSON row, WorkbenchFieldKeyValueStore keeps
+    # one row per field.
+    'kvs': os.environ.get('WORKBENCH_KVS', 'workbench.runtime.WorkbenchDjangoKeyValueStore'),
+
+    # Parse each scenario's XML only when it's first shown, rather than all
+    # of them on startup.
+    'lazy_scenarios': os.environ.get('WORKBENCH_LAZY_SCENARIOS', "true").lower() == "true",
+
+    # A file to save the loaded scenarios' ids in, so that restarts can
+    # restore them instead of parsing every scenario again. Delete it along
+    # with the database.
+    'scenario_state_file': os.environ.get('WORKBENCH_SCENARIO_STATE_FILE'),
+
+    # Route handler requests to async views, which run the handlers in a
+    # pool of async_handler_threads threads; workbench.asgi turns this on.
+    'async_handlers': os.environ.get('WORKBENCH_ASYNC_HANDLERS', "false").lower() == "true",
+    'async_handler_threads': int(os.environ.get('WORKBENCH_ASYNC_HANDLER_THREADS', 16)),
+
+    # How many users' WorkbenchRuntime instances the views keep around for
+    # reuse; 0 builds a new runtime for every request.
+    'runtime_pool_size': 100,
+
+    # How many XBlock resources package_resource keeps in memory, and the
+    # Cache-Control header it serves them with. "no-cache" makes browsers
+    # check the ETag on every use, so edited resources show up on reload.
+    'resource_cache_size': 256,
+    'resource_cache_control': os.environ.get('WORKBENCH_RESOURCE_CACHE_CONTROL', 'no-cache'),
+
+    # Serve each run of inline CSS or JavaScript on a scenario page as one
+    # hashed bundle URL, rather than inline. Bundles are written to
+    # fragment_bundle_dir, which all the workbench's processes must share,
+    # and fragment_bundle_cache_size of them are kept in memory.
+    'bundle_fragment_resources': (
+        os.environ.get('WORKBENCH_BUNDLE_FRAGMENT_RESOURCES', "false").lower() == "true"
+    ),
+    'fragment_bundle_dir': os.environ.get('WORKBENCH_FRAGMENT_BUNDLE_DIR', 'var/bundles'),
+    'fragment_bundle_cache_size': 64,
+
+    # Measure each handler call and view render, and report the last
+    # profile_buffer_size of them at /profile/. With profile_slowest set to
+    # N, requests also run under cProfile and the N slowest are kept.
+    'profile': os.environ.get('WORKBENCH_PROFILE', "false").lower() == "true",
+    'profile_buffer_size': 1000,
+    'profile_slowest': int(os.environ.get('WORKBENCH_PROFILE_SLOWEST', 0)),
+
+    # Where the events XBlocks publish go, see workbench.events: the class
+    # of the sink and its arguments. Events wait in a queue of
+    # event_queue_size and are written by a background thread, up to
+    # event_batch_size at a time; when the queue is full, events are dropped.
+    'event_sink': os.environ.get('WORKBENCH_EVENT_SINK', 'workbench.events.LogEventSink'),
+    'event_sink_options': (
+        {'path': os.environ['WORKBENCH_EVENT_FILE']} if 'WORKBENCH_EVENT_FILE' in os.environ else {}
+    ),
+    'event_queue_size': 10000,
+    'event_batch_size': 500,
+    'event_flush_interval': 0.5,
+
+    # How XBlockState rows are encoded, see workbench.state_codecs.
+    # Existing rows keep reading after a change; run the
+    # workbench_reencode_state management command to convert them.
+    'state_codec': os.environ.get('WORKBENCH_STATE_CODEC', 'json'),
+    'state_compression': os.environ.get('WORKBENCH_STATE_COMPRESSION') or None,
+    'state_compression_threshold': 4096,
+}
+
+# Server-wide settings for XBlocks, by block class name, see SettingsService.
+XBLOCK_SETTINGS = {
+    'ProblemBlock': {
+        # Problem scripts' results are kept for this many (script, seed)
+        # pairs. With sandbox, scripts run in worker processes, and are
+        # stopped after timeout seconds or at memory_limit bytes.
+        'script_runner': {
+            'cache_size': 256,
+            'sandbox': os.environ.get('WORKBENCH_SANDBOX_SCRIPTS', "false").lower() == "true",
+            'timeout': 5,
+            'memory_limit': 256 * 1024 * 1024,
+        },
+    },
 }
 
 try:
@@ -0,0 +1,139 @@
+"""Encoding of the JSON blobs stored in `XBlockState.state`.
+
+Which encoding is used for new writes is chosen by ``settings.WORKBENCH``:
+
+    'state_codec': 'json-pretty' | 'json' | 'orjson',
+    'state_compression': None | 'zlib' | 'zstd',
+    'state_compression_threshold': 4096,
+
+Every row records the format it was written in (`XBlockState.state_format`),
+so rows written with one configuration can still be read with another.
+
+This code is in the Workbench layer.
+
+"""
+
+
+import base64
+import zlib
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+try:
+    import simplejson as json
+except ImportError:
+    import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# The format of rows written before formats were recorded.
+JSON_FORMAT = 'json'
+
+
+def _dumps_pretty(data):
+    """Serialize `data` the way the workbench always has: readable, but large."""
+    return json.dumps(data, indent=2, sort_keys=True)
+
+
+def _dumps_compact(data):
+    """Serialize `data` without any insignificant whitespace."""
+    return json.dumps(data, separators=(',', ':'))
+
+
+def _dumps_orjson(data):
+    """Serialize `data` with orjson, if it's installed and can handle it."""
+    if orjson is None:
+        return _dumps_compact(data)
+    try:
+        return orjson.dumps(data).decode('utf-8')
+    except orjson.JSONEncodeError:
+        # e.g. integers that don't fit in 64 bits
+        return _dumps_compact(data)
+
+
+def _loads(text):
+    """Parse JSON `text`, with orjson if it's installed and can handle it."""
+    if orjson is not None:
+        try:
+            return orjson.loads(text)
+        except orjson.JSONDecodeError:
+            # e.g. NaN, or integers that don't fit in 64 bits
+            pass
+    return json.loads(text)
+
+
+SERIALIZERS = {
+    'json-pretty': _dumps_pretty,
+    'json': _dumps_compact,
+    'orjson': _dumps_orjson,
+}
+
+
+def _zstd_compress(data):
+    """Compress `data` with Zstandard."""
+    return zstandard.ZstdCompressor().compress(data)
+
+
+def _zstd_decompress(data):
+    """Decompress Zstandard-compressed `data`."""
+    return zstandard.ZstdDecompressor().decompress(data)
+
+
+# Compressed state is base64 encoded, since `state` is a text column.
+COMPRESSORS = {
+    'zlib': (zlib.compress, zlib.decompress),
+    'zstd': (_zstd_compress, _zstd_decompress),
+}
+
+
+def _get_compressor(name):
+    """Return the `(compress, decompress)` pair called `name`."""
+    if name not in COMPRESSORS:
+        raise ImproperlyConfigured(f"Unknown XBlockState compression {name!r}")
+    if name == 'zstd' and zstandard is None:
+        raise ImproperlyConfigured("XBlockState compression 'zstd' requires the zstandard package")
+    return COMPRESSORS[name]
+
+
+def encode_state(data):
+    """
+    Encode the state dict `data` as configured in ``settings.WORKBENCH``.
+
+    Returns a `(state_format, text)` pair to store on an `XBlockState`.
+    """
+    workbench_settings = settings.WORKBENCH
+    codec_name = workbench_settings.get('state_codec', 'json-pretty')
+    try:
+        serializer = SERIALIZERS[codec_name]
+    except KeyError as ex:
+        raise ImproperlyConfigured(f"Unknown XBlockState codec {codec_name!r}") from ex
+    text = serializer(data)
+
+    compression = workbench_settings.get('state_compression')
+    if compression and len(text) > workbench_settings.get('state_compression_threshold', 4096):
+        compress, _decompress = _get_compressor(compression)
+        packed = base64.b64encode(compress(text.encode('utf-8'))).decode('ascii')
+        return f"{JSON_FORMAT}+{compression}", packed
+    return JSON_FORMAT, text
+
+
+def decode_state(state_format, text):
+    """
+    Decode `text` stored in `state_format` back into a state dict.
+    """
+    base_format, _sep, compression = (state_format or JSON_FORMAT).partition('+')
+    if base_format != JSON_FORMAT:
+        raise ValueError(f"Unknown XBlockState format {state_format!r}")
+    if compression:
+        _compress, decompress = _get_compressor(compression)
+        text = decompress(base64.b64decode(text)).decode('utf-8')
+    return _loads(text)
@@ -0,0 +1,128 @@
+"""Test the publishing of XBlock events"""
+
+
+import threading
+import time
+from unittest import mock
+
+import pytest
+
+from django.test.client import Client
+
+from ..events import EventQueue, EventSink, JsonLinesEventSink, SqliteEventSink
+from ..runtime import WorkbenchRuntime
+
+
+class BlockingSink(EventSink):
+    """Keeps the events it's given, but only once `release` is set."""
+    def __init__(self):
+        self.release = threading.Event()
+        self.batches = []
+
+    def write(self, events):
+        self.release.wait()
+        self.batches.append(events)
+
+
+@pytest.mark.parametrize('sink_class, name', [(JsonLinesEventSink, 'events.jsonl'), (SqliteEventSink, 'events.db')])
+def test_sink_round_trip(tmp_path, sink_class, name):
+    events = EventQueue(sink_class(str(tmp_path / name)), batch_size=3)
+    for number in range(7):
+        events.publish('grade' if number % 2 else 'progress', 'problem', f'u{number % 3}', 'student', {'n': number})
+        time.sleep(0.001)  # so that each event has its own time
+    assert events.flush()
+    assert events.stats()['written'] == 7
+
+    progress = events.query(event_type='progress')
+    assert [event['data'] for event in progress] == [{'n': 0}, {'n': 2}, {'n': 4}, {'n': 6}]
+    assert set(progress[0]) == {'time', 'event_type', 'block_type', 'usage_id', 'user_id', 'data'}
+    assert [event['data']['n'] for event in events.query(usage_id='u1')] == [1, 4]
+    assert len(events.query(user_id='student', limit=2)) == 2
+    assert [event['data']['n'] for event in events.query(since=progress[2]['time'])] == [5, 6]
+
+    # Closing writes what's left, and the events stay queryable.
+    events.publish('grade', 'problem', 'u0', 'student', {'n': 7})
+    assert events.close()
+    assert len(sink_class(str(tmp_path / name)).query()) == 8
+
+
+def test_full_queue_drops_events():
+    sink = BlockingSink()
+    events = EventQueue(sink, max_size=2, batch_size=1)
+    events.publish('grade', 'problem', 'u0', 'student', {})
+    # Wait for the thread to be stuck writing the first event.
+    while events.stats()['depth']:
+        time.sleep(0.01)
+
+    start = time.perf_counter()
+    assert [events.publish('grade', 'problem', 'u0', 'student', {}) for _ in range(5)] == [True, True] + [False] * 3
+    assert time.perf_counter() - start < 1
+    assert events.stats()['dropped'] == 3
+    assert events.stats()['max_depth'] == 2
+
+    sink.release.set()
+    assert events.close()
+    stats = events.stats()
+    assert stats['published'] == stats['written'] == 3
+    assert sum(len(batch) for batch in sink.batches) == 3
+
+
+def test_publish_copies_data():
+    sink = BlockingSink()
+    events = EventQueue(sink, batch_size=2)
+    data = {'answers': [1]}
+    events.publish('problem_check', 'problem', 'u0', 'student', data)
+    data['answers'].append(2)
+    events.publish('problem_check', 'problem', 'u0', 'student', data)
+    events.publish('lock', 'problem', 'u0', 'student', {'lock': threading.Lock()})
+
+    sink.release.set()
+    assert events.close()
+    published = [event['data'] for batch in sink.batches for event in batch]
+    assert published[:2] == [{'answers': [1]}, {'answers': [1, 2]}]
+    assert published[2]['lock'].startswith('<unlocked _thread.lock')
+
+
+def test_publish_while_closing_keeps_one_thread():
+    sink = BlockingSink()
+    events = EventQueue(sink, batch_size=1)
+    events.publish('grade', 'problem', 'u0', 'student', {})
+    thread = events._thread  # pylint: disable=protected-access
+    # Wait for the thread to be stuck writing the event, then for close to queue its marker.
+    while events.stats()['depth']:
+        time.sleep(0.01)
+    closer = threading.Thread(target=events.close)
+    closer.start()
+    while not events.stats()['depth']:
+        time.sleep(0.01)
+
+    events.publish('grade', 'problem', 'u0', 'student', {})
+    assert events._thread is thread  # pylint: disable=protected-access
+    sink.release.set()
+    closer.join()
+    # The event published after the marker is written by a new thread.
+    assert events.flush()
+    assert events.stats()['written'] == 2
+    assert events.close()
+
+
+@pytest.mark.django_db
+def test_runtime_publishes_to_queue(tmp_path):
+    events = EventQueue(JsonLinesEventSink(str(tmp_path / 'events.jsonl')))
+    runtime = WorkbenchRuntime("test_user")
+    block = runtime.get_block(runtime.parse_xml_string('<equality_demo left="1" right="1"/>'))
+    with mock.patch('workbench.runtime.EVENTS', events), mock.patch('workbench.views.EVENTS', events):
+        runtime.publish(block, 'grade', {'value': 1, 'max_value': 1})
+        with mock.patch.object(events, 'flush', wraps=events.flush) as flush:
+            Client().get('/events/')
+            flush.assert_not_called()
+            report = Client().get('/events/?event_type=grade&flush=1').json()
+            flush.assert_called_once()
+    events.close()
+
+    assert report['stats']['written'] == 1
+    [event] = report['events']
+    assert event['block_type'] == 'equality_demo'
+    assert event['usage_id'] == str(block.scope_ids.usage_id)
+    assert event['user_id'] == 'test_user'
+    assert event['data'] == {'value': 1, 'max_value': 1}
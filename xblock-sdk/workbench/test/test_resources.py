@@ -0,0 +1,79 @@
+"""Test the workbench resource caches"""
+
+
+from web_fragments.fragment import Fragment
+
+from django.test.client import Client
+
+from ..resources import FRAGMENT_BUNDLES, FragmentBundles, accepted_encoding, bundle_fragment_resources, etag_matches
+
+
+def block_fragment(name):
+    """Make a fragment like one block's student_view, with jQuery from the runtime."""
+    frag = Fragment(f"<div>{name}</div>")
+    frag.add_css(".thumbs { color: red; }")
+    frag.add_javascript("function ThumbsBlock(runtime, element) {}")
+    frag.add_javascript_url("/static/js/vendor/jquery.cookie.js")
+    return frag
+
+
+def page_fragment():
+    """Make a page fragment with two blocks of the same type and one other."""
+    page = Fragment()
+    for child in (block_fragment("one"), block_fragment("two")):
+        page.add_fragment_resources(child)
+    other = Fragment()
+    other.add_css(".other { color: blue; }")
+    other.add_resource(".thumbs { color: red; }", "text/css", placement="foot")
+    page.add_fragment_resources(other)
+    return page
+
+
+def test_bundles_runs_of_inline_resources(tmp_path, monkeypatch):
+    monkeypatch.setattr(FRAGMENT_BUNDLES, 'directory', str(tmp_path))
+    page = bundle_fragment_resources(page_fragment())
+    resources = page.resources
+    # Both head stylesheets make one bundle; the lone script stays inline,
+    # before the jQuery plugin it was before.
+    assert [(resource.kind, resource.mimetype, resource.placement) for resource in resources] == [
+        ('url', 'text/css', 'head'),
+        ('text', 'application/javascript', 'foot'),
+        ('url', 'application/javascript', 'foot'),
+        ('text', 'text/css', 'foot'),
+    ]
+
+    bundle_url = resources[0].data
+    response = Client().get(bundle_url)
+    assert response.status_code == 200
+    assert response.content == b".thumbs { color: red; }\n.other { color: blue; }"
+    assert response['Content-Type'] == 'text/css'
+    assert 'immutable' in response['Cache-Control']
+    assert Client().get(bundle_url, HTTP_IF_NONE_MATCH=response['ETag']).status_code == 304
+
+    # The bundle is still served once it's dropped from memory, as by
+    # another process serving the workbench.
+    FRAGMENT_BUNDLES.clear()
+    assert Client().get(bundle_url).content == response.content
+    assert Client().get(bundle_url.replace('.css', '.js')).status_code == 404
+
+
+def test_bundles_are_shared_by_processes(tmp_path):
+    name = FragmentBundles(str(tmp_path), 1).add(["function One() {}", "function Two() {}"], 'application/javascript')
+    other = FragmentBundles(str(tmp_path), 1)
+    assert other.get(name).content == b"function One() {};\nfunction Two() {}"
+    assert other.get(name).mimetype == 'application/javascript'
+    assert other.get("0" * 32 + ".js") is None
+
+
+def test_accepted_encoding():
+    assert accepted_encoding("gzip, deflate, br", {'gzip': b'', 'br': b''}) == 'br'
+    assert accepted_encoding("gzip, deflate, br", {'gzip': b''}) == 'gzip'
+    assert accepted_encoding("br;q=0, gzip;q=0.5", {'gzip': b'', 'br': b''}) == 'gzip'
+    assert accepted_encoding("", {'gzip': b''}) is None
+
+
+def test_etag_matches():
+    assert etag_matches('"abc"', '"abc"')
+    assert etag_matches('"xyz", W/"abc"', '"abc"')
+    assert etag_matches('*', '"abc"')
+    assert not etag_matches('', '"abc"')
@@ -1,6 +1,8 @@
 """Test Workbench Runtime"""
 
 
+import json
+from contextlib import contextmanager
 from unittest import TestCase, mock
 
 import pytest
@@ -9,8 +11,19 @@ from xblock.reference.user_service import UserService
 from xblock.runtime import KeyValueStore, KvsFieldData
 
 from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.test.utils import CaptureQueriesContext
 
-from ..runtime import ScenarioIdManager, WorkbenchDjangoKeyValueStore, WorkbenchRuntime
+from .. import runtime as workbench_runtime
+from ..models import XBlockFieldState, XBlockState
+from ..runtime import (
+    SCENARIO_INDEX,
+    ScenarioIdManager,
+    WorkbenchDjangoKeyValueStore,
+    WorkbenchFieldKeyValueStore,
+    WorkbenchRuntime,
+    WorkbenchRuntimePool,
+)
 
 
 class TestScenarioIds(TestCase):
@@ -70,6 +83,19 @@ class TestScenarioIds(TestCase):
             self.id_mgr.last_created_usage_id(), "my_scenario.my_block.d0.u1"
         )
 
+    def test_state_round_trip(self):
+        definition_id = self.id_mgr.create_definition("my_block")
+        self.id_mgr.create_usage(definition_id)
+        self.id_mgr.create_aside(definition_id, f"{definition_id}.u0", "my_aside")
+        restored = ScenarioIdManager()
+        restored.set_state(json.loads(json.dumps(self.id_mgr.get_state())))
+
+        self.assertEqual(restored.get_state(), self.id_mgr.get_state())
+        self.assertEqual(restored.get_aside_type_from_usage(f"{definition_id}.u0.my_aside"), "my_aside")
+        self.assertEqual(restored.last_created_usage_id(), f"{definition_id}.u0")
+        self.assertEqual(restored.create_definition("my_block"), ".my_block.d1")
+        self.assertEqual(restored.create_usage(definition_id), f"{definition_id}.u1")
+
     def test_asides(self):
         definition_id = self.id_mgr.create_definition("my_block")
         usage_id = self.id_mgr.create_usage(definition_id)
@@ -108,6 +134,92 @@ class WorkbenchRuntimeTests(TestCase):
         ), "The LTI Consumer XBlock needs this property."
 
 
+class TestBlockCache(TestCase):
+    """
+    Test WorkbenchRuntime.block_cache
+    """
+
+    @pytest.mark.django_db
+    def test_same_block_per_usage(self):
+        runtime = WorkbenchRuntime("test_user")
+        usage_id = runtime.parse_xml_string(
+            '<vertical_demo><equality_demo left="1" right="1"/><equality_demo left="2" right="2"/></vertical_demo>'
+        )
+        self.assertIsNot(runtime.get_block(usage_id), runtime.get_block(usage_id))
+
+        with runtime.block_cache():
+            block = runtime.get_block(usage_id)
+            children = [runtime.get_block(child_id) for child_id in block.children]
+            self.assertIs(runtime.get_block(usage_id), block)
+            with runtime.block_cache():
+                self.assertIs(runtime.get_block(children[0].scope_ids.usage_id), children[0])
+            self.assertEqual(runtime.block_cache_stats, {'hits': 2, 'misses': 3})
+
+        self.assertIsNot(runtime.get_block(usage_id), block)
+
+
+class TestScenarioIndex(TestCase):
+    """
+    Test querypath against SCENARIO_INDEX
+    """
+
+    @pytest.mark.django_db
+    def test_querypath(self):
+        runtime = WorkbenchRuntime("test_user")
+        usage_id = runtime.parse_xml_string("""
+            <vertical_demo>
+                <problem_demo>
+                    <textinput_demo name="a"/>
+                    <equality_demo name="c1" left="./a/@student_input" right="=2"/>
+                </problem_demo>
+                <problem_demo>
+                    <textinput_demo name="b"/>
+                    <equality_demo left="./b/@student_input" right="=3"/>
+                </problem_demo>
+                <attempts_scoreboard_demo/>
+            </vertical_demo>
+        """)
+        SCENARIO_INDEX.add_tree(runtime, usage_id)
+        vertical = runtime.get_block(usage_id)
+        problem1, problem2, scoreboard = (runtime.get_block(child_id) for child_id in vertical.children)
+        input_a, checker1 = problem1.children
+        input_b, checker2 = problem2.children
+
+        def ids(block, path):
+            return [found.scope_ids.usage_id for found in runtime.querypath(block, path)]
+
+        self.assertEqual(ids(problem1, "./a"), [input_a])
+        self.assertEqual(ids(problem2, "./a"), [])
+        self.assertEqual(ids(vertical, ".//checker"), [checker1, checker2])
+        self.assertEqual(ids(vertical, ".//c1"), [checker1])
+        self.assertEqual(ids(scoreboard, ".."), [usage_id])
+        self.assertEqual(ids(scoreboard, "..//b"), [input_b])
+        self.assertEqual([name for name in runtime.querypath(scoreboard, "..//@name") if name], ["a", "c1", "b"])
+
+        with mock.patch.object(runtime, "get_block", side_effect=AssertionError("constructed a block")):
+            self.assertEqual(runtime.query(vertical).descendants().tagged("checker").children().usage_ids, [])
+
+
+class TestIncrement(TestCase):
+    """
+    Test WorkbenchRuntime.increment
+    """
+
+    @pytest.mark.django_db
+    def test_increment_field(self):
+        runtime = WorkbenchRuntime("test_user")
+        block = runtime.get_block(runtime.parse_xml_string("<view_counter_demo/>"))
+        other_block = WorkbenchRuntime("other_user").get_block(block.scope_ids.usage_id)
+        self.assertEqual(other_block.views, 0)
+
+        self.assertEqual(runtime.increment(block, "views"), 1)
+        self.assertEqual(runtime.increment(other_block, "views", 2), 3)
+        self.assertEqual(other_block.views, 3)
+        # Saving the block with its older cached value doesn't undo the increment.
+        block.save()
+        self.assertEqual(WorkbenchRuntime("reader").get_block(block.scope_ids.usage_id).views, 3)
+
+
 class TestKVStore(TestCase):
     """
     Test the Workbench KVP Store
@@ -132,6 +244,228 @@ class TestKVStore(TestCase):
         self.kvs.delete(self.key)
         self.assertFalse(self.kvs.has(self.key))
 
+    def _touch_fields(self, key):
+        """Do a handler's worth of reads and writes on the row for `key`."""
+        self.kvs.set(key, 7)
+        self.kvs.set(key._replace(field_name="name"), "Rusty")
+        self.assertEqual(self.kvs.get(key), 7)
+        self.assertFalse(self.kvs.has(key._replace(field_name="color")))
+
+    @pytest.mark.django_db
+    def test_request_cache_flushes_once(self):
+        with CaptureQueriesContext(connection) as uncached_queries:
+            self._touch_fields(self.key._replace(user_id="dusty"))
+
+        with CaptureQueriesContext(connection) as cached_queries:
+            with self.kvs.request_cache() as cache:
+                self._touch_fields(self.key)
+                # Nothing has been written yet.
+                self.assertEqual(XBlockState.objects.get(user_id="rusty").state, "{}")
+
+        self.assertEqual(
+            cache.stats,
+            {'lookups': 4, 'writes': 2, 'queries': 4, 'row_loads': 1, 'row_saves': 1},
+        )
+        self.assertEqual(cache.queries_saved, 2)
+        # The flush locks the row in a transaction, which tests run as a savepoint.
+        self.assertLess(
+            len([q for q in cached_queries if 'SAVEPOINT' not in q['sql']]),
+            len([q for q in uncached_queries if 'SAVEPOINT' not in q['sql']]),
+        )
+        self.assertEqual(self.kvs.get(self.key), 7)
+        self.assertEqual(self.kvs.get(self.key._replace(field_name="name")), "Rusty")
+
+    @pytest.mark.django_db
+    def test_prefetch(self):
+        user_key = self.key._replace(scope=Scope.user_state, block_scope_id="my_scenario.my_block.d0.u0")
+        self.kvs.set(self.key, 7)
+        self.kvs.set(self.key._replace(block_scope_id="other_scenario.my_block.d0"), 8)
+
+        with CaptureQueriesContext(connection) as queries:
+            with self.kvs.request_cache() as cache:
+                self.kvs.prefetch("my_scenario", "rusty")
+                self.assertEqual(self.kvs.get(self.key), 7)
+                self.assertFalse(self.kvs.has(user_key))
+                self.kvs.set(user_key, "hello")
+                # The other scenario wasn't prefetched.
+                self.assertFalse(self.kvs.has(self.key._replace(block_scope_id="unknown.my_block.d0")))
+
+        # Prefetch, get_or_create for the unknown scenario and the insert.
+        self.assertEqual(cache.stats['queries'], 3)
+        self.assertEqual(len([q for q in queries if 'SAVEPOINT' not in q['sql']]), 4)
+        self.assertEqual(self.kvs.get(user_key), "hello")
+        self.assertTrue(XBlockState.objects.filter(scope_id="unknown.my_block.d0").exists())
+
+    @pytest.mark.django_db
+    def test_increment(self):
+        self.assertEqual(self.kvs.increment(self.key, 2), 2)
+        self.assertEqual(self.kvs.increment(self.key, 3, default=10), 5)
+        self.assertEqual(self.kvs.get(self.key), 5)
+
+    @pytest.mark.django_db
+    def test_increment_retries_when_another_request_adds_the_row(self):
+        name_key = self.key._replace(field_name="name")
+        locked_row = workbench_runtime._locked_row  # pylint: disable=protected-access
+        attempts = []
+
+        @contextmanager
+        def racing_locked_row(**filters):
+            attempts.append(filters)
+            if len(attempts) > 1:
+                with locked_row(**filters) as record:
+                    yield record
+                return
+            # Another request adds the row after this one found it missing.
+            WorkbenchDjangoKeyValueStore().set(name_key, "Rusty")
+            with transaction.atomic():
+                yield None
+
+        with mock.patch.object(workbench_runtime, '_locked_row', racing_locked_row):
+            self.assertEqual(self.kvs.increment(self.key, 1), 1)
+        self.assertEqual(len(attempts), 2)
+        self.assertEqual(self.kvs.get(name_key), "Rusty")
+        self.assertEqual(XBlockState.objects.filter(user_id="rusty").count(), 1)
+
+    @pytest.mark.django_db
+    def test_rows_are_unique(self):
+        shared_key = self.key._replace(user_id=None)
+        self.kvs.set(shared_key, 7)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            XBlockState.objects.create(**XBlockState.fields_for_key(shared_key))
+
+    @pytest.mark.django_db
+    def test_flush_merges_rows_another_request_added(self):
+        name_key = self.key._replace(field_name="name")
+        with self.kvs.request_cache():
+            self.kvs.prefetch("my_scenario", "rusty")
+            self.kvs.set(self.key, 7)
+            # Another request adds the row before this one flushes.
+            WorkbenchDjangoKeyValueStore().set(name_key, "Rusty")
+        self.assertEqual(self.kvs.get(self.key), 7)
+        self.assertEqual(self.kvs.get(name_key), "Rusty")
+
+    @pytest.mark.django_db
+    def test_flush_keeps_fields_another_request_changed(self):
+        name_key = self.key._replace(field_name="name")
+        self.kvs.set(self.key, 1)
+        with self.kvs.request_cache():
+            self.kvs.set(self.key, 7)
+            # Another request changes another field of the row before this one flushes.
+            WorkbenchDjangoKeyValueStore().set(name_key, "Rusty")
+        self.assertEqual(self.kvs.get(self.key), 7)
+        self.assertEqual(self.kvs.get(name_key), "Rusty")
+
+    @pytest.mark.django_db
+    def test_increment_keeps_pending_writes(self):
+        name_key = self.key._replace(field_name="name")
+        with self.kvs.request_cache():
+            self.kvs.set(name_key, "Rusty")
+            self.assertEqual(self.kvs.increment(self.key, 1), 1)
+            # Another request increments the same row before this one flushes.
+            self.kvs._local.cache, cache = None, self.kvs._local.cache  # pylint: disable=protected-access
+            self.kvs.increment(self.key, 1)
+            self.kvs._local.cache = cache  # pylint: disable=protected-access
+            self.assertEqual(self.kvs.get(self.key), 1)
+        self.assertEqual(self.kvs.get(self.key), 2)
+        self.assertEqual(self.kvs.get(name_key), "Rusty")
+
+    @pytest.mark.django_db
+    def test_request_cache_detaches_mutable_values(self):
+        with self.kvs.request_cache():
+            value = [1, 2]
+            self.kvs.set(self.key, value)
+            value.append(3)
+            self.kvs.get(self.key).append(4)
+        self.assertEqual(self.kvs.get(self.key), [1, 2])
+
+
+class TestFieldKVStore(TestCase):
+    """
+    Test the one-row-per-field Workbench KVP Store
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.kvs = WorkbenchFieldKeyValueStore()
+        self.key = KeyValueStore.Key(
+            scope=Scope.user_state_summary,
+            user_id=None,
+            block_scope_id="my_scenario.my_block.d0.u0",
+            field_name="upvotes",
+        )
+
+    @pytest.mark.django_db
+    def test_storage(self):
+        self.assertFalse(self.kvs.has(self.key))
+        with self.assertRaises(KeyError):
+            self.kvs.get(self.key)
+        self.kvs.set(self.key, {"nested": [1, 2]})
+        self.assertTrue(self.kvs.has(self.key))
+        self.assertEqual(self.kvs.get(self.key), {"nested": [1, 2]})
+        self.kvs.set(self.key, 7)
+        self.assertEqual(self.kvs.get(self.key), 7)
+        self.assertEqual(XBlockFieldState.objects.get().int_value, 7)
+        self.kvs.delete(self.key)
+        self.assertFalse(self.kvs.has(self.key))
+
+    @pytest.mark.django_db
+    def test_fields_are_separate_rows(self):
+        self.kvs.set(self.key, 3)
+        self.kvs.set(self.key._replace(field_name="downvotes"), 4)
+        self.assertEqual(XBlockFieldState.objects.count(), 2)
+        self.assertEqual(self.kvs.get(self.key), 3)
+
+    @pytest.mark.django_db
+    def test_increment(self):
+        self.assertEqual(self.kvs.increment(self.key, 1), 1)
+        self.assertEqual(self.kvs.increment(self.key, 2), 3)
+        self.assertEqual(self.kvs.increment(self.key._replace(field_name="views"), 1, default=10), 11)
+        self.kvs.set(self.key, 2.5)
+        self.assertEqual(self.kvs.increment(self.key, 1), 3.5)
+
+    @pytest.mark.django_db
+    def test_increment_reads_back_in_its_transaction(self):
+        self.kvs.increment(self.key, 1)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.kvs.increment(self.key, 1), 2)
+        # UPDATE and SELECT both happen before the savepoint (a transaction
+        # outside of tests) is released, so the row stays locked in between.
+        statements = [query['sql'].split()[0] for query in queries]
+        self.assertEqual(statements, ['SAVEPOINT', 'UPDATE', 'SELECT', 'RELEASE'])
+
+
+class TestRuntimePool(TestCase):
+    """
+    Test reusing runtimes with WorkbenchRuntimePool
+    """
+
+    def test_reuses_runtime_per_user(self):
+        pool = WorkbenchRuntimePool(max_users=10)
+        with pool.runtime("alice") as first:
+            with pool.runtime("alice") as concurrent:
+                self.assertIsNot(first, concurrent)
+        with pool.runtime("alice") as again:
+            self.assertIn(again, (first, concurrent))
+        with pool.runtime("bob") as other:
+            self.assertEqual(other.user_id, "bob")
+        self.assertEqual(pool.stats, {'hits': 1, 'misses': 3})
+
+    def test_evicts_least_recently_used_user(self):
+        pool = WorkbenchRuntimePool(max_users=2)
+        for user_id in ("alice", "bob", "alice", "carol"):
+            with pool.runtime(user_id):
+                pass
+        with pool.runtime("bob"), pool.runtime("alice"):
+            pass
+        self.assertEqual(pool.stats, {'hits': 2, 'misses': 4})
+
+    def test_disabled(self):
+        pool = WorkbenchRuntimePool(max_users=0)
+        for _ in range(2):
+            with pool.runtime("alice"):
+                pass
+        self.assertEqual(pool.stats, {'hits': 0, 'misses': 2})
+
 
 class StubService:
     """Empty service to test loading additional services."""
@@ -4,7 +4,10 @@ Test that all scenarios render successfully.
 
 
 
+import os
+import tempfile
 import unittest
+from unittest import mock
 
 import lxml.html
 import pytest
@@ -13,6 +16,7 @@ from django.test.client import Client
 from django.urls import reverse
 
 from workbench import scenarios
+from workbench.runtime import ID_MANAGER, SCENARIO_INDEX, WorkbenchRuntime
 from workbench.runtime_util import reset_global_state
 
 pytestmark = pytest.mark.django_db
@@ -77,3 +81,66 @@ class ScenarioTest(unittest.TestCase):
             for vertical_tag in html.xpath('//div[@class="vertical"]'):
                 # No vertical tag should be empty.
                 assert list(vertical_tag), f"Scenario {scenario_id}: Empty <vertical> shouldn't happen!"
+
+    def test_save_and_restore_scenarios(self):
+        """
+        Saved scenarios come back with the same ids, unless the declared scenarios changed.
+        """
+        scenarios.add_xml_scenario("test.0", "Saved scenario", "<vertical_demo><thumbs/></vertical_demo>")
+        saved = dict(scenarios.SCENARIOS)
+        usage_id = saved["test.0"].usage_id
+        block_type = ID_MANAGER.get_block_type(ID_MANAGER.get_definition_id(usage_id))
+
+        with tempfile.TemporaryDirectory() as state_dir:
+            path = os.path.join(state_dir, "scenarios.json")
+            assert not scenarios.restore_scenarios(path)
+            scenarios.save_scenarios(path)
+
+            scenarios.SCENARIOS.clear()
+            ID_MANAGER.clear()
+            assert scenarios.restore_scenarios(path)
+            assert scenarios.SCENARIOS == saved
+            assert ID_MANAGER.get_block_type(ID_MANAGER.get_definition_id(usage_id)) == block_type
+            # Carry on numbering where the saved state left off.
+            assert ID_MANAGER.create_usage(ID_MANAGER.get_definition_id(usage_id)) != usage_id
+
+            with mock.patch.object(scenarios, "_scenarios_fingerprint", return_value="changed"):
+                assert not scenarios.restore_scenarios(path)
+
+    def test_lazy_scenario(self):
+        """
+        A lazy scenario is only parsed when it's needed, and can be parsed again after a restart.
+        """
+        xml = "<vertical_demo><thumbs/><thumbs/></vertical_demo>"
+        scenarios.add_xml_scenario("test.lazy", "Lazy scenario", xml, lazy=True)
+        scenario = scenarios.SCENARIOS["test.lazy"]
+        assert not scenario.loaded
+
+        scenarios.load_scenarios("lazy-scenario")
+        assert scenario.loaded
+        usage_id = scenario.usage_id
+        assert len(WorkbenchRuntime().get_block(usage_id).children) == 2
+
+        # Forget the ids, like a restarted process, but keep the database.
+        ID_MANAGER.clear()
+        SCENARIO_INDEX.clear()
+        scenarios._loaded_slugs.clear()  # pylint: disable=protected-access
+        reloaded = scenarios.Scenario("Lazy scenario", None, xml)
+        assert reloaded.usage_id == usage_id
+        assert len(WorkbenchRuntime().get_block(usage_id).children) == 2
+
+    def test_lazy_scenarios_sharing_a_slug(self):
+        """
+        Scenarios with the same slug get the same ids whichever is opened first.
+        """
+        xmls = ["<vertical_demo><thumbs/></vertical_demo>", "<vertical_demo><html_demo/></vertical_demo>"]
+        usage_ids = []
+        for opened in (0, 1):
+            reset_global_state()
+            scenarios.SCENARIOS.clear()
+            for number, xml in enumerate(xmls):
+                scenarios.add_xml_scenario(f"test.{number}", "Same slug", xml, lazy=True)
+            scenarios.SCENARIOS[f"test.{opened}"].load()
+            assert all(scenario.loaded for scenario in scenarios.SCENARIOS.values())
+            usage_ids.append([scenarios.SCENARIOS[f"test.{number}"].usage_id for number in (0, 1)])
+        assert usage_ids[0] == usage_ids[1]
@@ -0,0 +1,66 @@
+"""Test the XBlockState encodings"""
+
+
+from io import StringIO
+
+import pytest
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.test import override_settings
+
+from ..models import XBlockState
+from ..state_codecs import decode_state, encode_state
+
+STATE = {'upvotes': 3, 'answer': {'vectors': [[0, 1], [2.5, -3]]}, 'name': 'café'}
+
+
+def workbench_settings(**overrides):
+    """Return settings.WORKBENCH with the state codec settings replaced."""
+    return dict(settings.WORKBENCH, **overrides)
+
+
+@pytest.mark.parametrize('codec', ['json-pretty', 'json', 'orjson'])
+@pytest.mark.parametrize('compression', [None, 'zlib'])
+def test_round_trip(codec, compression):
+    with override_settings(WORKBENCH=workbench_settings(
+        state_codec=codec, state_compression=compression, state_compression_threshold=10,
+    )):
+        state_format, text = encode_state(STATE)
+    assert state_format == ('json+zlib' if compression else 'json')
+    assert decode_state(state_format, text) == STATE
+
+
+def test_compression_threshold():
+    with override_settings(WORKBENCH=workbench_settings(
+        state_codec='json', state_compression='zlib', state_compression_threshold=1000,
+    )):
+        assert encode_state(STATE) == (
+            'json', '{"upvotes":3,"answer":{"vectors":[[0,1],[2.5,-3]]},"name":"caf\\u00e9"}'
+        )
+
+
+def test_unknown_codec():
+    with override_settings(WORKBENCH=workbench_settings(state_codec='pickle')):
+        with pytest.raises(ImproperlyConfigured):
+            encode_state(STATE)
+    with pytest.raises(ValueError):
+        decode_state('pickle', '')
+
+
+@pytest.mark.django_db
+def test_reencode_command():
+    legacy = XBlockState.objects.create(scope='usage', scope_id='s.thumbs.d0.u0', state='{\n  "upvotes": 3\n}')
+    assert legacy.get_state() == {'upvotes': 3}
+
+    out = StringIO()
+    with override_settings(WORKBENCH=workbench_settings(
+        state_codec='json', state_compression='zlib', state_compression_threshold=5,
+    )):
+        call_command('workbench_reencode_state', stdout=out)
+    assert out.getvalue().strip() == "Re-encoded 1 of 1 XBlockState rows."
+
+    legacy.refresh_from_db()
+    assert legacy.state_format == 'json+zlib'
+    assert legacy.get_state() == {'upvotes': 3}
@@ -1,20 +1,31 @@
 """Test the workbench views."""
 
 
+import asyncio
 import functools
+import gzip
+import io
 import json
+import threading
+import time
 
 import pytest
+from asgiref.sync import async_to_sync
 from web_fragments.fragment import Fragment
 from webob import Response
 from xblock.core import Scope, String, XBlock
 from xblock.exceptions import DisallowedFileError
 from xblock.runtime import NoSuchHandlerError
 
-from django.test.client import Client
+from django.conf import settings
+from django.core.management import call_command
+from django.test import override_settings
+from django.test.client import Client, RequestFactory
 from django.urls import reverse
 
-from workbench import scenarios
+from workbench import scenarios, views
+from workbench.models import XBlockState
+from workbench.profiling import PROFILER
 from workbench.runtime import ID_MANAGER
 
 pytestmark = pytest.mark.django_db
@@ -119,6 +130,67 @@ def test_xblock_with_handler():
     assert the_data == "defxx"
 
 
+@temp_scenario(XBlockWithHandlerAndStudentState, 'profiled')
+def test_profile():
+    PROFILER.clear()
+    client = Client()
+    with override_settings(WORKBENCH=dict(settings.WORKBENCH, profile=True, profile_slowest=1)):
+        response = client.get("/view/profiled/")
+        handler_url = response.content.decode('utf-8').split(':::')[1]
+        for _ in range(2):
+            client.post(handler_url, "{}", "text/json")
+
+    report = client.get("/profile/").json()
+    assert report['enabled'] is False
+    summary = {(total['kind'], total['name']): total for total in report['summary']}
+    assert set(summary) == {('view', 'student_view'), ('handler', 'update_the_data')}
+    handler = summary['handler', 'update_the_data']
+    assert handler['block_type'] == 'XBlockWithHandlerAndStudentState'
+    assert handler['count'] == 2
+    assert handler['queries'] > 0
+    assert handler['kvs']['set'] == 2
+    assert handler['state_bytes_written'] > 0
+    assert 'records' not in report
+    assert len(client.get("/profile/?records=1").json()['records']) == 3
+
+    # Only the slowest request's cProfile report is kept.
+    [slowest] = report['slowest']
+    assert 'function calls' in client.get(f"/profile/{slowest['id']}/").content.decode('utf-8')
+    assert client.get("/profile/12345/").status_code == 404
+
+
+class SlowHandlerXBlock(XBlock):
+    """An XBlock whose handler takes a while."""
+    @XBlock.json_handler
+    def wait(self, data, suffix=''):  # pylint: disable=unused-argument
+        """Sleep for the requested time, and say which thread ran the handler."""
+        time.sleep(data['seconds'])
+        return {'thread': threading.current_thread().name}
+
+
+@pytest.mark.django_db(transaction=True)
+@temp_scenario(SlowHandlerXBlock, 'slow')
+def test_async_handler():
+    usage_id = scenarios.SCENARIOS['slow'].usage_id
+    requests = [
+        RequestFactory().post(
+            f"/handler/{usage_id}/wait/?student=student_{number}", json.dumps({'seconds': 0.3}), 'application/json',
+        )
+        for number in range(3)
+    ]
+
+    async def call_all():
+        return await asyncio.gather(*(views.async_handler(request, usage_id, 'wait') for request in requests))
+
+    # The handlers run side by side in the handler threads, not on the event loop.
+    start = time.perf_counter()
+    responses = async_to_sync(call_all)()
+    assert time.perf_counter() - start < 0.6
+    assert [response.status_code for response in responses] == [200] * 3
+    for response in responses:
+        assert json.loads(response.content)['thread'].startswith('workbench-handler')
+
+
 class XBlockWithoutHandler(XBlock):
     pass
 
@@ -302,6 +374,42 @@ def test_local_resources():
         pass
 
 
+class XBlockWithScript(XBlock):
+    """
+    Provide a test XBlock with a compressible local resource
+    """
+    @classmethod
+    def open_local_resource(cls, uri):
+        if uri != 'public/script.js':
+            raise DisallowedFileError(uri)
+        return io.BytesIO(b"console.log('workbench');\n" * 100)
+
+
+@XBlock.register_temp_plugin(XBlockWithScript, 'xblockwithscript')
+def test_local_resource_caching():
+    client = Client()
+    url = '/resource/xblockwithscript/public/script.js'
+
+    result = client.get(url)
+    assert result.status_code == 200
+    assert 'Content-Encoding' not in result
+    assert result['Cache-Control'] == 'no-cache'
+    assert result['Vary'] == 'Accept-Encoding'
+
+    # The browser's cached copy is still good
+    not_modified = client.get(url, HTTP_IF_NONE_MATCH=result['ETag'])
+    assert not_modified.status_code == 304
+    assert not_modified.content == b''
+    assert client.get(url, HTTP_IF_NONE_MATCH='"stale"').status_code == 200
+
+    compressed = client.get(url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+    assert compressed['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(compressed.content) == result.content
+    assert 'Content-Encoding' not in client.get(url, HTTP_ACCEPT_ENCODING='gzip;q=0')
+
+    assert client.get('/resource/xblockwithscript/public/other.js').status_code == 404
+
+
 class XBlockWithContextTracking(XBlock):
     """
     Provide a test XBlock with context tracking
@@ -350,4 +458,39 @@ def test_user_list():
     client = Client()
     result = client.get("/userlist/")
     assert result.status_code == 200
-    assert result.content.decode('utf-8') == "[]"
+    assert b"".join(result.streaming_content).decode('utf-8') == "[]"
+
+
+def test_user_list_pages():
+    for usage, user_id in enumerate(["carol", "alice", None, "bob", "alice", "dave"]):
+        XBlockState.objects.create(scope="user_state", scope_id=f"s.t.d0.u{usage}", user_id=user_id)
+    client = Client()
+
+    result = client.get("/userlist/")
+    assert json.loads(b"".join(result.streaming_content)) == ["alice", "bob", "carol", "dave"]
+
+    pages = []
+    url = "/userlist/?limit=3"
+    while url:
+        result = client.get(url)
+        pages.append(json.loads(b"".join(result.streaming_content)))
+        url = result.get('Link', '').partition('>')[0][1:]
+    assert pages == [["alice", "bob", "carol"], ["dave"]]
+
+    assert client.get("/userlist/?limit=0").status_code == 400
+
+
+def test_loadtest_command():
+    out = io.StringIO()
+    call_command(
+        'workbench_loadtest', students=2, requests=3, threads=1, mix='thumbs_vote=2,problem_check',
+        stdout=out,
+    )
+    lines = out.getvalue().splitlines()
+    assert lines[0].startswith("2 students, 6 requests on 1 threads")
+    assert [line.split()[0] for line in lines[2:]] == ['problem_check', 'thumbs_vote']
+    assert all(line.endswith(f"200: {line.split()[1]}") for line in lines[2:])
+
+    # The scenarios and the students' state are gone.
+    assert not [scenario_id for scenario_id in scenarios.SCENARIOS if scenario_id.startswith("loadtest_")]
+    assert not XBlockState.objects.filter(user_id__startswith="loadtest_student_").exists()
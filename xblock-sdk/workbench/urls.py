@@ -12,6 +12,12 @@ from workbench import views
 
 admin.autodiscover()
 
+# Under ASGI, handlers run in a thread pool rather than on the event loop's thread.
+if settings.WORKBENCH.get('async_handlers', False):
+    handler_view, aside_handler_view = views.async_handler, views.async_aside_handler
+else:
+    handler_view, aside_handler_view = views.handler, views.aside_handler
+
 urlpatterns = [
     re_path(r'^$', views.index, name='workbench_index'),
     re_path(
@@ -22,6 +28,9 @@ urlpatterns = [
     re_path(r'^userlist/$',
         views.user_list,
         name='userlist'),
+    re_path(r'^profile/$', views.profile, name='profile'),
+    re_path(r'^profile/(?P<record_id>[0-9]+)/$', views.profile_stats, name='profile_stats'),
+    re_path(r'^events/$', views.events, name='events'),
     re_path(
         r'^scenario/(?P<scenario_id>[^/]+)/$',
         views.show_scenario,
@@ -39,17 +48,17 @@ urlpatterns = [
     ),
     re_path(
         r'^handler/(?P<usage_id>[^/]+)/(?P<handler_slug>[^/]*)(?:/(?P<suffix>.*))?$',
-        views.handler, {'authenticated': True},
+        handler_view, {'authenticated': True},
         name='handler'
     ),
     re_path(
         r'^aside_handler/(?P<aside_id>[^/]+)/(?P<handler_slug>[^/]*)(?:/(?P<suffix>.*))?$',
-        views.aside_handler, {'authenticated': True},
+        aside_handler_view, {'authenticated': True},
         name='aside_handler'
     ),
     re_path(
         r'^unauth_handler/(?P<usage_id>[^/]+)/(?P<handler_slug>[^/]*)(?:/(?P<suffix>.*))?$',
-        views.handler, {'authenticated': False},
+        handler_view, {'authenticated': False},
         name='unauth_handler'
     ),
     re_path(
@@ -57,6 +66,11 @@ urlpatterns = [
         views.package_resource,
         name='package_resource'
     ),
+    re_path(
+        r'^bundle/(?P<bundle_name>[0-9a-f]+\.(?:css|js))$',
+        views.fragment_bundle,
+        name='fragment_bundle'
+    ),
     re_path(
         r'^reset_state$',
         views.reset_state,
@@ -6,23 +6,42 @@ This code is in the Workbench layer.
 
 
 
+import functools
+import json
 import logging
-import mimetypes
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
 
-from xblock.core import XBlock, XBlockAside
+from asgiref.sync import sync_to_async
 from xblock.django.request import django_to_webob_request, webob_to_django_response
 from xblock.exceptions import NoSuchUsage
-from xblock.plugin import PluginMissingError
 
 from django.conf import settings
-from django.http import Http404, HttpResponse, JsonResponse
+from django.db import close_old_connections
+from django.http import (
+    Http404,
+    HttpResponse,
+    HttpResponseBadRequest,
+    HttpResponseNotModified,
+    JsonResponse,
+    StreamingHttpResponse,
+)
 from django.shortcuts import redirect, render
 from django.views.decorators.csrf import csrf_exempt, ensure_csrf_cookie
 
-from .models import XBlockState
-from .runtime import WorkbenchRuntime
+from .events import EVENTS
+from .resources import (
+    FRAGMENT_BUNDLES,
+    RESOURCE_CACHE,
+    ResourceNotFound,
+    accepted_encoding,
+    bundle_fragment_resources,
+    etag_matches,
+)
+from .profiling import PROFILER
+from .runtime import RUNTIME_POOL, WORKBENCH_KVS
 from .runtime_util import reset_global_state
-from .scenarios import get_scenarios
+from .scenarios import get_scenarios, load_scenarios
 
 log = logging.getLogger(__name__)
 
@@ -35,6 +54,17 @@ def get_student_id(request):
     return student_id
 
 
+def get_scenario_slug(usage_id):
+    """Get the slug of the scenario a usage (or aside usage) belongs to."""
+    return usage_id.split('.', 1)[0]
+
+
+def get_block_type(usage_id):
+    """Get the block type of a usage, or None if `usage_id` isn't one of ours."""
+    parts = usage_id.split('.', 2)
+    return parts[1] if len(parts) > 1 else None
+
+
 # ---- Views -----
 
 def index(_request):
@@ -68,13 +98,17 @@ def show_scenario(request, scenario_id, view_name='student_view', template='work
         raise Http404 from ex
 
     usage_id = scenario.usage_id
-    runtime = WorkbenchRuntime(student_id)
-    block = runtime.get_block(usage_id)
-    render_context = {
-        'activate_block_id': request.GET.get('activate_block_id', None)
-    }
+    profiling = PROFILER.profile(get_block_type(usage_id), 'view', view_name)
+    with profiling, WORKBENCH_KVS.request_cache(), RUNTIME_POOL.runtime(student_id) as runtime:
+        WORKBENCH_KVS.prefetch(get_scenario_slug(usage_id), student_id)
+        block = runtime.get_block(usage_id)
+        render_context = {
+            'activate_block_id': request.GET.get('activate_block_id', None)
+        }
 
-    frag = block.render(view_name, render_context)
+        frag = block.render(view_name, render_context)
+    if settings.WORKBENCH.get('bundle_fragment_resources', False):
+        frag = bundle_fragment_resources(frag)
     log.info("End show_scenario %s", scenario_id)
     return render(request, template, {
         'scenario': scenario,
@@ -86,17 +120,51 @@ def show_scenario(request, scenario_id, view_name='student_view', template='work
     })
 
 
-def user_list(_request):
+def _json_list(values, chunk_size=1000):
+    """Yield the JSON array of `values` in pieces, encoding `chunk_size` values at a time."""
+    yield "["
+    chunk = []
+    separator = ""
+    for value in values:
+        chunk.append(json.dumps(value))
+        if len(chunk) == chunk_size:
+            yield separator + ",".join(chunk)
+            separator = ","
+            chunk = []
+    if chunk:
+        yield separator + ",".join(chunk)
+    yield "]"
+
+
+def user_list(request):
     """
-    This will return a list of all users in the database
+    Stream the ids of all users with state in the database, as a JSON list.
+
+    With `?limit=N`, return the first N ids after the `?after=` cursor; if
+    there are more, the `Link` header has the URL of the next page.
     """
-    # We'd really like to do .distinct, but sqlite+django does not support this;
-    # hence the hack with sorted(set(...))
-    users = sorted(
-        user_id[0]
-        for user_id in set(XBlockState.objects.values_list('user_id'))
-    )
-    return JsonResponse(users, safe=False)
+    after = request.GET.get('after')
+    limit = request.GET.get('limit')
+    user_ids = WORKBENCH_KVS.user_ids(after)
+    next_url = None
+    if limit is None:
+        user_ids = user_ids.iterator()
+    else:
+        try:
+            limit = int(limit)
+        except ValueError:
+            return HttpResponseBadRequest("limit must be an integer")
+        if limit < 1:
+            return HttpResponseBadRequest("limit must be positive")
+        user_ids = list(user_ids[:limit + 1])
+        if len(user_ids) > limit:
+            user_ids = user_ids[:limit]
+            next_url = request.path + "?" + urlencode({'after': user_ids[-1], 'limit': limit})
+
+    response = StreamingHttpResponse(_json_list(user_ids), content_type='application/json')
+    if next_url:
+        response['Link'] = f'<{next_url}>; rel="next"'
+    return response
 
 
 def handler(request, usage_id, handler_slug, suffix='', authenticated=True):
@@ -108,17 +176,20 @@ def handler(request, usage_id, handler_slug, suffix='', authenticated=True):
         student_id = "none"
         log.info("Start handler %s/%s", usage_id, handler_slug)
 
-    runtime = WorkbenchRuntime(student_id)
-
-    try:
-        block = runtime.get_block(usage_id)
-    except NoSuchUsage as ex:
-        raise Http404 from ex
-
     request = django_to_webob_request(request)
     request.path_info_pop()
     request.path_info_pop()
-    result = block.runtime.handle(block, handler_slug, request, suffix)
+    load_scenarios(get_scenario_slug(usage_id))
+
+    profiling = PROFILER.profile(get_block_type(usage_id), 'handler', handler_slug)
+    with profiling, WORKBENCH_KVS.request_cache(), RUNTIME_POOL.runtime(student_id) as runtime:
+        WORKBENCH_KVS.prefetch(get_scenario_slug(usage_id), student_id)
+        try:
+            block = runtime.get_block(usage_id)
+        except NoSuchUsage as ex:
+            raise Http404 from ex
+
+        result = block.runtime.handle(block, handler_slug, request, suffix)
     log.info("End handler %s/%s", usage_id, handler_slug)
     return webob_to_django_response(result)
 
@@ -132,39 +203,157 @@ def aside_handler(request, aside_id, handler_slug, suffix='', authenticated=True
         student_id = "none"
         log.info("Start handler %s/%s", aside_id, handler_slug)
 
-    runtime = WorkbenchRuntime(student_id)
-
-    try:
-        block = runtime.get_aside(aside_id)
-    except NoSuchUsage as ex:
-        raise Http404 from ex
-
     request = django_to_webob_request(request)
     request.path_info_pop()
     request.path_info_pop()
-    result = block.runtime.handle(block, handler_slug, request, suffix)
+    load_scenarios(get_scenario_slug(aside_id))
+
+    profiling = PROFILER.profile(aside_id.rsplit('.', 1)[-1], 'handler', handler_slug)
+    with profiling, WORKBENCH_KVS.request_cache(), RUNTIME_POOL.runtime(student_id) as runtime:
+        WORKBENCH_KVS.prefetch(get_scenario_slug(aside_id), student_id)
+        try:
+            block = runtime.get_aside(aside_id)
+        except NoSuchUsage as ex:
+            raise Http404 from ex
+
+        result = block.runtime.handle(block, handler_slug, request, suffix)
     log.info("End handler %s/%s", aside_id, handler_slug)
     return webob_to_django_response(result)
 
 
-def package_resource(_request, block_type, resource):
+@functools.lru_cache(maxsize=None)
+def _handler_executor():
+    """Return the pool of `settings.WORKBENCH['async_handler_threads']` threads that async handlers run in."""
+    return ThreadPoolExecutor(
+        settings.WORKBENCH.get('async_handler_threads', 16), thread_name_prefix='workbench-handler',
+    )
+
+
+def _in_handler_thread(view):
     """
-    Wrapper for `pkg_resources` that tries to access a resource and, if it
-    is not found, raises an Http404 error.
+    Wrap the synchronous `view` to run in the handler thread pool, for ASGI.
+
+    The pool's threads keep their own database connections, so they're
+    closed after each request as the request thread's would be.
     """
-    try:
-        xblock_class = XBlock.load_class(block_type)
-    except PluginMissingError:
+    def run(*args, **kwargs):
         try:
-            xblock_class = XBlockAside.load_class(block_type)
-        except PluginMissingError as ex:
-            raise Http404 from ex
+            return view(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return sync_to_async(run, thread_sensitive=False, executor=_handler_executor())
+
+
+async def async_handler(request, usage_id, handler_slug, suffix='', authenticated=True):
+    """
+    `handler` for ASGI, see `workbench.asgi`.
+
+    The handler call, and the flush of the state it changes, run in the
+    handler thread pool, so the event loop can serve other requests while a
+    slow handler runs.
+    """
+    return await _in_handler_thread(handler)(request, usage_id, handler_slug, suffix, authenticated)
+
+
+async def async_aside_handler(request, aside_id, handler_slug, suffix='', authenticated=True):
+    """`aside_handler` for ASGI, see `async_handler`."""
+    return await _in_handler_thread(aside_handler)(request, aside_id, handler_slug, suffix, authenticated)
+
+
+def package_resource(request, block_type, resource):
+    """
+    Serve a block's local resource from `RESOURCE_CACHE`, or raise an Http404
+    error if it is not found.
+
+    Responses carry an ETag and `settings.WORKBENCH['resource_cache_control']`,
+    answer a matching If-None-Match with a 304, and are compressed when the
+    client accepts it.
+    """
     try:
-        content = xblock_class.open_local_resource(resource)
-    except Exception as ex:
+        cached = RESOURCE_CACHE.get(block_type, resource)
+    except ResourceNotFound as ex:
         raise Http404 from ex
-    mimetype, _ = mimetypes.guess_type(resource)
-    return HttpResponse(content, content_type=mimetype)
+    return _cached_resource_response(
+        request, cached, settings.WORKBENCH.get('resource_cache_control', 'no-cache'),
+    )
+
+
+def fragment_bundle(request, bundle_name):
+    """
+    Serve a bundle of fragment resources made by `bundle_fragment_resources`.
+
+    A bundle's name is derived from its content, so it never changes.
+    """
+    cached = FRAGMENT_BUNDLES.get(bundle_name)
+    if cached is None:
+        raise Http404
+    return _cached_resource_response(request, cached, 'public, max-age=31536000, immutable')
+
+
+def _cached_resource_response(request, cached, cache_control):
+    """Make the response for the `CachedResource` `cached`."""
+    if etag_matches(request.headers.get('If-None-Match', ''), cached.etag):
+        response = HttpResponseNotModified()
+    else:
+        encoding = accepted_encoding(request.headers.get('Accept-Encoding', ''), cached.encoded)
+        response = HttpResponse(cached.encoded[encoding] if encoding else cached.content, content_type=cached.mimetype)
+        if encoding:
+            response['Content-Encoding'] = encoding
+    response['ETag'] = cached.etag
+    response['Cache-Control'] = cache_control
+    if cached.encoded:
+        response['Vary'] = 'Accept-Encoding'
+    return response
+
+
+def profile(request):
+    """
+    Report the profiled handler calls and view renders, see `workbench.profiling`.
+
+    `?records=1` includes each kept measurement, not just the totals.
+    """
+    report = {
+        'enabled': PROFILER.enabled(),
+        'summary': PROFILER.summary(),
+        'slowest': PROFILER.slowest(),
+    }
+    if request.GET.get('records'):
+        report['records'] = PROFILER.records()
+    return JsonResponse(report)
+
+
+def profile_stats(_request, record_id):
+    """Serve the cProfile report of one of the slowest profiled requests."""
+    stats = PROFILER.stats(int(record_id))
+    if stats is None:
+        raise Http404
+    return HttpResponse(stats, content_type='text/plain')
+
+
+def events(request):
+    """
+    Report the event queue's counts, and the published events, see `workbench.events`.
+
+    The events can be filtered by `?event_type=`, `?usage_id=` and
+    `?user_id=`; `?since=` a timestamp returns only later ones, and
+    `?limit=` at most that many (default 100). The events are left out
+    if the sink can't be queried. With `?flush=1`, the events queued so far
+    are written first, which can take as long as the sink needs.
+    """
+    try:
+        since = float(request.GET['since']) if 'since' in request.GET else None
+        limit = int(request.GET.get('limit', 100))
+    except ValueError:
+        return HttpResponseBadRequest("since must be a number, limit an integer")
+    filters = {name: request.GET[name] for name in ('event_type', 'usage_id', 'user_id') if name in request.GET}
+    if request.GET.get('flush') == '1':
+        EVENTS.flush()
+    report = {'stats': EVENTS.stats()}
+    try:
+        report['events'] = EVENTS.query(since=since, limit=limit, **filters)
+    except NotImplementedError:
+        pass
+    return JsonResponse(report)
 
 
 @csrf_exempt
@@ -33,6 +33,7 @@ setup(
     ],
     install_requires=[
         'XBlock',
+        'xblock-resource-cache',
     ],
     entry_points={
         'xblock.v1': [
@@ -1,17 +1,16 @@
 """Sortable XBlock"""
 import random
-import pkg_resources
 from xblock.core import XBlock
 from xblock.exceptions import JsonHandlerError
 from xblock.fields import Integer, Scope, String, List, Boolean, Float, Dict
 from xblock.scorable import ScorableXBlockMixin, Score
 from xblock.fragment import Fragment
-from xblockutils.resources import ResourceLoader
+from xblock_resource_cache import CachedResourceLoader
 
 from .utils import _, DummyTranslationService
 
 
-loader = ResourceLoader(__name__)
+loader = CachedResourceLoader(__name__)
 
 
 @XBlock.needs('i18n')
@@ -155,8 +154,7 @@ class SortableXBlock(ScorableXBlockMixin ,XBlock):
 
     def resource_string(self, path):  # pylint: disable=no-self-use
         """Handy helper for getting resources from our kit."""
-        data = pkg_resources.resource_string(__name__, path)
-        return data.decode("utf8")
+        return loader.load_unicode(path)
 
     def shuffle_data_based_on_submission(self, submissions):
         """